@@ -1,3 +1,21 @@
+import heapq
+
+
 def chunk_symbols(tickers, batch_size=25):
     for i in range(0, len(tickers), batch_size):
         yield tickers[i:i+batch_size]
+
+
+def lpt_partition(costs, total):
+    """Longest-processing-time-first packing of {item: cost} into `total` bins.
+
+    Deterministic (ties broken by item, then bin index) so every shard computes
+    the same assignment from the same costs. Returns a list of item lists.
+    """
+    bins = [[] for _ in range(total)]
+    heap = [(0.0, i) for i in range(total)]
+    for item, cost in sorted(costs.items(), key=lambda kv: (-kv[1], kv[0])):
+        load, i = heapq.heappop(heap)
+        bins[i].append(item)
+        heapq.heappush(heap, (load + cost, i))
+    return bins
@@ -0,0 +1,97 @@
+"""
+Incremental nightly backtests.
+
+A per-symbol results manifest records, for every strategy, the fingerprint of
+the config its trades were produced with and the data watermark (last bar
+seen). When the fingerprint still matches, the next run only simulates entries
+after the watermark plus entries whose trades were still open; everything else
+is carried over from the stored trade table. Trades that fall out of the
+lookback window are aged out on merge.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Bump when simulator semantics change so stored trades are recomputed.
+SIM_VERSION = 5
+
+TRADE_KEY = ["strategy", "entry_ts", "tp", "sl", "max_bars"]
+
+
+def config_fingerprint(**parts) -> str:
+    payload = json.dumps({"sim_version": SIM_VERSION, **parts}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+class ResultsManifest:
+    """<root>/<SYMBOL>_<TF>.json -> {strategy: {"config": ..., "watermark": ...}}."""
+
+    def __init__(self, root: str | Path = "data/parquet/_state"):
+        self.root = Path(root)
+
+    def path(self, symbol: str, timeframe: str) -> Path:
+        return self.root / f"{symbol}_{timeframe}.json"
+
+    def load(self, symbol: str, timeframe: str) -> dict:
+        p = self.path(symbol, timeframe)
+        return json.loads(p.read_text()) if p.exists() else {}
+
+    def save(self, symbol: str, timeframe: str, state: dict):
+        p = self.path(symbol, timeframe)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state, indent=1, sort_keys=True))
+        os.replace(tmp, p)
+
+
+class IncrementalPlan:
+    """Which entries need simulating, per strategy, given yesterday's results."""
+
+    def __init__(self, existing: pd.DataFrame, state: dict, configs: dict):
+        self.configs = configs
+        self.resume: dict[str, tuple[pd.Timestamp, np.ndarray]] = {}
+        for name, cfg in configs.items():
+            prev = state.get(name)
+            if existing.empty or not prev or prev.get("config") != cfg or not prev.get("watermark"):
+                continue  # full recompute
+            mine = existing[existing["strategy"] == name]
+            reopen = mine.loc[mine["exit_reason"] == "open", "entry_ts"].unique()
+            self.resume[name] = (pd.Timestamp(prev["watermark"]), np.asarray(pd.to_datetime(reopen, utc=True)))
+
+    def full(self, name: str) -> bool:
+        return name not in self.resume
+
+    def entry_filter(self, name: str, entry_ts: np.ndarray) -> np.ndarray:
+        if self.full(name):
+            return np.ones(len(entry_ts), dtype=bool)
+        watermark, reopen = self.resume[name]
+        ets = pd.to_datetime(entry_ts, utc=True)
+        return np.asarray(ets > watermark) | np.isin(ets.to_numpy(), reopen)
+
+    def merge(self, existing: pd.DataFrame, fresh: pd.DataFrame,
+              window_start: Optional[pd.Timestamp]) -> pd.DataFrame:
+        """Carry over untouched trades, replace recomputed ones, drop aged-out entries."""
+        keep = existing
+        if not keep.empty:
+            # strategies recomputed in full (or no longer configured) are replaced wholesale
+            drop = ~keep["strategy"].isin(list(self.resume)).to_numpy()
+            for name, (_, reopen) in self.resume.items():
+                ets = pd.to_datetime(keep["entry_ts"], utc=True).to_numpy()
+                drop |= (keep["strategy"] == name).to_numpy() & np.isin(ets, reopen)
+            keep = keep[~drop]
+        parts = [p for p in (keep, fresh) if not p.empty]
+        if not parts:
+            return fresh
+        out = pd.concat(parts, ignore_index=True)
+        out = out.drop_duplicates(TRADE_KEY, keep="last")
+        if window_start is not None:
+            out = out[pd.to_datetime(out["entry_ts"], utc=True) >= window_start]
+        return out.sort_values(["strategy", "entry_ts", "tp", "sl", "max_bars"],
+                               kind="stable").reset_index(drop=True)
@@ -0,0 +1,165 @@
+"""
+Coarse-to-fine grid search with successive halving (PLAN Phase 3: "coarse grid -> zoom").
+
+Rung 0 evaluates a strided subgrid of the axes on a fraction of the entries.
+After each rung, cells whose confidence bounds already sit below `thresholds`
+are pruned, the rest are cut to the best 1/eta by Sharpe, and the next rung
+re-evaluates the survivors plus their neighbours at half the stride on a
+larger share of entries. The last rung uses every entry and applies the hard
+thresholds (min_samples, min_win_pct, min_sharpe). Every evaluated cell and its
+decision is written to a JSONL log.
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import math
+from pathlib import Path
+from typing import Callable, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backtests.summarize import settled
+from engine.simulator import run_backtest
+
+DEFAULT_THRESHOLDS = {"min_win_pct": 0.60, "min_sharpe": 0.8, "min_samples": 50}
+
+
+def wilson_upper(wins, n, z: float = 1.645):
+    """Upper Wilson bound of a win rate."""
+    wins, n = np.asarray(wins, float), np.asarray(n, float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = wins / n
+        centre = p + z * z / (2 * n)
+        half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+        return np.where(n > 0, (centre + half) / (1 + z * z / n), 1.0)
+
+
+def sharpe_upper(sharpe, n, z: float = 1.645):
+    """Upper bound of a per-trade Sharpe ratio (Lo's standard error)."""
+    sharpe, n = np.asarray(sharpe, float), np.asarray(n, float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        se = np.sqrt((1 + 0.5 * sharpe * sharpe) / n)
+    return np.where((n > 1) & np.isfinite(sharpe), sharpe + z * se, np.inf)
+
+
+def cell_stats(trades: pd.DataFrame, axes: Sequence[str]) -> pd.DataFrame:
+    trades = settled(trades)
+    g = trades.assign(_win=trades["pnl"] > 0).groupby(list(axes), sort=False)
+    out = pd.DataFrame({"n": g["pnl"].size(), "wins": g["_win"].sum(),
+                        "avg_pnl": g["pnl"].mean(), "pnl_std": g["pnl"].std()}).reset_index()
+    out["win_pct"] = out["wins"] / out["n"]
+    out["sharpe"] = (out["avg_pnl"] / out["pnl_std"]).where(out["pnl_std"] > 0)
+    return out
+
+
+class SearchLog:
+    def __init__(self, path: Optional[str | Path] = None):
+        self.path = Path(path) if path else None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, rows: list[dict]):
+        if self.path and rows:
+            with open(self.path, "a") as f:
+                for r in rows:
+                    f.write(json.dumps(r, default=float) + "\n")
+
+
+def _strided(n: int, stride: int) -> list[int]:
+    return sorted(set(range(0, n, stride)) | {n - 1})
+
+
+def coarse_to_fine(evaluate: Callable[[pd.DataFrame, float], pd.DataFrame],
+                   axes: Mapping[str, Sequence], thresholds: Optional[Mapping] = None,
+                   eta: int = 3, rungs: int = 3, z: float = 1.645, min_cb_samples: int = 10,
+                   log: Optional[SearchLog] = None, tag: Optional[dict] = None) -> pd.DataFrame:
+    """Search `axes` (name -> ordered values) -> final-rung stats of the passing cells.
+
+    evaluate(cells, budget) gets a frame with one column per axis and the share
+    of entries to use (0 < budget <= 1); it returns those columns plus `n`,
+    `wins`, `win_pct` and `sharpe` per cell.
+    """
+    th = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    names = list(axes)
+    values = {a: list(axes[a]) for a in names}
+    sizes = [len(values[a]) for a in names]
+    stride = 2 ** (rungs - 1)
+    cells = set(itertools.product(*[_strided(n, stride) for n in sizes]))
+    log = log or SearchLog()
+    result = pd.DataFrame()
+
+    for rung in range(rungs):
+        last = rung == rungs - 1
+        budget = float(eta) ** -(rungs - 1 - rung)
+        idx = sorted(cells)
+        frame = pd.DataFrame([[values[a][i] for a, i in zip(names, c)] for c in idx], columns=names)
+        stats = frame.merge(evaluate(frame, budget), on=names, how="left")
+        stats[["n", "wins"]] = stats[["n", "wins"]].fillna(0)
+        stats["_idx"] = idx
+
+        if last:
+            ok = ((stats["n"] >= th["min_samples"]) & (stats["win_pct"] >= th["min_win_pct"])
+                  & (stats["sharpe"] >= th["min_sharpe"]))
+            stats["decision"] = np.where(ok, "pass", "fail")
+            result = stats[ok]
+        else:
+            sure = stats["n"] >= min_cb_samples
+            low = sure & ((wilson_upper(stats["wins"], stats["n"], z) < th["min_win_pct"])
+                          | (sharpe_upper(stats["sharpe"], stats["n"], z) < th["min_sharpe"]))
+            stats["decision"] = np.where(low, "prune_bound", "keep")
+            alive = stats[~low].sort_values("sharpe", ascending=False, na_position="last")
+            cut = alive.index[max(1, math.ceil(len(alive) / eta)):]
+            stats.loc[cut, "decision"] = "prune_halving"
+            # refine: survivors and their neighbours at the next (halved) stride
+            stride = max(1, stride // 2)
+            cells = set()
+            for c in stats.loc[stats["decision"] == "keep", "_idx"]:
+                around = [sorted({max(0, i - stride), i, min(n - 1, i + stride)}) for i, n in zip(c, sizes)]
+                cells.update(itertools.product(*around))
+
+        log.write([{**(tag or {}), "rung": rung, "budget": budget,
+                    **{a: r[a] for a in names}, "n": int(r["n"]), "win_pct": r["win_pct"],
+                    "sharpe": r["sharpe"], "decision": r["decision"]}
+                   for r in stats.to_dict("records")])
+        if not cells and not last:
+            break
+    return result.drop(columns=["_idx"], errors="ignore").reset_index(drop=True)
+
+
+class BacktestEvaluator:
+    """`evaluate` callable over `run_backtest` for one strategy.
+
+    A budget below 1 simulates every k-th entry (k = round(1/budget)), so cheap
+    rungs still cover the whole history. Trades of the last full-budget call are
+    kept in `trades`; `simulated` counts all trade rows produced.
+    """
+
+    def __init__(self, symbols, timeframe, name: str, signal: Callable, gates=None, regime_cfg=None,
+                 grid: Optional[Mapping] = None, grow_codec: bool = True):
+        self.symbols = symbols
+        self.timeframe = timeframe
+        self.strategies = {name: signal}
+        self.gates = gates
+        self.regime_cfg = regime_cfg
+        self.grid = dict(grid or {})
+        self.grow_codec = grow_codec
+        self.simulated = 0
+        self.trades = pd.DataFrame()
+
+    def __call__(self, cells: pd.DataFrame, budget: float) -> pd.DataFrame:
+        k = max(1, int(round(1.0 / budget)))
+        every_kth = (lambda _, ets: np.arange(len(ets)) % k == 0) if k > 1 else None
+        # one pass per rung: barriers resolve on the product grid, rows only for `cells`
+        grid = {**self.grid, **{a: sorted(cells[a].unique()) for a in ("tp", "sl", "max_bars")},
+                "cells": list(cells[["tp", "sl", "max_bars"]].itertuples(index=False, name=None))}
+        trades = run_backtest(self.symbols, self.timeframe, self.strategies, None, grid,
+                              self.gates, self.regime_cfg, entry_filter=every_kth,
+                              grow_codec=self.grow_codec)
+        self.simulated += len(trades)
+        if k == 1:
+            self.trades = trades
+        if trades.empty:
+            return pd.DataFrame(columns=["tp", "sl", "max_bars", "n", "wins", "win_pct", "sharpe"])
+        return cell_stats(trades, ["tp", "sl", "max_bars"])
@@ -0,0 +1,100 @@
+"""
+Slippage / liquidity stress tests as a post-process over stored trades
+(PLAN Phase 4: base / +1x / +2x slippage).
+
+Trades carry their fill components (`engine.fill_model.FILL_COLUMNS`, one set
+per leg for multi-leg tables), so each scenario is a column-wise recomputation
+of slippage, P&L and `ret_on_risk`;
+all scenarios are evaluated together per record batch and folded into the same
+mergeable ContextKey accumulators as `backtests.summarize`.
+
+Gates are applied to every leg's entry fill (spread / mid, volume, open
+interest where stored) through `engine.fill_model.trade_admits`, as
+`run_backtest` does; tables written before `entry_volume` was stored are only
+gated on spread.
+They can only tighten what the run already filtered: a trade the simulation
+gated out is not in the table to be re-admitted.
+"""
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from backtests.summarize import DEFAULT_GROUP, ContextKeyAggregator, settled_filter
+from engine.fill_model import FILL_COLUMNS, LiquidityGates, fill_legs, trade_admits, trade_slippage
+from utils.io import write_parquet_local
+
+DEFAULT_MULTIPLIERS = (1.0, 2.0, 3.0)  # base, +1x, +2x
+
+
+def _scenarios(multipliers: Sequence[float], gates: Optional[Sequence[LiquidityGates]]):
+    return [(float(m), g) for g in (gates or [None]) for m in multipliers]
+
+
+def reprice(trades: pd.DataFrame, slip_mult: float = 1.0,
+            gates: Optional[LiquidityGates] = None) -> pd.DataFrame:
+    """Trades under one scenario: slippage scaled by `slip_mult`, rows failing `gates` dropped."""
+    out = trades.copy()
+    if gates is not None:
+        out = out[trade_admits(gates, out)]
+    risk = out["pnl"] / out["ret_on_risk"] if "entry_price" not in out else \
+        out["qty"] * out["entry_price"] * out["sl"]
+    slip = trade_slippage(out, slip_mult)
+    out["pnl"] = out["pnl"] + out["slippage"] - slip
+    out["slippage"] = slip
+    out["win"] = out["pnl"] > 0
+    out["ret_on_risk"] = out["pnl"] / risk
+    return out
+
+
+def scenario_pnl(trades: pd.DataFrame, multipliers: Sequence[float] = DEFAULT_MULTIPLIERS,
+                 gates: Optional[Sequence[LiquidityGates]] = None) -> tuple[np.ndarray, np.ndarray]:
+    """(pnl, admitted) arrays shaped (n_trades, n_scenarios) in one broadcast."""
+    sc = _scenarios(multipliers, gates)
+    mult = np.array([m for m, _ in sc])
+    before = (trades["pnl"] + trades["slippage"]).to_numpy(np.float64)[:, None]
+    pnl = before - trade_slippage(trades)[:, None] * mult[None, :]
+    admitted = np.ones(pnl.shape, dtype=bool)
+    for j, (_, g) in enumerate(sc):
+        if g is not None:
+            admitted[:, j] = trade_admits(g, trades)
+    return pnl, admitted
+
+
+def stress_summaries(parquet_path, out_table_path=None, multipliers: Sequence[float] = DEFAULT_MULTIPLIERS,
+                     gates: Optional[Sequence[LiquidityGates]] = None,
+                     group_cols: Optional[Sequence[str]] = None, batch_size: int = 1 << 16,
+                     codec=None) -> pd.DataFrame:
+    """ContextKey summaries for every (slippage multiplier x gates) scenario in one
+    streaming pass over the trade files. Adds `slip_mult`, `max_spread_pct` and
+    `min_volume` columns (NaN = no extra gate)."""
+    dataset = ds.dataset(parquet_path, format="parquet")
+    names = set(dataset.schema.names)
+    cols = [c for c in (group_cols or DEFAULT_GROUP) if c in names]
+    legs = [p + c for p in fill_legs(names) for c in [*FILL_COLUMNS, "entry_oi"]]
+    need = sorted((set(cols) | {"pnl", "slippage", "sl", "ret_on_risk"} | set(legs)) & names)
+    sc = _scenarios(multipliers, gates)
+    aggs = [ContextKeyAggregator(cols) for _ in sc]
+    for batch in dataset.to_batches(columns=need, filter=settled_filter(names), batch_size=batch_size):
+        df = batch.to_pandas()
+        pnl, admitted = scenario_pnl(df, multipliers, gates)
+        keys = df[cols]
+        for j, agg in enumerate(aggs):
+            m = admitted[:, j]
+            agg.update(keys[m].assign(pnl=pnl[m, j]))
+    parts = []
+    for (mult, g), agg in zip(sc, aggs):
+        out = agg.to_frame()
+        out.insert(0, "min_volume", np.nan if g is None else g.min_volume)
+        out.insert(0, "max_spread_pct", np.nan if g is None else g.max_spread_pct)
+        out.insert(0, "slip_mult", mult)
+        parts.append(out)
+    out = pd.concat(parts, ignore_index=True)
+    if codec is not None and "context_key" in out:
+        out.insert(out.columns.get_loc("context_key") + 1, "context", codec.to_strings(out["context_key"]))
+    if out_table_path is not None:
+        write_parquet_local(out, out_table_path)
+    return out
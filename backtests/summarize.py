@@ -1,2 +1,191 @@
-def summarize_to_contextkeys(parquet_path, out_table_path=None):
-    raise NotImplementedError
+"""
+Out-of-core ContextKey summaries over trade result files.
+
+Record batches are streamed from a pyarrow dataset and folded into per-key
+accumulators (count, wins, sums, sums of squares, gross profit/loss and the
+equity-curve state needed for drawdown). Accumulators are mergeable, so shards
+can summarize their own files and the partial summaries be combined later.
+Memory is proportional to the number of distinct keys, not trades.
+
+Drawdown assumes each key's trades arrive in time order within a stream, which
+holds for the per-symbol trade files (sorted by strategy and entry time); when
+partials are merged they are treated as consecutive segments.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from utils.io import write_parquet_local
+
+DEFAULT_GROUP = ["context_key", "tp", "sl", "max_bars", "profit_target_pct", "max_loss_mult_credit",
+                 "time_stop_days_before_expiry"]
+STATE = ["n", "wins", "pnl_sum", "pnl_sumsq", "gross_profit", "gross_loss",
+         "eq_total", "eq_peak", "eq_min", "max_drawdown"]
+
+
+def settled(trades: pd.DataFrame) -> pd.DataFrame:
+    """Trades with a realized exit. Rows still "open" at the end of the data stay in
+    the trade files (incremental runs re-simulate them) but carry no final P&L."""
+    if "exit_reason" not in trades.columns:
+        return trades
+    return trades[trades["exit_reason"].to_numpy() != "open"]
+
+
+def settled_filter(names) -> Optional[ds.Expression]:
+    """Dataset filter equivalent of `settled` for files with these column names."""
+    return ds.field("exit_reason") != "open" if "exit_reason" in names else None
+
+
+def group_state(codes: np.ndarray, pnl: np.ndarray, n_groups: int) -> np.ndarray:
+    """Accumulator rows (n_groups x len(STATE)) for trades in arrival order, grouped by `codes`."""
+    out = np.zeros((n_groups, len(STATE)))
+    out[:, 0] = np.bincount(codes, minlength=n_groups)
+    out[:, 1] = np.bincount(codes, weights=(pnl > 0).astype(float), minlength=n_groups)
+    out[:, 2] = np.bincount(codes, weights=pnl, minlength=n_groups)
+    out[:, 3] = np.bincount(codes, weights=pnl * pnl, minlength=n_groups)
+    out[:, 4] = np.bincount(codes, weights=np.where(pnl > 0, pnl, 0.0), minlength=n_groups)
+    out[:, 5] = np.bincount(codes, weights=np.where(pnl < 0, pnl, 0.0), minlength=n_groups)
+
+    # per-group equity curves: stable sort keeps each group's rows in arrival order
+    order = np.argsort(codes, kind="stable")
+    g = codes[order]
+    cum = pd.Series(pnl[order]).groupby(g).cumsum().to_numpy()
+    peak = np.maximum(pd.Series(cum).groupby(g).cummax().to_numpy(), 0.0)
+    out[:, 6] = out[:, 2]
+    out[:, 7] = np.maximum(pd.Series(cum).groupby(g).max().reindex(range(n_groups)).fillna(0.0).to_numpy(), 0.0)
+    out[:, 8] = np.minimum(pd.Series(cum).groupby(g).min().reindex(range(n_groups)).fillna(0.0).to_numpy(), 0.0)
+    out[:, 9] = pd.Series(peak - cum).groupby(g).max().reindex(range(n_groups)).fillna(0.0).to_numpy()
+    return out
+
+
+def _combine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Merge accumulator rows: segment `b` follows segment `a` (row-aligned)."""
+    out = a[:, :6] + b[:, :6]
+    total = a[:, 6] + b[:, 6]
+    peak = np.maximum(a[:, 7], a[:, 6] + b[:, 7])
+    low = np.minimum(a[:, 8], a[:, 6] + b[:, 8])
+    mdd = np.maximum(np.maximum(a[:, 9], b[:, 9]), a[:, 7] - (a[:, 6] + b[:, 8]))
+    return np.column_stack([out, total, peak, low, mdd])
+
+
+class ContextKeyAggregator:
+    def __init__(self, group_cols: Sequence[str] = DEFAULT_GROUP):
+        self.group_cols = list(group_cols)
+        self._index: dict[tuple, int] = {}
+        self._keys: list[tuple] = []
+        self._state = np.zeros((0, len(STATE)))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _rows_for(self, keys: Iterable[tuple]) -> np.ndarray:
+        rows = []
+        for k in keys:
+            i = self._index.get(k)
+            if i is None:
+                i = self._index[k] = len(self._keys)
+                self._keys.append(k)
+            rows.append(i)
+        if len(self._keys) > len(self._state):
+            grow = np.zeros((max(len(self._keys), 2 * len(self._state)) - len(self._state), len(STATE)))
+            self._state = np.vstack([self._state, grow])
+        return np.asarray(rows, dtype=np.int64)
+
+    def _fold(self, keys: list[tuple], seg: np.ndarray):
+        rows = self._rows_for(keys)
+        self._state[rows] = _combine(self._state[rows], seg)
+
+    def update(self, df: pd.DataFrame):
+        """Fold a batch of trades (group columns + pnl) in arrival order; open trades are skipped."""
+        df = settled(df)
+        if df.empty:
+            return
+        codes, uniq = pd.MultiIndex.from_frame(df[self.group_cols]).factorize()
+        seg = group_state(codes.astype(np.int64), df["pnl"].to_numpy(np.float64), len(uniq))
+        self._fold(list(uniq), seg)
+
+    def merge(self, other: "ContextKeyAggregator") -> "ContextKeyAggregator":
+        """Append `other`'s partial summary as the later segment."""
+        if len(other):
+            self._fold(other._keys, other._state[:len(other)])
+        return self
+
+    def state_frame(self) -> pd.DataFrame:
+        """Raw accumulators (mergeable partial summary)."""
+        keys = pd.DataFrame(self._keys, columns=self.group_cols)
+        return pd.concat([keys, pd.DataFrame(self._state[:len(self)], columns=STATE)], axis=1)
+
+    @classmethod
+    def from_state_frame(cls, df: pd.DataFrame, group_cols: Sequence[str] = DEFAULT_GROUP):
+        agg = cls([c for c in group_cols if c in df.columns])
+        agg._fold(list(df[agg.group_cols].itertuples(index=False, name=None)),
+                  df[STATE].to_numpy(np.float64))
+        return agg
+
+    def to_frame(self) -> pd.DataFrame:
+        """Final per-key metrics: win%, profit factor, Sharpe, avg P&L, drawdown."""
+        return state_metrics(self.state_frame(), self.group_cols)
+
+
+def state_metrics(s: pd.DataFrame, group_cols: Sequence[str]) -> pd.DataFrame:
+    """Metrics from accumulator columns (`STATE`) keyed by `group_cols`."""
+    n = s["n"]
+    mean = s["pnl_sum"] / n
+    var = (s["pnl_sumsq"] - n * mean ** 2) / (n - 1).where(n > 1)
+    std = np.sqrt(var.clip(lower=0.0))
+    out = s[list(group_cols)].copy()
+    out["n"] = n.astype(np.int64)
+    out["win_pct"] = s["wins"] / n
+    out["avg_pnl"] = mean
+    out["total_pnl"] = s["pnl_sum"]
+    out["pnl_std"] = std
+    out["sharpe"] = (mean / std).where(std > 0)
+    out["profit_factor"] = (s["gross_profit"] / -s["gross_loss"]).where(s["gross_loss"] < 0, np.inf)
+    out["max_drawdown"] = s["max_drawdown"]
+    return out
+
+
+def _with_labels(out: pd.DataFrame, codec) -> pd.DataFrame:
+    if codec is not None and "context_key" in out and pd.api.types.is_integer_dtype(out["context_key"]):
+        out.insert(out.columns.get_loc("context_key") + 1, "context", codec.to_strings(out["context_key"]))
+    return out
+
+
+def summarize_to_contextkeys(parquet_path, out_table_path=None, group_cols: Optional[Sequence[str]] = None,
+                             batch_size: int = 1 << 16, partial: bool = False, codec=None) -> pd.DataFrame:
+    """Stream trade parquet files (a file, directory or list) into ContextKey summaries.
+
+    `group_cols` defaults to the ContextKey plus exit-grid columns present in the
+    files. `partial=True` returns/writes the raw mergeable accumulators instead
+    of final metrics (see `merge_partial_summaries`). Keys stay packed integers;
+    pass a `patterns.context.ContextKeyCodec` to add the readable `context` string.
+    """
+    dataset = ds.dataset(parquet_path, format="parquet")
+    names = set(dataset.schema.names)
+    cols = [c for c in (group_cols or DEFAULT_GROUP) if c in names]
+    agg = ContextKeyAggregator(cols)
+    for batch in dataset.to_batches(columns=cols + ["pnl"], filter=settled_filter(names),
+                                    batch_size=batch_size):
+        agg.update(batch.to_pandas())
+    out = agg.state_frame() if partial else _with_labels(agg.to_frame(), codec)
+    if out_table_path is not None:
+        write_parquet_local(out, out_table_path)
+    return out
+
+
+def merge_partial_summaries(paths: Iterable[str | Path], out_table_path=None,
+                            group_cols: Sequence[str] = DEFAULT_GROUP, codec=None) -> pd.DataFrame:
+    """Combine partial (state) summaries written by different shards."""
+    agg = None
+    for p in paths:
+        part = ContextKeyAggregator.from_state_frame(pd.read_parquet(p), group_cols)
+        agg = part if agg is None else agg.merge(part)
+    out = _with_labels(agg.to_frame(), codec) if agg is not None else pd.DataFrame()
+    if out_table_path is not None:
+        write_parquet_local(out, out_table_path)
+    return out
@@ -0,0 +1,103 @@
+"""
+Walk-forward cross-validation over one backtest.
+
+Indicators, pattern scans and the trade simulation run once over the full
+history (`engine.simulator.run_backtest`); folds only assign the resulting
+trades to train/test by entry time. Purging (train trades whose entry..exit
+span overlaps the test window) and embargo (train trades entering within
+`embargo` after the test window) are boolean masks over the trade arrays, and
+fold metrics are grouped sums over those masks, so K folds cost one backtest
+plus K cheap aggregations.
+"""
+from __future__ import annotations
+
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backtests.summarize import DEFAULT_GROUP, STATE, group_state, settled, state_metrics
+from engine.simulator import run_backtest
+
+MODES = ("expanding", "rolling", "kfold")
+
+
+def make_folds(start, end, n_folds: int = 5, mode: str = "expanding",
+               train_blocks: Optional[int] = None) -> pd.DataFrame:
+    """Fold windows over [start, end].
+
+    expanding/rolling: the span is cut into n_folds + 1 blocks; fold i tests on
+    block i + 1 and trains on the blocks before it (the last `train_blocks` of
+    them when rolling). kfold: n_folds blocks, each tested with the rest as
+    training data (purged and embargoed on both sides).
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    start, end = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(1, "ns")  # end inclusive
+    edges = pd.date_range(start, end, periods=n_folds + (1 if mode == "kfold" else 2))
+    rows = []
+    for i in range(n_folds):
+        if mode == "kfold":
+            rows.append((i, edges[0], edges[-1], edges[i], edges[i + 1]))
+            continue
+        first = 0 if mode == "expanding" or not train_blocks else max(0, i + 1 - train_blocks)
+        rows.append((i, edges[first], edges[i + 1], edges[i + 1], edges[i + 2]))
+    return pd.DataFrame(rows, columns=["fold", "train_start", "train_end", "test_start", "test_end"])
+
+
+def _ns(values) -> np.ndarray:
+    ts = pd.to_datetime(pd.Series(values), utc=True).dt.tz_localize(None)
+    return ts.to_numpy().astype("datetime64[ns]").astype(np.int64)
+
+
+def fold_masks(entry_ts, exit_ts, folds: pd.DataFrame, embargo=None) -> tuple[np.ndarray, np.ndarray]:
+    """(train, test) boolean masks shaped (n_folds, n_trades)."""
+    entry, exit_ = _ns(entry_ts)[None, :], _ns(exit_ts)[None, :]
+    col = lambda c: _ns(folds[c])[:, None]
+    tr0, tr1, te0, te1 = col("train_start"), col("train_end"), col("test_start"), col("test_end")
+    test = (entry >= te0) & (entry < te1)
+    train = (entry >= tr0) & (entry < tr1) & ~test
+    train &= ~((exit_ >= te0) & (entry < te1))  # purge: label span overlaps the test window
+    if embargo is not None:
+        train &= ~((entry >= te1) & (entry < te1 + pd.Timedelta(embargo).value))
+    return train, test
+
+
+def walk_forward(trades: pd.DataFrame, n_folds: int = 5, mode: str = "expanding",
+                 train_blocks: Optional[int] = None, embargo=None,
+                 group_cols: Optional[Sequence[str]] = None, start=None, end=None):
+    """Fold windows and per-fold, per-split metrics from a precomputed trade table.
+
+    Returns (folds, metrics); metrics has one row per fold x split (train/test)
+    x group, with the `backtests.summarize` metric columns.
+    """
+    group_cols = [c for c in (group_cols or DEFAULT_GROUP) if c in trades.columns]
+    trades = settled(trades).sort_values("entry_ts", kind="stable").reset_index(drop=True)
+    entry = pd.to_datetime(trades["entry_ts"], utc=True)
+    folds = make_folds(start if start is not None else entry.min(),
+                       end if end is not None else entry.max(), n_folds, mode, train_blocks)
+    train, test = fold_masks(trades["entry_ts"], trades["exit_ts"], folds, embargo)
+    folds["n_train"] = train.sum(axis=1)
+    folds["n_test"] = test.sum(axis=1)
+
+    codes, uniq = pd.MultiIndex.from_frame(trades[group_cols]).factorize()
+    keys = pd.DataFrame(list(uniq), columns=group_cols)
+    pnl = trades["pnl"].to_numpy(np.float64)
+    parts = []
+    for k in range(len(folds)):
+        for split, mask in (("train", train[k]), ("test", test[k])):
+            state = pd.concat([keys, pd.DataFrame(group_state(codes[mask], pnl[mask], len(uniq)),
+                                                  columns=STATE)], axis=1)
+            m = state_metrics(state[state["n"] > 0], group_cols)
+            m.insert(0, "split", split)
+            m.insert(0, "fold", k)
+            parts.append(m)
+    metrics = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    return folds, metrics
+
+
+def run_walk_forward(symbols, timeframe, strategies, grid: Optional[Mapping] = None, gates=None,
+                     regime_cfg=None, **cv):
+    """One `run_backtest` over the full history, then `walk_forward(trades, **cv)`."""
+    trades = run_backtest(symbols, timeframe, strategies, None, grid, gates, regime_cfg)
+    return walk_forward(trades, **cv)
@@ -0,0 +1,352 @@
+"""
+Benchmark suite for the backtest and live hot paths.
+
+Each stage times one pipeline step over deterministic synthetic data
+(`benchmarks.synthetic`) written to a scratch workspace, so runs are offline
+and comparable across commits:
+
+    indicators    cold `IndicatorCache.attach` over every symbol
+    pattern_scan  `OHLCPanel` build + scan of all registered patterns
+    chain_lookup  as-of `ChainStore.snapshot` + leg selection
+    grid_sim      `run_backtest` over the default tp/sl/max_bars grid
+    summarize     `summarize_to_contextkeys` over the simulated trades
+    paper_cold    live `/paper` handler, first call (state warm-up)
+    paper_warm    live `/paper` handler, steady state
+
+Results are JSON: run metadata plus per-stage best/median seconds over at least
+`repeat` runs, and a calibration time for the machine. `compare` flags stages
+slower than the baseline by more than `threshold` (relative, on the median time,
+scaled by the calibration ratio unless --no-normalize). Medians are what two runs
+on the same machine reproduce; the best time of a few repeats swings with
+whichever run got lucky.
+
+    python -m benchmarks.suite --scale small --save benchmarks/baselines/small.json
+    python -m benchmarks.suite --scale small --compare benchmarks/baselines/small.json
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import symbol_names, synthetic_bars, synthetic_chains
+
+TIMEFRAME = "1m"
+# allowed relative slowdown of a stage's median: reruns of the small scale on one
+# shared 1-CPU machine drift by up to ~45% on the shortest stages
+DEFAULT_THRESHOLD = 0.5
+MAX_REPEAT = 50
+
+
+@dataclass(frozen=True)
+class Scale:
+    symbols: int
+    days: int
+    chain_symbols: int
+    strikes: int
+    lookups: int
+    paper_symbols: int
+
+
+SCALES = {
+    "small": Scale(symbols=20, days=5, chain_symbols=1, strikes=100, lookups=2_000, paper_symbols=20),
+    "full": Scale(symbols=500, days=30, chain_symbols=5, strikes=300, lookups=20_000, paper_symbols=500),
+}
+
+
+@dataclass
+class Workspace:
+    root: Path
+    scale: Scale
+    seed: int
+    symbols: List[str] = field(default_factory=list)
+    frames: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    chain_ts: Dict[str, np.ndarray] = field(default_factory=dict)
+    trades_path: Optional[Path] = None
+
+
+# name -> setup(ws) returning (run callable, items processed per run)
+STAGES: Dict[str, Callable] = {}
+
+
+def stage(name: str):
+    def wrap(fn):
+        STAGES[name] = fn
+        return fn
+    return wrap
+
+
+def prepare(root: Path, scale: Scale, seed: int = 0) -> Workspace:
+    """Generate the synthetic bars/chains into `root` and point the stores at it.
+
+    Must run before anything touches the lazily created store singletons
+    (`engine.data_layer`, `patterns.indicator_cache`, `patterns.context`).
+    """
+    os.environ.update(BARS_ROOT=str(root / "bars"), CHAINS_ROOT=str(root / "chains"),
+                      INDICATORS_ROOT=str(root / "indicators"),
+                      CONTEXT_CODEC=str(root / "context_codec.json"))
+    from engine.data_layer import get_bar_store, get_chain_store
+
+    ws = Workspace(root, scale, seed, symbols=symbol_names(scale.symbols))
+    ws.frames = synthetic_bars(ws.symbols, scale.days, seed=seed)
+    bars = get_bar_store()
+    for sym, df in ws.frames.items():
+        bars.write_bars(sym, TIMEFRAME, df)
+    chains = get_chain_store()
+    for j, sym in enumerate(ws.symbols[:scale.chain_symbols]):
+        table = synthetic_chains(ws.frames[sym], n_strikes=scale.strikes, seed=seed + j)
+        chains.write_chains(sym, table)
+        ws.chain_ts[sym] = (pd.to_datetime(ws.frames[sym]["ts"], utc=True).dt.tz_localize(None)
+                            .to_numpy().astype("datetime64[ns]").astype(np.int64))
+    return ws
+
+
+@stage("indicators")
+def _indicators(ws: Workspace):
+    from patterns.indicator_cache import IndicatorCache
+
+    def run():
+        root = ws.root / "indicators_cold"
+        shutil.rmtree(root, ignore_errors=True)
+        cache = IndicatorCache(root)
+        for sym, df in ws.frames.items():
+            cache.attach(sym, TIMEFRAME, df)
+    return run, sum(len(df) for df in ws.frames.values())
+
+
+@stage("pattern_scan")
+def _pattern_scan(ws: Workspace):
+    from patterns.scanner import OHLCPanel
+
+    def run():
+        OHLCPanel.from_frames(ws.frames).scan()
+    return run, sum(len(df) for df in ws.frames.values())
+
+
+@stage("chain_lookup")
+def _chain_lookup(ws: Workspace):
+    from engine.data_layer import get_chain_store
+    from strategies.templates import iron_condor
+
+    store = get_chain_store()
+    legs = iron_condor()
+    rng = np.random.default_rng(ws.seed)
+    queries = [(sym, int(t)) for sym, ts in ws.chain_ts.items()
+               for t in rng.choice(ts, ws.scale.lookups // max(1, len(ws.chain_ts)))]
+
+    def run():
+        for sym, t in queries:
+            snap = store.snapshot(sym, t)
+            if snap is not None:
+                snap.select_legs(legs)
+    return run, len(queries)
+
+
+@stage("grid_sim")
+def _grid_sim(ws: Workspace):
+    from engine.data_layer import load_bars
+    from engine.simulator import run_backtest
+    from patterns.indicator_cache import get_indicator_cache
+    from patterns.scanner import pattern_signal
+
+    strategies = {n: pattern_signal(n) for n in ("bullish_engulfing", "hammer")}
+    for sym in ws.symbols:  # warm the indicator cache: this stage times the simulation
+        get_indicator_cache().attach(sym, TIMEFRAME, load_bars(sym, TIMEFRAME))
+    ws.trades_path = ws.root / "trades" / "trades.parquet"
+    ws.trades_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def run():
+        trades = run_backtest(ws.symbols, TIMEFRAME, strategies, None, None, None, None)
+        trades.to_parquet(ws.trades_path, index=False)
+        return len(trades)
+    return run, len(ws.symbols)
+
+
+@stage("summarize")
+def _summarize(ws: Workspace):
+    from backtests.summarize import summarize_to_contextkeys
+
+    if ws.trades_path is None or not ws.trades_path.exists():
+        STAGES["grid_sim"](ws)[0]()
+    n = len(pd.read_parquet(ws.trades_path, columns=["pnl"]))
+
+    def run():
+        summarize_to_contextkeys(ws.trades_path.parent)
+    return run, n
+
+
+def _paper(ws: Workspace, warm: bool):
+    import live.main as service
+    from live.market_data import LocalProvider
+
+    syms = ws.symbols[:ws.scale.paper_symbols]
+    frames = {s: ws.frames[s].set_index("ts").rename(columns=str.capitalize) for s in syms}
+    os.environ.update(UNIVERSE=",".join(syms), INTERVAL=TIMEFRAME, PLACE_ORDERS="false",
+                      LOOKBACK_DAYS=str(ws.scale.days + 5))
+    service._provider = LocalProvider(frames=frames)
+    if warm:
+        service._streams.clear()
+        service.paper()
+
+    def run():
+        if not warm:
+            service._streams.clear()
+        out = service.paper()
+        assert all("error" not in v for v in out["signals"].values()), out["signals"]
+    return run, len(syms)
+
+
+@stage("paper_cold")
+def _paper_cold(ws: Workspace):
+    return _paper(ws, warm=False)
+
+
+@stage("paper_warm")
+def _paper_warm(ws: Workspace):
+    return _paper(ws, warm=True)
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Median time of a fixed NumPy + interpreter workload; `compare` scales stage
+    times by the ratio of these so a slower/busier machine is not a regression."""
+    x = np.random.default_rng(0).standard_normal(1 << 20)
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        np.sort(x)
+        np.cumsum(np.exp(x))
+        acc = 0.0
+        for v in x[:100_000].tolist():
+            acc = 0.9 * acc + v
+        times.append(time.perf_counter() - t)
+    return float(np.median(times))
+
+
+def run_suite(scale: str = "small", stages: Optional[Sequence[str]] = None, repeat: int = 5,
+              seed: int = 0, workdir: Optional[str] = None, min_time_s: float = 1.0) -> dict:
+    """Run `stages` (default: all, in registry order) -> result document.
+
+    Each stage runs at least `repeat` times and until its runs add up to
+    `min_time_s` (at most MAX_REPEAT runs).
+    """
+    names = list(STAGES) if not stages else list(stages)
+    unknown = set(names) - set(STAGES)
+    if unknown:
+        raise ValueError(f"unknown stages: {sorted(unknown)}")
+    root = Path(workdir or tempfile.mkdtemp(prefix="btopt-bench-"))
+    t0 = time.perf_counter()
+    ws = prepare(root, SCALES[scale], seed)
+    doc = {"meta": {"scale": scale, **asdict(SCALES[scale]), "seed": seed, "repeat": repeat,
+                    "git": _git_rev(), "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "python": platform.python_version(), "numpy": np.__version__,
+                    "pandas": pd.__version__, "machine": platform.machine(),
+                    "cpus": os.cpu_count(), "setup_s": round(time.perf_counter() - t0, 3)},
+           "stages": {}}
+    # calibration samples interleaved with the timed runs see the same machine load
+    cal = [calibrate()]
+    try:
+        for name in names:
+            run, items = STAGES[name](ws)
+            times = []
+            # fast stages repeat until they fill `min_time_s`, so their median
+            # rests on enough samples to ride out scheduler noise
+            while len(times) < repeat or (sum(times) < min_time_s and len(times) < MAX_REPEAT):
+                cal.append(calibrate(1))
+                gc.collect()  # as in timeit: no collection of earlier garbage inside the timing
+                gc.disable()
+                try:
+                    t = time.perf_counter()
+                    run()
+                    times.append(time.perf_counter() - t)
+                finally:
+                    gc.enable()
+            med = float(np.median(times))
+            doc["stages"][name] = {"best_s": min(times), "median_s": med, "runs": len(times),
+                                   "items": items, "us_per_item": 1e6 * med / max(items, 1)}
+            print(f"{name:<14} {med:9.4f}s  ({doc['stages'][name]['us_per_item']:.2f} us/item, "
+                  f"median of {len(times)})", file=sys.stderr)
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    doc["meta"]["calibration_s"] = float(np.median(cal))
+    return doc
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD,
+            normalize: bool = True) -> pd.DataFrame:
+    """Per-stage median times vs `baseline`; status is `regression` when the ratio
+    exceeds 1 + threshold, `improved` below 1 - threshold, else `ok`.
+
+    With `normalize`, ratios are divided by the calibration ratio of the two runs.
+    """
+    if current["meta"]["scale"] != baseline["meta"]["scale"]:
+        raise ValueError(f"scale mismatch: {current['meta']['scale']} vs {baseline['meta']['scale']}")
+    speed = 1.0
+    if normalize and baseline["meta"].get("calibration_s") and current["meta"].get("calibration_s"):
+        speed = current["meta"]["calibration_s"] / baseline["meta"]["calibration_s"]
+    rows = []
+    for name, cur in current["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            rows.append((name, np.nan, cur["median_s"], np.nan, "new"))
+            continue
+        ratio = cur["median_s"] / (base["median_s"] * speed) if base["median_s"] > 0 else np.inf
+        status = "regression" if ratio > 1 + threshold else "improved" if ratio < 1 - threshold else "ok"
+        rows.append((name, base["median_s"], cur["median_s"], ratio, status))
+    return pd.DataFrame(rows, columns=["stage", "baseline_s", "current_s", "ratio", "status"])
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Benchmark the backtest/live hot paths on synthetic data.")
+    p.add_argument("--scale", choices=sorted(SCALES), default="small")
+    p.add_argument("--stages", default="", help="comma-separated subset of: " + ",".join(STAGES))
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--workdir", default=None, help="keep generated data here (default: temp dir, removed)")
+    p.add_argument("--save", default=None, help="write results JSON (e.g. a new baseline)")
+    p.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    p.add_argument("--no-normalize", action="store_true",
+                   help="compare raw times instead of scaling by the calibration workload")
+    p.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", DEFAULT_THRESHOLD)),
+                   help="allowed relative slowdown before a stage counts as a regression")
+    args = p.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    doc = run_suite(args.scale, stages, args.repeat, args.seed, args.workdir)
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(args.save).with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(doc, indent=2))
+        os.replace(tmp, args.save)
+    if not args.compare:
+        print(json.dumps(doc["stages"], indent=2))
+        return 0
+    report = compare(doc, json.loads(Path(args.compare).read_text()), args.threshold,
+                     normalize=not args.no_normalize)
+    print(report.to_string(index=False))
+    return 1 if (report["status"] == "regression").any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
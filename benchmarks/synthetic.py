@@ -0,0 +1,97 @@
+"""
+Deterministic, offline synthetic market data for benchmarks.
+
+Bars are regular-session 1m OHLCV (+ spread) from a per-symbol geometric random
+walk; chains are Black-Scholes quotes on a strike ladder around the walk's
+spot, with a linear skew. Everything is a pure function of (seed, symbol
+index), so two runs at the same scale see byte-identical inputs.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.pricing import DAYS_PER_YEAR, bs_greeks, bs_price
+
+SESSION_OPEN_UTC = pd.Timedelta(hours=14, minutes=30)
+SESSION_MINUTES = 390
+EXPIRY_DAYS = (7, 14, 21, 30, 45, 60)
+
+
+def symbol_names(n: int) -> List[str]:
+    return [f"SYN{i:04d}" for i in range(n)]
+
+
+def session_index(days: int, start: str = "2024-01-02", freq_min: int = 1) -> pd.DatetimeIndex:
+    """Regular-session bar open times for `days` weekdays from `start` (UTC)."""
+    days_ns = pd.bdate_range(start, periods=days).to_numpy().astype("datetime64[ns]")
+    minutes = np.arange(0, SESSION_MINUTES, freq_min).astype("timedelta64[m]")
+    opens = days_ns + SESSION_OPEN_UTC.to_timedelta64()
+    return pd.DatetimeIndex((opens[:, None] + minutes[None, :]).ravel()).tz_localize("UTC")
+
+
+def synthetic_bars(symbols: Sequence[str], days: int = 30, seed: int = 0,
+                   start: str = "2024-01-02") -> Dict[str, pd.DataFrame]:
+    """{symbol: bars} with ts/open/high/low/close/volume/spread, one row per minute."""
+    ts = session_index(days, start)
+    n, m = len(ts), len(symbols)
+    rng = np.random.default_rng(seed)
+    s0 = np.exp(rng.uniform(np.log(20.0), np.log(500.0), m))
+    vol = rng.uniform(0.15, 0.6, m) / np.sqrt(252 * SESSION_MINUTES)  # per-minute sigma
+    rets = rng.standard_normal((n, m)) * vol
+    rets[::SESSION_MINUTES] *= 8.0  # overnight gap on each session open
+    close = s0 * np.exp(np.cumsum(rets, axis=0))
+    open_ = np.vstack([s0, close[:-1]])
+    wick = np.abs(rng.standard_normal((2, n, m))) * vol * close
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+    volume = rng.lognormal(8.0, 1.0, (n, m)).astype(np.int64)
+    spread = close * rng.uniform(1e-4, 5e-4, m) * (1.0 + 0.5 * rng.random((n, m)))
+    return {s: pd.DataFrame({"ts": ts, "open": open_[:, j], "high": high[:, j], "low": low[:, j],
+                             "close": close[:, j], "volume": volume[:, j], "spread": spread[:, j]})
+            for j, s in enumerate(symbols)}
+
+
+def synthetic_chains(bars: pd.DataFrame, n_strikes: int = 200, every: int = 30,
+                     expiries: Sequence[int] = EXPIRY_DAYS, base_iv: float = 0.3,
+                     seed: int = 0) -> pd.DataFrame:
+    """Long chain table (`ChainStore.write_chains` layout) sampled every `every` bars.
+
+    Each snapshot quotes calls and puts on `n_strikes` strikes (50%..150% of
+    spot) for every expiry in `expiries` (days ahead of the snapshot date).
+    """
+    rng = np.random.default_rng(seed)
+    snap = bars.iloc[::every]
+    ts = pd.to_datetime(snap["ts"], utc=True).dt.tz_localize(None).to_numpy().astype("datetime64[ns]")
+    spot = snap["close"].to_numpy(np.float64)
+    moneyness = np.linspace(0.5, 1.5, n_strikes)
+    step = np.where(spot > 100, 1.0, 0.5)
+    shape = (len(spot), len(expiries), 2, n_strikes)
+
+    S = np.broadcast_to(spot[:, None, None, None], shape)
+    K = np.broadcast_to(np.round(spot[:, None] * moneyness[None, :] / step[:, None])[:, None, None, :]
+                        * step[:, None, None, None], shape)
+    day = ts.astype("datetime64[D]")
+    expiry = day[:, None] + np.asarray(expiries, dtype="timedelta64[D]")[None, :]
+    T = (expiry - ts[:, None]).astype("timedelta64[s]").astype(np.float64) / 86_400 / DAYS_PER_YEAR
+    T = np.broadcast_to(T[:, :, None, None], shape)
+    is_call = np.broadcast_to(np.array([True, False])[None, None, :, None], shape)
+    iv = base_iv * (1.0 - 0.4 * (K / S - 1.0)) + 0.01 * rng.standard_normal(shape)
+    iv = np.clip(iv, 0.05, 2.0)
+    price = bs_price(S, K, T, iv, is_call)
+    half = np.maximum(0.01, 0.02 * price) / 2.0
+    return pd.DataFrame({
+        "ts": np.broadcast_to(ts[:, None, None, None], shape).ravel(),
+        "underlying": S.ravel(),
+        "expiry": np.broadcast_to(expiry[:, :, None, None], shape).ravel(),
+        "opt_type": np.where(is_call.ravel(), "call", "put"),
+        "strike": K.ravel(),
+        "bid": np.maximum(price - half, 0.0).ravel(),
+        "ask": (price + half).ravel(),
+        "delta": bs_greeks(S, K, T, iv, is_call)["delta"].ravel(),
+        "iv": iv.ravel(),
+        "oi": rng.integers(0, 5000, shape).ravel(),
+        "volume": rng.integers(0, 1000, shape).ravel(),
+    })
@@ -0,0 +1,243 @@
+"""
+Local OHLCV bar store.
+
+Bars live as Parquet files partitioned by timeframe/symbol/month:
+
+    <root>/<timeframe>/<SYMBOL>/<YYYY-MM>.parquet
+
+Reads only open the months that overlap the requested range, memory-map the
+files, push the date range down to row-group statistics and project just the
+requested columns. Decoded partitions are kept in a bounded LRU so repeated
+grid cells over the same symbol don't go back to disk.
+
+Timeframes that aren't stored natively are derived from the `derive_from` (1m)
+bars on first read, session-aligned by `engine.resample`, and written back as
+ordinary partitions next to a `_derived.json` marker holding the base month
+mtimes and the end of the last complete bar. Later reads only resample base
+months that changed: an append to the newest month resumes from that watermark,
+any other change re-derives from the start of the oldest changed month.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.timeframes import interval_delta
+from utils.trading_calendar import get_calendar
+
+from .resample import resample_bars
+
+BAR_COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+DERIVED_MARKER = "_derived.json"
+ROW_GROUP_ROWS = 1024  # ~2.5 sessions of 1m bars per row group -> useful pushdown
+
+
+def _utc(ts) -> Optional[pd.Timestamp]:
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def _month_bounds(month: str) -> tuple[pd.Timestamp, pd.Timestamp]:
+    lo = pd.Timestamp(f"{month}-01", tz="UTC")
+    return lo, lo + pd.offsets.MonthBegin(1)
+
+
+class _LRU:
+    """Byte-bounded LRU of decoded frames; thread-safe."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[tuple, tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, df: pd.DataFrame):
+        size = int(df.memory_usage(index=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._items[key] = (df, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, sz) = self._items.popitem(last=False)
+                self.nbytes -= sz
+
+    def drop(self, pred):
+        with self._lock:
+            for key in [k for k in self._items if pred(k)]:
+                self.nbytes -= self._items.pop(key)[1]
+
+
+class BarStore:
+    def __init__(self, root: str | Path = "data/bars", cache_bytes: int = 512 * 2**20,
+                 derive_from: Optional[str] = "1m", calendar=None):
+        self.root = Path(root)
+        self.cache = _LRU(cache_bytes)
+        self.derive_from = derive_from
+        self.calendar = calendar
+        self._derive_locks: dict[tuple, threading.Lock] = {}
+        self._derive_guard = threading.Lock()
+
+    # ---------- layout ----------
+
+    def partition_dir(self, symbol: str, timeframe: str) -> Path:
+        return self.root / timeframe / symbol.upper()
+
+    def months(self, symbol: str, timeframe: str) -> list[str]:
+        d = self.partition_dir(symbol, timeframe)
+        if not d.exists():
+            return []
+        return sorted(p.stem for p in d.glob("*.parquet"))
+
+    # ---------- write ----------
+
+    def write_bars(self, symbol: str, timeframe: str, bars: pd.DataFrame) -> int:
+        """Merge `bars` (must have a `ts` column) into the month partitions.
+
+        Rows for timestamps already stored are replaced. Returns rows written.
+        """
+        if bars.empty:
+            return 0
+        df = bars.copy()
+        df["ts"] = pd.to_datetime(df["ts"], utc=True)
+        d = self.partition_dir(symbol, timeframe)
+        d.mkdir(parents=True, exist_ok=True)
+        months = df["ts"].dt.strftime("%Y-%m")
+        for month, part in df.groupby(months, sort=True):
+            path = d / f"{month}.parquet"
+            if path.exists():
+                old = pq.read_table(path, memory_map=True).to_pandas()
+                part = pd.concat([old, part], ignore_index=True)
+            part = (part.drop_duplicates("ts", keep="last")
+                        .sort_values("ts", kind="stable")
+                        .reset_index(drop=True))
+            tmp = path.with_suffix(".parquet.tmp")
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp,
+                           row_group_size=ROW_GROUP_ROWS)
+            os.replace(tmp, path)
+        sym = symbol.upper()
+        self.cache.drop(lambda k: k[0] == sym and k[1] == timeframe)
+        return len(df)
+
+    # ---------- derived timeframes ----------
+
+    def derive(self, symbol: str, timeframe: str) -> int:
+        """Bring the derived `timeframe` partitions up to date with the base bars.
+
+        No-op for natively stored timeframes. Returns rows written.
+        """
+        base = self.derive_from
+        symbol = symbol.upper()
+        if base is None or timeframe == base:
+            return 0
+        d = self.partition_dir(symbol, timeframe)
+        marker = d / DERIVED_MARKER
+        if not marker.exists() and self.months(symbol, timeframe):
+            return 0
+        base_dir = self.partition_dir(symbol, base)
+        stamps = {m: (base_dir / f"{m}.parquet").stat().st_mtime_ns for m in self.months(symbol, base)}
+        if not stamps:
+            return 0
+        with self._derive_guard:
+            lock = self._derive_locks.setdefault((symbol, timeframe), threading.Lock())
+        with lock:
+            meta = json.loads(marker.read_text()) if marker.exists() else {}
+            seen = meta.get("base_mtime_ns", {})
+            changed = [m for m, t in stamps.items() if seen.get(m) != t]
+            if not changed:
+                return 0
+            through = _utc(meta.get("through"))
+            start = _month_bounds(min(changed))[0]
+            # only an append to the newest month can resume from the watermark;
+            # any older month that changed is rebuilt from its first bar
+            if changed == [max(stamps)] and through is not None and through > start:
+                start = through
+            if not marker.exists():  # claim the timeframe as derived before writing parts
+                d.mkdir(parents=True, exist_ok=True)
+                marker.write_text("{}")
+            cal = self.calendar or get_calendar()
+            out = resample_bars(self.read(symbol, base, start=start), timeframe, base=base,
+                                calendar=cal)
+            n = self.write_bars(symbol, timeframe, out)
+            if len(out):
+                _, _, hi = cal.bar_bounds(out["ts"].iloc[-1:], interval_delta(timeframe))
+                through = pd.Timestamp(int(hi[0]), tz="UTC")
+            tmp = marker.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps({"base": base, "base_mtime_ns": stamps,
+                                       "through": through.isoformat() if through is not None else None}))
+            os.replace(tmp, marker)
+            return n
+
+    # ---------- read ----------
+
+    def _read_month(self, symbol: str, timeframe: str, month: str,
+                    columns: Optional[tuple[str, ...]], lo, hi) -> pd.DataFrame:
+        key = (symbol, timeframe, month, columns, lo, hi)
+        df = self.cache.get(key)
+        if df is not None:
+            return df
+        filters = []
+        if lo is not None:
+            filters.append(("ts", ">=", lo))
+        if hi is not None:
+            filters.append(("ts", "<", hi))
+        table = pq.read_table(self.partition_dir(symbol, timeframe) / f"{month}.parquet",
+                              columns=list(columns) if columns else None,
+                              filters=filters or None,
+                              memory_map=True)
+        df = table.to_pandas()
+        self.cache.put(key, df)
+        return df
+
+    def read(self, symbol: str, timeframe: str, start=None, end=None,
+             columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Bars for [start, end) sorted by `ts`.
+
+        `columns=None` reads every stored column; otherwise `ts` is always included.
+        """
+        symbol = symbol.upper()
+        if self.derive_from is not None and timeframe != self.derive_from:
+            self.derive(symbol, timeframe)
+        start, end = _utc(start), _utc(end)
+        cols = tuple(dict.fromkeys(["ts", *columns])) if columns else None
+        frames = []
+        for month in self.months(symbol, timeframe):
+            m_lo, m_hi = _month_bounds(month)
+            if (start is not None and m_hi <= start) or (end is not None and m_lo >= end):
+                continue
+            # Interior months are read whole so the cache entry is shared across ranges.
+            lo = start if start is not None and start > m_lo else None
+            hi = end if end is not None and end < m_hi else None
+            frames.append(self._read_month(symbol, timeframe, month, cols, lo, hi))
+        if not frames:
+            return pd.DataFrame({c: pd.Series(dtype="datetime64[ns, UTC]" if c == "ts" else "float64")
+                                 for c in (cols or BAR_COLUMNS)})
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].copy()
+
+    def read_many(self, symbols: Iterable[str], timeframe: str, **kwargs) -> dict[str, pd.DataFrame]:
+        return {s: self.read(s, timeframe, **kwargs) for s in symbols}
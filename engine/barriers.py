@@ -0,0 +1,140 @@
+"""
+Vectorized triple-barrier / first-passage engine.
+
+For every entry the forward path is materialized once as an (entries x horizon)
+window. Running extremes of that window are monotone, so the first bar at which
+any barrier level is touched is simply the count of bars still short of it.
+All levels are resolved in one broadcast, and every (target, stop, time) grid
+cell is then derived from those hit indices without touching the path again.
+
+`price_barrier_grid` runs the TP x SL x MAXBARS grid on the underlying's price
+path; `exit_rule_grid` runs the `strategies.exits.ExitRules` grid (profit
+target x max loss x time stop) on an option structure's mark path.
+
+Bar offsets are 0-based: offset k is bar `entry + 1 + k`.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+REASON_TP, REASON_SL, REASON_TIME, REASON_OPEN = 0, 1, 2, 3
+REASONS = np.array(["tp", "sl", "time", "open"])
+
+
+def forward_windows(x: np.ndarray, entries: np.ndarray, horizon: int, fill=np.nan) -> np.ndarray:
+    """(n_entries, horizon) matrix of x[e+1 : e+1+horizon], padded with `fill` past the end."""
+    padded = np.concatenate([np.asarray(x, dtype=np.float64), np.full(horizon, fill)])
+    return padded[entries[:, None] + 1 + np.arange(horizon)]
+
+
+def first_passage_up(running_max: np.ndarray, levels) -> np.ndarray:
+    """First offset where a nondecreasing row reaches each level -> (n, L); horizon if never."""
+    levels = np.asarray(levels, dtype=np.float64)
+    return (running_max[:, :, None] < levels[None, None, :]).sum(axis=1)
+
+
+def first_passage_down(running_min: np.ndarray, levels) -> np.ndarray:
+    """First offset where a nonincreasing row falls to each level -> (n, L); horizon if never."""
+    levels = np.asarray(levels, dtype=np.float64)
+    return (running_min[:, :, None] > levels[None, None, :]).sum(axis=1)
+
+
+def resolve_grid(up_hit: np.ndarray, down_hit: np.ndarray, time_idx: np.ndarray,
+                 n_avail: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Combine hit offsets into exit offsets/reasons for every grid cell.
+
+    up_hit (n, I), down_hit (n, J), time_idx (n, K) or (K,) -> arrays of shape (n, I, J, K).
+    A stop and target touched on the same bar resolve to the stop (conservative).
+    Exits that would happen beyond the `n_avail` bars seen so far are "open".
+    """
+    n = up_hit.shape[0]
+    tp = up_hit[:, :, None, None]
+    sl = down_hit[:, None, :, None]
+    tm = np.broadcast_to(time_idx, (n, time_idx.shape[-1]))[:, None, None, :]
+    exit_k = np.minimum(np.minimum(tp, sl), tm)
+    reason = np.where(sl <= np.minimum(tp, tm), REASON_SL,
+                      np.where(tp <= tm, REASON_TP, REASON_TIME))
+    avail = n_avail[:, None, None, None]
+    reason = np.where(exit_k >= avail, REASON_OPEN, reason)
+    exit_k = np.minimum(exit_k, np.maximum(avail - 1, 0))
+    return exit_k, reason
+
+
+def price_barrier_grid(close: np.ndarray, high: np.ndarray, low: np.ndarray, entries: np.ndarray,
+                       tp_grid, sl_grid, maxbars_grid, side: int = 1,
+                       open_: Optional[np.ndarray] = None) -> dict:
+    """Evaluate TP x SL x MAXBARS barriers (fractions of entry price) for every entry.
+
+    `side` is +1 for long, -1 for short. Returns per-cell arrays of shape
+    (n_entries, len(tp), len(sl), len(maxbars)): exit offset, reason code, and
+    exit/MAE/MFE as signed returns on the entry price. With `open_`, a stop the
+    bar gaps through fills at that bar's open instead of the stop level.
+    """
+    entries = np.asarray(entries, dtype=np.int64)
+    tp = np.asarray(tp_grid, dtype=np.float64)
+    sl = np.asarray(sl_grid, dtype=np.float64)
+    mb = np.asarray(maxbars_grid, dtype=np.int64)
+    horizon = int(mb.max())
+    entry_px = np.asarray(close, dtype=np.float64)[entries]
+
+    hi = forward_windows(high, entries, horizon) / entry_px[:, None] - 1.0
+    lo = forward_windows(low, entries, horizon) / entry_px[:, None] - 1.0
+    cl = forward_windows(close, entries, horizon) / entry_px[:, None] - 1.0
+    fav, adv = (hi, lo) if side > 0 else (-lo, -hi)
+    fav = np.maximum.accumulate(np.nan_to_num(fav, nan=-np.inf), axis=1)
+    adv = np.minimum.accumulate(np.nan_to_num(adv, nan=np.inf), axis=1)
+
+    n_avail = np.minimum(horizon, len(close) - entries - 1)
+    exit_k, reason = resolve_grid(first_passage_up(fav, tp), first_passage_down(adv, -sl),
+                                  mb - 1, n_avail)
+
+    rows = np.arange(len(entries))[:, None, None, None]
+    sl_fill = -sl[None, None, :, None]
+    if open_ is not None:
+        op = side * (forward_windows(open_, entries, horizon) / entry_px[:, None] - 1.0)
+        sl_fill = np.fmin(sl_fill, op[rows, exit_k])  # gap through the stop
+    ret = np.where(reason == REASON_TP, tp[None, :, None, None],
+                   np.where(reason == REASON_SL, sl_fill, side * cl[rows, exit_k]))
+    ok = n_avail[:, None, None, None] > 0
+    return {
+        "exit_k": exit_k,
+        "reason": reason,
+        "ret": np.where(ok, ret, 0.0),
+        "mae": np.where(ok, np.minimum(adv[rows, exit_k], 0.0), 0.0),
+        "mfe": np.where(ok, np.maximum(fav[rows, exit_k], 0.0), 0.0),
+    }
+
+
+def exit_rule_grid(rel: np.ndarray, days_left: np.ndarray, n_avail: np.ndarray, profit_target,
+                   max_loss, time_stop) -> dict:
+    """Evaluate ExitRules grids on structure mark paths.
+
+    rel (n, H): structure P&L over |entry premium| at each bar after entry;
+    days_left (n, H): days to expiry at those bars (nonincreasing); only the first
+    `n_avail` offsets of a row are real. A target fires at rel >= profit_target, a
+    stop at rel <= -max_loss and the time stop on the first bar with days_left <=
+    time_stop, with the stop winning ties as in `PositionBook.check_exits`.
+    Returns per-cell arrays of shape (n, len(profit_target), len(max_loss),
+    len(time_stop)): exit offset, reason code, and exit/MAE/MFE as rel at the exit
+    bar's mark.
+    """
+    rel = np.asarray(rel, dtype=np.float64)
+    n, horizon = rel.shape
+    past = np.arange(horizon)[None, :] >= np.asarray(n_avail)[:, None]
+    fav = np.maximum.accumulate(np.where(past, -np.inf, rel), axis=1)
+    adv = np.minimum.accumulate(np.where(past, np.inf, rel), axis=1)
+    left = np.minimum.accumulate(np.where(past, np.inf, np.asarray(days_left, dtype=np.float64)), axis=1)
+    exit_k, reason = resolve_grid(first_passage_up(fav, profit_target),
+                                  first_passage_down(adv, -np.asarray(max_loss, dtype=np.float64)),
+                                  first_passage_down(left, time_stop), n_avail)
+    rows = np.arange(n)[:, None, None, None]
+    ok = n_avail[:, None, None, None] > 0
+    return {
+        "exit_k": exit_k,
+        "reason": reason,
+        "ret": np.where(ok, rel[rows, exit_k], 0.0),
+        "mae": np.where(ok, np.minimum(adv[rows, exit_k], 0.0), 0.0),
+        "mfe": np.where(ok, np.maximum(fav[rows, exit_k], 0.0), 0.0),
+    }
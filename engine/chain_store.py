@@ -0,0 +1,253 @@
+"""
+As-of indexed option chain store.
+
+Each symbol is a directory of flat NumPy column files:
+
+    <root>/<SYMBOL>/ts.npy          int64 ns, one entry per snapshot (sorted)
+    <root>/<SYMBOL>/offsets.npy     int64, len(ts)+1 row offsets into the columns
+    <root>/<SYMBOL>/underlying.npy  float64 spot per snapshot
+    <root>/<SYMBOL>/<column>.npy    contract columns, one row per contract
+
+Within a snapshot contracts are sorted by (expiry, opt_type, strike), so a
+`Leg.dte_rule` bucket and its call/put block are two `searchsorted` calls and
+the strike rule is a vectorized search over one expiry/type block. Columns are
+opened with `mmap_mode="r"`, so loading a symbol costs no decode.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from strategies.legs import Leg
+
+NS_PER_DAY = 86_400 * 10**9
+CALL, PUT = 0, 1
+CONTRACT_COLUMNS = {
+    "expiry_day": np.int32,  # days since epoch
+    "opt_type": np.int8,     # CALL / PUT
+    "strike": np.float64,
+    "bid": np.float64,
+    "ask": np.float64,
+    "delta": np.float64,
+    "iv": np.float64,
+    "oi": np.int64,
+    "volume": np.int64,
+}
+
+
+def _ns(ts) -> int:
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    t = pd.Timestamp(ts)
+    if t.tzinfo is None:
+        t = t.tz_localize("UTC")
+    return t.value
+
+
+def _contract_key(expiry_day, opt_type, strike) -> np.ndarray:
+    """Float key ordered like the (expiry, opt_type, strike) row order of a snapshot."""
+    return (expiry_day.astype(np.float64) * 2.0 + opt_type) * 2.0**24 + strike
+
+
+class ChainSnapshot:
+    """Read-only view of one chain snapshot; columns are slices of the store arrays."""
+
+    __slots__ = ("symbol", "ts", "underlying", "cols")
+
+    def __init__(self, symbol: str, ts: int, underlying: float, cols: dict):
+        self.symbol = symbol
+        self.ts = ts
+        self.underlying = underlying
+        self.cols = cols
+
+    def __len__(self):
+        return len(self.cols["strike"])
+
+    def __getitem__(self, name):
+        return self.cols[name]
+
+    @property
+    def mid(self) -> np.ndarray:
+        return (self.cols["bid"] + self.cols["ask"]) / 2.0
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame({k: np.asarray(v) for k, v in self.cols.items()})
+        df["expiry"] = pd.to_datetime(df.pop("expiry_day"), unit="D")
+        df["opt_type"] = np.where(df["opt_type"] == CALL, "call", "put")
+        return df
+
+    def expiry_block(self, dte_rule) -> tuple[int, int]:
+        """[lo, hi) rows of the first expiry whose DTE falls in `dte_rule`."""
+        exp = self.cols["expiry_day"]
+        today = self.ts // NS_PER_DAY
+        lo = int(np.searchsorted(exp, today + dte_rule[0], side="left"))
+        if lo >= len(exp) or exp[lo] > today + dte_rule[1]:
+            return lo, lo
+        return lo, int(np.searchsorted(exp, exp[lo], side="right"))
+
+    def select(self, leg: Leg) -> int:
+        """Row index of the contract `leg` resolves to, or -1 if none qualifies."""
+        lo, hi = self.expiry_block(leg.dte_rule)
+        if lo == hi:
+            return -1
+        code = CALL if leg.opt_type == "call" else PUT
+        types = self.cols["opt_type"][lo:hi]
+        a = lo + int(np.searchsorted(types, code, side="left"))
+        b = lo + int(np.searchsorted(types, code, side="right"))
+        if a == b:
+            return -1
+        rule = leg.strike_rule
+        if rule["type"] == "delta":
+            d = np.abs(np.abs(self.cols["delta"][a:b]) - rule["value"])
+            i = int(d.argmin())
+            if d[i] != d[i]:  # argmin lands on a NaN only if the block has missing deltas
+                if np.isnan(d).all():
+                    return -1
+                i = int(np.nanargmin(d))
+            return a + i
+        if rule["type"] == "pct_otm":
+            sign = 1.0 if code == CALL else -1.0
+            target = self.underlying * (1.0 + sign * rule["value"] / 100.0)
+            strikes = self.cols["strike"][a:b]
+            i = int(np.searchsorted(strikes, target))
+            if i == len(strikes) or (i > 0 and target - strikes[i - 1] <= strikes[i] - target):
+                i -= 1
+            return a + i
+        raise ValueError(f"unknown strike rule: {rule['type']}")
+
+    def select_legs(self, legs: list[Leg]) -> np.ndarray:
+        return np.array([self.select(leg) for leg in legs], dtype=np.int64)
+
+
+class ChainStore:
+    def __init__(self, root: str | Path = "data/chains", latency_samples: int = 4096):
+        self.root = Path(root)
+        self._symbols: dict[str, dict] = {}
+        self._lat = np.zeros(latency_samples, dtype=np.int64)
+        self._lat_n = 0
+
+    # ---------- write ----------
+
+    def write_chains(self, symbol: str, chains: pd.DataFrame) -> int:
+        """Build the on-disk index for `symbol` from a long chain table.
+
+        Required columns: ts, underlying, expiry, opt_type ("call"/"put"), strike.
+        Missing quote/greek columns are stored as NaN (or 0 for oi/volume).
+        Returns the number of snapshots written.
+        """
+        df = chains.copy()
+        df["ts"] = (pd.to_datetime(df["ts"], utc=True).dt.tz_localize(None)
+                    .to_numpy().astype("datetime64[ns]").astype(np.int64))
+        df["expiry_day"] = (pd.to_datetime(df["expiry"]).values.astype("datetime64[D]")
+                            .astype(np.int64))
+        df["opt_type"] = np.where(df["opt_type"].str.lower().str.startswith("c"), CALL, PUT)
+        for col, dtype in CONTRACT_COLUMNS.items():
+            if col not in df:
+                df[col] = 0 if np.issubdtype(dtype, np.integer) else np.nan
+        df = df.sort_values(["ts", "expiry_day", "opt_type", "strike"], kind="stable")
+
+        ts = df["ts"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, ts[1:] != ts[:-1]])
+        offsets = np.r_[starts, len(df)].astype(np.int64)
+
+        out = self.root / symbol.upper()
+        tmp = out.with_name(out.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "ts.npy", ts[starts].astype(np.int64))
+        np.save(tmp / "offsets.npy", offsets)
+        np.save(tmp / "underlying.npy", df["underlying"].to_numpy(np.float64)[starts])
+        for col, dtype in CONTRACT_COLUMNS.items():
+            np.save(tmp / f"{col}.npy", df[col].fillna(0).to_numpy(dtype)
+                    if np.issubdtype(dtype, np.integer) else df[col].to_numpy(dtype))
+        shutil.rmtree(out, ignore_errors=True)
+        os.replace(tmp, out)
+        self._symbols.pop(symbol.upper(), None)
+        return len(starts)
+
+    # ---------- read ----------
+
+    def _open(self, symbol: str) -> Optional[dict]:
+        arrs = self._symbols.get(symbol)
+        if arrs is None:
+            d = self.root / symbol
+            if not (d / "ts.npy").exists():
+                return None
+            names = ["ts", "offsets", "underlying", *CONTRACT_COLUMNS]
+            # np.asarray drops the memmap subclass: same mapped buffer, cheaper slicing.
+            arrs = {n: np.asarray(np.load(d / f"{n}.npy", mmap_mode="r")) for n in names}
+            self._symbols[symbol] = arrs
+        return arrs
+
+    def contract_count(self, symbol: str) -> int:
+        """Total contract rows stored for `symbol` across all snapshots."""
+        arrs = self._open(symbol.upper())
+        return int(arrs["offsets"][-1]) if arrs is not None else 0
+
+    def snapshot(self, symbol: str, ts, max_age_s: Optional[float] = None) -> Optional[ChainSnapshot]:
+        """Latest snapshot at or before `ts` (None if there is none / it is too stale)."""
+        t0 = time.perf_counter_ns()
+        symbol = symbol.upper()
+        arrs = self._open(symbol)
+        snap = None
+        if arrs is not None:
+            t = _ns(ts)
+            i = int(np.searchsorted(arrs["ts"], t, side="right")) - 1
+            if i >= 0 and (max_age_s is None or t - arrs["ts"][i] <= max_age_s * 1e9):
+                a, b = int(arrs["offsets"][i]), int(arrs["offsets"][i + 1])
+                snap = ChainSnapshot(symbol, int(arrs["ts"][i]), float(arrs["underlying"][i]),
+                                     {c: arrs[c][a:b] for c in CONTRACT_COLUMNS})
+        self._lat[self._lat_n % len(self._lat)] = time.perf_counter_ns() - t0
+        self._lat_n += 1
+        return snap
+
+    def asof_index(self, symbol: str, ts) -> np.ndarray:
+        """Index of the latest snapshot at or before each of `ts` (int64 ns array), -1 if none."""
+        arrs = self._open(symbol.upper())
+        ts = np.asarray(ts, dtype=np.int64)
+        if arrs is None:
+            return np.full(len(ts), -1, dtype=np.int64)
+        return np.searchsorted(arrs["ts"], ts, side="right").astype(np.int64) - 1
+
+    def quotes(self, symbol: str, snaps, expiry_day, opt_type, strike) -> tuple[np.ndarray, np.ndarray]:
+        """(bid, ask) of the contracts (expiry_day, opt_type, strike), each of length m,
+        in each snapshot of `snaps` (indices from `asof_index`) -> two (len(snaps), m)
+        arrays, NaN where a snapshot doesn't list the contract (or `snaps` is -1).
+
+        Rows of a snapshot are sorted by (expiry, type, strike), so every contract
+        is found with one `searchsorted` over a composite key per snapshot.
+        """
+        arrs = self._open(symbol.upper())
+        snaps = np.asarray(snaps, dtype=np.int64)
+        want = _contract_key(np.asarray(expiry_day), np.asarray(opt_type),
+                             np.asarray(strike, dtype=np.float64))
+        bid = np.full((len(snaps), len(want)), np.nan)
+        ask = np.full((len(snaps), len(want)), np.nan)
+        if arrs is None:
+            return bid, ask
+        for j, i in enumerate(snaps.tolist()):
+            a, b = (int(arrs["offsets"][i]), int(arrs["offsets"][i + 1])) if i >= 0 else (0, 0)
+            if a == b:
+                continue
+            have = _contract_key(arrs["expiry_day"][a:b], arrs["opt_type"][a:b], arrs["strike"][a:b])
+            pos = np.minimum(np.searchsorted(have, want), b - a - 1)
+            hit = have[pos] == want
+            bid[j, hit] = arrs["bid"][a + pos[hit]]
+            ask[j, hit] = arrs["ask"][a + pos[hit]]
+        return bid, ask
+
+    def latency_stats(self) -> dict:
+        """Lookup latency over the most recent samples, in microseconds."""
+        n = min(self._lat_n, len(self._lat))
+        if n == 0:
+            return {"lookups": 0}
+        s = self._lat[:n] / 1e3
+        return {"lookups": self._lat_n, "mean_us": float(s.mean()),
+                "p50_us": float(np.percentile(s, 50)), "p99_us": float(np.percentile(s, 99)),
+                "max_us": float(s.max())}
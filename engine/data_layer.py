@@ -1,5 +1,39 @@
-def load_bars(symbol: str, timeframe: str):
-    raise NotImplementedError
+import os
+from typing import Optional, Sequence
 
-def load_option_chain_snapshot(symbol: str, ts):
-    raise NotImplementedError
+from .bar_store import BarStore
+from .chain_store import ChainStore
+
+_bar_store: Optional[BarStore] = None
+_chain_store: Optional[ChainStore] = None
+
+
+def get_bar_store() -> BarStore:
+    global _bar_store
+    if _bar_store is None:
+        _bar_store = BarStore(os.getenv("BARS_ROOT", "data/bars"),
+                              cache_bytes=int(os.getenv("BAR_CACHE_MB", "512")) * 2**20)
+    return _bar_store
+
+
+def get_chain_store() -> ChainStore:
+    global _chain_store
+    if _chain_store is None:
+        _chain_store = ChainStore(os.getenv("CHAINS_ROOT", "data/chains"))
+    return _chain_store
+
+
+def load_bars(symbol: str, timeframe: str, start=None, end=None,
+              columns: Optional[Sequence[str]] = None):
+    return get_bar_store().read(symbol, timeframe, start=start, end=end, columns=columns)
+
+
+def load_option_chain_snapshot(symbol: str, ts, max_age_s: Optional[float] = None,
+                               model_greeks: bool = False):
+    """As-of chain snapshot; `model_greeks` fills missing iv/delta from mid quotes."""
+    snap = get_chain_store().snapshot(symbol, ts, max_age_s=max_age_s)
+    if snap is not None and model_greeks:
+        from .pricing import with_model_greeks
+        snap = with_model_greeks(snap, r=float(os.getenv("RISK_FREE_RATE", "0.0")),
+                                 q=float(os.getenv("DIVIDEND_YIELD", "0.0")))
+    return snap
@@ -1,12 +1,80 @@
 from dataclasses import dataclass
 
+import numpy as np
+
 @dataclass
 class LiquidityGates:
+    """Entry gates on a fill.
+
+    An entry is admitted when its spread is at most `max_spread_pct` of its price,
+    its volume is at least `min_volume` and its open interest at least `min_oi`;
+    a missing spread, volume or open interest admits. `min_oi` only applies to
+    option legs: backtests on the underlying's bars have no open interest, so
+    `run_backtest` gates on spread and volume alone.
+    """
     max_spread_pct: float = 0.05
     min_oi: int = 100
     min_volume: int = 20
 
+    def admits(self, spread, price, volume=None, open_interest=None) -> np.ndarray:
+        """Vectorized entry gate over spread / price / volume / open-interest arrays."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ok = ~(np.asarray(spread, dtype=np.float64) / np.asarray(price, dtype=np.float64)
+                   > self.max_spread_pct)
+        if volume is not None:
+            ok &= ~(np.asarray(volume, dtype=np.float64) < self.min_volume)
+        if open_interest is not None:
+            ok &= ~(np.asarray(open_interest, dtype=np.float64) < self.min_oi)
+        return ok
+
 def price_with_slippage(mid: float, spread: float, side: str, slip_frac_of_half=0.3) -> float:
     half = spread / 2.0
     slip = slip_frac_of_half * half
     return mid + slip if side == "buy" else mid - slip
+
+# Fill components of one leg, so P&L can be re-priced (and entries re-gated)
+# later: mid prices and spreads of both fills, entry volume, side, quantity,
+# slippage fraction and fees (option legs add `entry_oi`). A trade on the
+# underlying is a single leg stored under these names; a multi-leg structure
+# stores one set per leg, prefixed `leg0_`, `leg1_`, ... (`leg_fill_columns`).
+FILL_COLUMNS = ["entry_price", "exit_price", "entry_spread", "exit_spread", "entry_volume",
+                "side", "qty", "slip_frac", "fees"]
+
+
+def leg_fill_columns(n_legs: int) -> list[str]:
+    return [f"leg{i}_{c}" for i in range(n_legs) for c in FILL_COLUMNS]
+
+
+def fill_legs(columns) -> list[str]:
+    """Column prefixes of the legs stored in a trade table ("" for a single leg)."""
+    n = 0
+    while f"leg{n}_entry_spread" in columns:
+        n += 1
+    return [f"leg{i}_" for i in range(n)] if n else [""]
+
+
+def slippage_cost(entry_spread, exit_spread, qty, slip_frac_of_half=0.3):
+    """Vectorized slippage paid on both fills of a round trip (see `price_with_slippage`)."""
+    return slip_frac_of_half * (np.asarray(entry_spread) + np.asarray(exit_spread)) / 2.0 * qty
+
+
+def trade_slippage(trades, slip_mult=1.0) -> np.ndarray:
+    """Round-trip slippage of every trade, summed over its legs, with each leg's
+    stored `slip_frac` scaled by `slip_mult`."""
+    total = 0.0
+    for p in fill_legs(trades.columns):
+        total = total + slippage_cost(trades[p + "entry_spread"].to_numpy(np.float64),
+                                      trades[p + "exit_spread"].to_numpy(np.float64),
+                                      trades[p + "qty"].to_numpy(np.float64),
+                                      slip_mult * trades[p + "slip_frac"].to_numpy(np.float64))
+    return np.broadcast_to(total, len(trades)).astype(np.float64)
+
+
+def trade_admits(gates: LiquidityGates, trades) -> np.ndarray:
+    """`gates` over every leg's entry fill; a trade is admitted when all its legs are.
+    Volume / open interest are only gated where the table stores them."""
+    ok = np.ones(len(trades), dtype=bool)
+    for p in fill_legs(trades.columns):
+        ok &= gates.admits(trades[p + "entry_spread"], trades[p + "entry_price"],
+                           trades.get(p + "entry_volume"), trades.get(p + "entry_oi"))
+    return ok
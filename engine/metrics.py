@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+
+import pandas as pd
 
 @dataclass
 class TradeStats:
@@ -9,3 +11,11 @@ class TradeStats:
     mfe: float
     fees: float
     slippage: float
+
+TRADE_STATS_COLUMNS = [f.name for f in fields(TradeStats)]
+
+def trade_stats_from_frame(df: pd.DataFrame) -> list[TradeStats]:
+    """Materialize TradeStats objects from the bulk columns of a trade table."""
+    cols = [df[c].to_numpy() for c in TRADE_STATS_COLUMNS]
+    return [TradeStats(float(p), bool(w), float(r), float(a), float(f), float(fe), float(s))
+            for p, w, r, a, f, fe, s in zip(*cols)]
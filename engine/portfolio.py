@@ -1,5 +1,213 @@
+"""
+Array-backed portfolio.
+
+Positions live in a structure-of-arrays `PositionBook`: one row per leg
+(contract id, side, qty, entry price/time, parent structure) and one row per
+structure (symbol, entry premium, margin, status). Opening, marking, exit-rule
+evaluation and closing work on whole arrays, so a bar costs a handful of NumPy
+calls regardless of how many structures are held.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .barriers import REASON_OPEN, REASON_SL, REASON_TIME, REASON_TP, REASONS
+
+CONTRACT_MULTIPLIER = 100.0
+
+LEG_COLUMNS = {"structure": np.int64, "contract": np.int64, "side": np.int8, "qty": np.int32,
+               "entry_price": np.float64, "entry_ts": np.int64, "mark": np.float64}
+STRUCT_COLUMNS = {"symbol": np.int32, "entry_ts": np.int64, "expiry_day": np.int32,
+                  "premium": np.float64, "margin": np.float64, "open": bool,
+                  "exit_ts": np.int64, "reason": np.int8, "pnl": np.float64}
+
+
+class _Columns:
+    """Growable set of equal-length NumPy columns (amortized doubling)."""
+
+    def __init__(self, schema: dict, capacity: int = 64):
+        self.schema = schema
+        self.n = 0
+        self.cols = {c: np.zeros(capacity, dtype=t) for c, t in schema.items()}
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self.cols[name][:self.n]
+
+    def append(self, **values) -> np.ndarray:
+        m = len(next(iter(values.values())))
+        need = self.n + m
+        cap = len(next(iter(self.cols.values())))
+        if need > cap:
+            cap = max(need, 2 * cap)
+            for c, a in self.cols.items():
+                grown = np.zeros(cap, dtype=a.dtype)
+                grown[:self.n] = a[:self.n]
+                self.cols[c] = grown
+        rows = np.arange(self.n, need)
+        for c in self.cols:
+            if c in values:
+                self.cols[c][rows] = values[c]
+        self.n = need
+        return rows
+
+
+class PositionBook:
+    def __init__(self, multiplier: float = CONTRACT_MULTIPLIER):
+        self.multiplier = multiplier
+        self.legs = _Columns(LEG_COLUMNS)
+        self.structs = _Columns(STRUCT_COLUMNS)
+
+    @property
+    def open_count(self) -> int:
+        return int(self.structs["open"].sum())
+
+    def add(self, symbol, expiry_day, parent, contract, side, qty, price, ts,
+            margin=None) -> np.ndarray:
+        """Append structures; leg arrays carry `parent` = index into the m new structures.
+
+        side is +1 (long) / -1 (short). premium is the net debit paid (negative for
+        credits). Returns the new structure ids.
+        """
+        symbol = np.atleast_1d(np.asarray(symbol, dtype=np.int32))
+        m = len(symbol)
+        parent = np.asarray(parent, dtype=np.int64)
+        side, qty, price = (np.asarray(x) for x in (side, qty, price))
+        premium = np.bincount(parent, weights=side * qty * price * self.multiplier, minlength=m)
+        sids = self.structs.append(symbol=symbol, entry_ts=np.broadcast_to(ts, m),
+                                   expiry_day=np.broadcast_to(expiry_day, m), premium=premium,
+                                   margin=np.zeros(m) if margin is None else margin,
+                                   open=np.ones(m, bool), exit_ts=np.zeros(m, np.int64),
+                                   reason=np.full(m, REASON_OPEN, np.int8), pnl=np.zeros(m))
+        self.legs.append(structure=sids[parent], contract=contract, side=side, qty=qty,
+                         entry_price=price, entry_ts=np.broadcast_to(ts, len(parent)), mark=price)
+        return sids
+
+    def mark(self, contract_ids, prices) -> np.ndarray:
+        """Update open legs' marks from a (contract id -> price) quote table; legs
+        without a quote keep their last mark. Returns unrealized P&L per structure."""
+        legs = self.legs
+        pos = pd.Index(np.asarray(contract_ids)).get_indexer(legs["contract"])
+        quoted = (pos >= 0) & self.structs["open"][legs["structure"]]
+        prices = np.asarray(prices, dtype=np.float64)
+        m = legs["mark"]
+        m[quoted] = np.where(np.isnan(prices[pos[quoted]]), m[quoted], prices[pos[quoted]])
+        return self.unrealized()
+
+    def leg_pnl(self) -> np.ndarray:
+        legs = self.legs
+        return legs["side"] * legs["qty"] * (legs["mark"] - legs["entry_price"]) * self.multiplier
+
+    def unrealized(self) -> np.ndarray:
+        pnl = np.bincount(self.legs["structure"], weights=self.leg_pnl(), minlength=self.structs.n)
+        return np.where(self.structs["open"], pnl, 0.0)
+
+    def market_value(self) -> float:
+        """Liquidation value of open legs (what closing everything would add to cash)."""
+        legs = self.legs
+        live = self.structs["open"][legs["structure"]]
+        return float(np.sum((legs["side"] * legs["qty"] * legs["mark"] * self.multiplier)[live]))
+
+    def check_exits(self, today: float, profit_target_pct: float, max_loss_mult_credit: float,
+                    time_stop_days: float) -> np.ndarray:
+        """`strategies.exits.ExitRules` on current marks -> reason code per structure
+        (REASON_OPEN where nothing fires). Rules scale by |entry premium|; the stop
+        wins a tie with the target, as in `engine.barriers`."""
+        st = self.structs
+        rel = self.unrealized() / np.maximum(np.abs(st["premium"]), 1e-12)
+        reason = np.full(st.n, REASON_OPEN, np.int8)
+        reason[st["expiry_day"] - today <= time_stop_days] = REASON_TIME
+        reason[rel >= profit_target_pct] = REASON_TP
+        reason[rel <= -max_loss_mult_credit] = REASON_SL
+        reason[~st["open"]] = REASON_OPEN
+        return reason
+
+    def close(self, mask, ts) -> float:
+        """Close structures in `mask` at their marks; returns the cash released."""
+        st = self.structs
+        mask = np.asarray(mask, dtype=bool) & st["open"]
+        if not mask.any():
+            return 0.0
+        legs = self.legs
+        pnl = self.unrealized()
+        st["pnl"][mask] = pnl[mask]
+        st["open"][mask] = False
+        st["exit_ts"][mask] = ts
+        closing = mask[legs["structure"]]
+        proceeds = np.sum((legs["side"] * legs["qty"] * legs["mark"] * self.multiplier)[closing])
+        return float(proceeds + st["margin"][mask].sum())
+
+    def attribution(self, symbols=None) -> pd.DataFrame:
+        """Realized and unrealized P&L per symbol code (or label via `symbols`)."""
+        st = self.structs
+        df = pd.DataFrame({"symbol": st["symbol"], "realized": np.where(st["open"], 0.0, st["pnl"]),
+                           "unrealized": self.unrealized(), "open": st["open"]})
+        out = df.groupby("symbol").agg(realized=("realized", "sum"), unrealized=("unrealized", "sum"),
+                                       open_structures=("open", "sum")).reset_index()
+        if symbols is not None:
+            out["symbol"] = np.asarray(symbols, dtype=object)[out["symbol"].to_numpy()]
+        return out
+
+    def structures_frame(self) -> pd.DataFrame:
+        st = self.structs
+        df = pd.DataFrame({c: st[c] for c in STRUCT_COLUMNS})
+        df["reason"] = REASONS[df["reason"].to_numpy()]
+        return df
+
+    def legs_frame(self, open_only: bool = True) -> pd.DataFrame:
+        df = pd.DataFrame({c: self.legs[c] for c in LEG_COLUMNS})
+        return df[self.structs["open"][df["structure"].to_numpy()]] if open_only else df
+
+
 class Portfolio:
-    def __init__(self, starting_cash: float = 100000.0, max_positions: int = 10):
+    def __init__(self, starting_cash: float = 100000.0, max_positions: int = 10,
+                 multiplier: float = CONTRACT_MULTIPLIER):
         self.cash = starting_cash
         self.max_positions = max_positions
-        self.positions = []
+        self.book = PositionBook(multiplier)
+
+    @property
+    def positions(self) -> pd.DataFrame:
+        """Open legs."""
+        return self.book.legs_frame()
+
+    def equity(self) -> float:
+        """Cash plus open legs at their marks plus margin still reserved."""
+        st = self.book.structs
+        return self.cash + self.book.market_value() + float(st["margin"][st["open"]].sum())
+
+    def open_structures(self, symbol, expiry_day, parent, contract, side, qty, price, ts,
+                        margin=None) -> np.ndarray:
+        """Bulk-open candidate structures in priority order.
+
+        The longest prefix that fits both `max_positions` and cash (debit paid plus
+        `margin` reserved, credits received) is opened; returns the new structure
+        ids (fewer than requested when constraints bind).
+        """
+        symbol = np.atleast_1d(np.asarray(symbol, dtype=np.int32))
+        m = len(symbol)
+        parent = np.asarray(parent, dtype=np.int64)
+        side, qty, price = (np.asarray(x) for x in (side, qty, price))
+        margin = np.zeros(m) if margin is None else np.broadcast_to(np.asarray(margin, float), (m,))
+        cost = np.bincount(parent, weights=side * qty * price * self.book.multiplier, minlength=m) + margin
+        fits = (np.arange(1, m + 1) <= self.max_positions - self.book.open_count) & \
+               (self.cash - np.cumsum(cost) >= 0)
+        k = m if fits.all() else int(np.argmin(fits))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64)
+        take = parent < k
+        sids = self.book.add(symbol[:k], np.broadcast_to(expiry_day, m)[:k], parent[take],
+                             np.asarray(contract)[take], side[take], qty[take], price[take], ts, margin[:k])
+        self.cash -= float(cost[:k].sum())
+        return sids
+
+    def mark_and_exit(self, contract_ids, prices, ts, today: float, profit_target_pct: float,
+                      max_loss_mult_credit: float, time_stop_days: float) -> np.ndarray:
+        """One bar: mark every leg, evaluate exit rules, close what fired.
+        Returns the reason codes (REASON_OPEN for structures left alone)."""
+        self.book.mark(contract_ids, prices)
+        reason = self.book.check_exits(today, profit_target_pct, max_loss_mult_credit, time_stop_days)
+        fired = reason != REASON_OPEN
+        self.book.structs["reason"][fired] = reason[fired]
+        self.cash += self.book.close(fired, ts)
+        return reason
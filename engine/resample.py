@@ -0,0 +1,63 @@
+"""
+Session-aligned bar resampling.
+
+Higher timeframes are built from stored 1m bars rather than downloaded
+separately. Bars are binned per trading session (`utils.trading_calendar`):
+a 5m/15m/1h bar starts at the session open plus a whole number of steps, the
+last bar of a session is cut at its close (15:30-16:00 for 1h, 12:30-13:00 on
+an early close), and a 1d bar is one session. Input bars outside sessions are
+dropped. Aggregation is a single `reduceat` pass over the sorted input.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.timeframes import interval_delta
+from utils.trading_calendar import TradingCalendar, get_calendar
+
+
+def resample_bars(bars: pd.DataFrame, timeframe: str, base: str = "1m",
+                  calendar: Optional[TradingCalendar] = None,
+                  complete_only: bool = True) -> pd.DataFrame:
+    """`base` bars (ts + OHLCV, optional spread) -> `timeframe` bars labelled by
+    their open time.
+
+    With `complete_only` a trailing bar whose interval the input doesn't reach
+    yet is left out, so a stored partial bar is never mistaken for a final one.
+    """
+    cal = calendar or get_calendar()
+    cols = [c for c in ("open", "high", "low", "close", "volume", "spread") if c in bars.columns]
+    if bars.empty:
+        return pd.DataFrame({"ts": pd.Series(dtype="datetime64[ns, UTC]"),
+                             **{c: pd.Series(dtype="float64") for c in cols}})
+    bars = bars.sort_values("ts", kind="stable")
+    ts = pd.DatetimeIndex(pd.to_datetime(bars["ts"], utc=True)).tz_localize(None).as_unit("ns").asi8
+    sid, lo, hi = cal.bar_bounds(ts, interval_delta(timeframe))
+    keep = sid >= 0
+    lo, hi, ts = lo[keep], hi[keep], ts[keep]
+    if not len(ts):
+        return resample_bars(bars.iloc[:0], timeframe, base, cal, complete_only)
+    v = {c: bars[c].to_numpy(dtype=np.float64)[keep] for c in cols}
+
+    starts = np.flatnonzero(np.r_[True, lo[1:] != lo[:-1]])
+    ends = np.r_[starts[1:], len(lo)] - 1
+    out = {"ts": pd.to_datetime(lo[starts], utc=True)}
+    if "open" in v:
+        out["open"] = v["open"][starts]
+    if "high" in v:
+        out["high"] = np.maximum.reduceat(v["high"], starts)
+    if "low" in v:
+        out["low"] = np.minimum.reduceat(v["low"], starts)
+    if "close" in v:
+        out["close"] = v["close"][ends]
+    if "volume" in v:
+        out["volume"] = np.add.reduceat(v["volume"], starts)
+    if "spread" in v:
+        out["spread"] = v["spread"][ends]
+    df = pd.DataFrame(out)
+    if complete_only and hi[-1] > ts[-1] + interval_delta(base).value:
+        df = df.iloc[:-1]
+    return df.reset_index(drop=True)
@@ -1,2 +1,299 @@
-def run_backtest(symbols, timeframe, strategies, exit_rules, grid, gates, regime_cfg):
-    raise NotImplementedError
+from typing import Callable, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from patterns.context import get_context_codec, macd_sign_labels, rsi_state_labels
+from patterns.indicator_cache import get_indicator_cache
+from patterns.scanner import Candles, has_pattern, scan
+from utils.regimes import classify_regime
+from utils.telemetry import span
+from strategies.templates import long_call
+from .barriers import REASONS, exit_rule_grid, price_barrier_grid
+from .chain_store import CALL, NS_PER_DAY, ChainStore
+from .data_layer import get_chain_store, load_bars
+from .fill_model import LiquidityGates, slippage_cost, trade_admits
+from .metrics import TRADE_STATS_COLUMNS
+
+DEFAULT_GRID = {"tp": [0.01, 0.015, 0.02], "sl": [0.005, 0.01], "max_bars": [20, 30]}
+# `strategies.exits.ExitRules` fields; each is a list of values in an exit-rule grid
+EXIT_RULE_COLUMNS = ["profit_target_pct", "max_loss_mult_credit", "time_stop_days_before_expiry"]
+
+
+def simulate_entries(bars: pd.DataFrame, entries: np.ndarray, grid: Mapping,
+                     side: int = 1, qty: int = 1, slip_frac_of_half: float = 0.3,
+                     fees: float = 0.0) -> pd.DataFrame:
+    """One trade row per entry x (tp, sl, max_bars) cell, evaluated in a single pass.
+
+    Entries fill at the signal bar's close; exits fill at the barrier level (a
+    stop gapped through fills at that bar's open), or at the close of the
+    time-stop bar. Entries whose exit lies past the end of `bars` are kept with
+    exit_reason "open" so incremental runs can re-simulate them; summaries skip
+    them. If `bars` has a `spread` column both fills pay `slip_frac_of_half` of
+    the half-spread (see `fill_model.price_with_slippage`).
+    Fill components (`fill_model.FILL_COLUMNS`) are kept so `backtests.stress`
+    can re-price trades under other slippage and liquidity settings.
+    An optional `grid["cells"]` list of (tp, sl, max_bars) keeps only those cells.
+    """
+    entries = np.asarray(entries, dtype=np.int64)
+    tp = np.asarray(grid["tp"], dtype=float)
+    sl = np.asarray(grid["sl"], dtype=float)
+    mb = np.asarray(grid["max_bars"], dtype=np.int64)
+    if len(entries) == 0:
+        return pd.DataFrame()
+
+    close = bars["close"].to_numpy(np.float64)
+    res = price_barrier_grid(close, bars["high"].to_numpy(np.float64),
+                             bars["low"].to_numpy(np.float64), entries, tp, sl, mb, side,
+                             open_=bars["open"].to_numpy(np.float64) if "open" in bars else None)
+
+    shape = res["ret"].shape
+    take = np.s_[:]
+    if grid.get("cells") is not None:
+        # only materialize the requested (tp, sl, max_bars) cells of the product grid
+        want = {tuple(c) for c in grid["cells"]}
+        sel = np.array([[[(t, s, m) in want for m in mb.tolist()] for s in sl.tolist()] for t in tp.tolist()])
+        take = np.flatnonzero(np.broadcast_to(sel[None], shape).ravel())
+    flat = lambda a: np.broadcast_to(a, shape).ravel()[take]
+
+    e = flat(entries[:, None, None, None])
+    exit_idx = e + 1 + flat(res["exit_k"])
+    exit_idx = np.minimum(exit_idx, len(close) - 1)
+    entry_mid = close[e]
+    ret = flat(res["ret"])
+    exit_mid = entry_mid * (1.0 + side * ret)
+
+    spread = bars["spread"].to_numpy(np.float64) if "spread" in bars else np.zeros(len(close))
+    volume = bars["volume"].to_numpy(np.float64) if "volume" in bars else np.full(len(close), np.nan)
+    slip = slippage_cost(spread[e], spread[exit_idx], qty, slip_frac_of_half)
+    pnl = qty * entry_mid * ret - slip - fees
+    sl_col = flat(sl[None, None, :, None])
+    risk = qty * entry_mid * sl_col
+    ts = bars["ts"].to_numpy()
+
+    out = pd.DataFrame({
+        "entry_idx": e,
+        "exit_idx": exit_idx,
+        "entry_ts": ts[e],
+        "exit_ts": ts[exit_idx],
+        "side": np.int8(side),
+        "tp": flat(tp[None, :, None, None]),
+        "sl": sl_col,
+        "max_bars": flat(mb[None, None, None, :]),
+        "exit_reason": REASONS[flat(res["reason"])],
+        "entry_price": entry_mid,
+        "exit_price": exit_mid,
+        "entry_spread": spread[e],
+        "exit_spread": spread[exit_idx],
+        "entry_volume": volume[e],
+        "qty": np.int32(qty),
+        "slip_frac": float(slip_frac_of_half),
+        "pnl": pnl,
+        "win": pnl > 0,
+        "ret_on_risk": pnl / risk,
+        "mae": qty * entry_mid * flat(res["mae"]),
+        "mfe": qty * entry_mid * flat(res["mfe"]),
+        "fees": np.full(len(e), float(fees)),
+        "slippage": slip,
+    })
+    return out
+
+
+def _ffill(x: np.ndarray, first: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs along axis 1 of (n, H, L) `x`, seeded with (n, L) `first`."""
+    x = np.concatenate([first[:, None, :], x], axis=1)
+    idx = np.where(np.isnan(x), 0, np.arange(x.shape[1])[None, :, None])
+    return np.take_along_axis(x, np.maximum.accumulate(idx, axis=1), axis=1)[:, 1:]
+
+
+def simulate_structures(bars: pd.DataFrame, entries: np.ndarray, legs, rules: Mapping,
+                        chains: ChainStore, symbol: str, qty: int = 1,
+                        slip_frac_of_half: float = 0.3, fees: float = 0.0) -> pd.DataFrame:
+    """One trade row per entry x ExitRules cell for the option structure `legs`.
+
+    At each entry bar the legs are resolved on the latest chain snapshot
+    (entries where a leg doesn't resolve are skipped) and filled at mid. The
+    structure is then marked at mid on every later bar up to its expiry day from
+    the as-of snapshots (a leg without a quote keeps its last mark), and every
+    (profit_target_pct, max_loss_mult_credit, time_stop_days_before_expiry) cell
+    of `rules` is resolved from that one mark path by `barriers.exit_rule_grid`;
+    exits fill at the exit bar's marks. Targets and stops are fractions of the
+    |net premium|, which is also the risk unit of `ret_on_risk` (times the stop).
+    Each leg's fill components are stored under `leg<i>_` (`fill_model.FILL_COLUMNS`
+    plus entry open interest, strike and expiry); P&L is in option price units.
+    """
+    entries = np.asarray(entries, dtype=np.int64)
+    pt, ml, stop = (np.asarray(rules[c], dtype=float) for c in EXIT_RULE_COLUMNS)
+    ts = pd.DatetimeIndex(pd.to_datetime(bars["ts"], utc=True)).tz_localize(None).as_unit("ns").asi8
+    day = ts // NS_PER_DAY
+    side = np.array([1 if leg.side == "long" else -1 for leg in legs], dtype=np.int8)
+    lqty = np.array([leg.qty for leg in legs], dtype=np.int32) * qty
+
+    fields = ("expiry_day", "opt_type", "strike", "bid", "ask", "volume", "oi")
+    picked, quoted = [], {f: [] for f in fields}
+    for e in entries.tolist():
+        snap = chains.snapshot(symbol, int(ts[e]))
+        rows = snap.select_legs(legs) if snap is not None else None
+        if rows is None or (rows < 0).any():
+            continue
+        picked.append(e)
+        for f in fields:
+            quoted[f].append(np.asarray(snap[f])[rows])
+    if not picked:
+        return pd.DataFrame()
+    c = {f: np.array(v) for f, v in quoted.items()}  # (n, legs)
+    entry_mid, entry_spread = (c["bid"] + c["ask"]) / 2.0, c["ask"] - c["bid"]
+    premium = (side * lqty * entry_mid).sum(axis=1)
+    ok = np.abs(premium) > 0
+    e = np.array(picked)[ok]
+    c = {f: v[ok] for f, v in c.items()}
+    entry_mid, entry_spread, premium = entry_mid[ok], entry_spread[ok], premium[ok]
+    if not len(e):
+        return pd.DataFrame()
+
+    expiry = c["expiry_day"].min(axis=1)
+    n_avail = np.maximum(np.minimum(np.searchsorted(day, expiry, side="right"), len(ts)) - e - 1, 0)
+    horizon = max(int(n_avail.max()), 1)
+    path = np.minimum(e[:, None] + 1 + np.arange(horizon)[None, :], len(ts) - 1)
+    snaps, snap_pos = np.unique(chains.asof_index(symbol, ts)[path], return_inverse=True)
+    codes, contracts = pd.MultiIndex.from_arrays(
+        [c["expiry_day"].ravel(), c["opt_type"].ravel(), c["strike"].ravel()]).factorize()
+    bid, ask = chains.quotes(symbol, snaps, *(contracts.get_level_values(i).to_numpy() for i in range(3)))
+    at = (snap_pos.reshape(path.shape)[:, :, None], codes.reshape(c["strike"].shape)[:, None, :])
+    mid = _ffill((bid[at] + ask[at]) / 2.0, entry_mid)  # (n, horizon, legs)
+    spread = _ffill(ask[at] - bid[at], entry_spread)
+
+    unit = np.abs(premium)
+    rel = ((side * lqty * mid).sum(axis=2) - premium[:, None]) / unit[:, None]
+    res = exit_rule_grid(rel, expiry[:, None] - day[path], n_avail, pt, ml, stop)
+
+    shape = res["ret"].shape
+    flat = lambda a: np.broadcast_to(a, shape).ravel()
+    r = flat(np.arange(len(e))[:, None, None, None])
+    k = flat(res["exit_k"])
+    exit_idx = np.minimum(e[r] + 1 + k, len(ts) - 1)
+    out = {
+        "entry_idx": e[r],
+        "exit_idx": exit_idx,
+        "entry_ts": bars["ts"].to_numpy()[e[r]],
+        "exit_ts": bars["ts"].to_numpy()[exit_idx],
+        "profit_target_pct": flat(pt[None, :, None, None]),
+        "max_loss_mult_credit": flat(ml[None, None, :, None]),
+        "time_stop_days_before_expiry": flat(stop[None, None, None, :]),
+        "exit_reason": REASONS[flat(res["reason"])],
+        "premium": premium[r],
+    }
+    slip = np.zeros(len(r))
+    for i in range(len(legs)):
+        exit_mid, exit_spread = mid[r, k, i], spread[r, k, i]
+        slip += slippage_cost(entry_spread[r, i], exit_spread, lqty[i], slip_frac_of_half)
+        out.update({
+            f"leg{i}_entry_price": entry_mid[r, i],
+            f"leg{i}_exit_price": exit_mid,
+            f"leg{i}_entry_spread": entry_spread[r, i],
+            f"leg{i}_exit_spread": exit_spread,
+            f"leg{i}_entry_volume": c["volume"][r, i].astype(np.float64),
+            f"leg{i}_entry_oi": c["oi"][r, i].astype(np.float64),
+            f"leg{i}_side": side[i],
+            f"leg{i}_qty": lqty[i],
+            f"leg{i}_slip_frac": float(slip_frac_of_half),
+            f"leg{i}_fees": float(fees) / len(legs),
+            f"leg{i}_strike": c["strike"][r, i],
+            f"leg{i}_expiry_day": c["expiry_day"][r, i],
+            f"leg{i}_opt_type": np.where(c["opt_type"][r, i] == CALL, "call", "put"),
+        })
+    pnl = flat(res["ret"]) * unit[r] - slip - fees
+    risk = unit[r] * out["max_loss_mult_credit"]
+    out.update({
+        "pnl": pnl,
+        "win": pnl > 0,
+        "ret_on_risk": pnl / risk,
+        "mae": flat(res["mae"]) * unit[r],
+        "mfe": flat(res["mfe"]) * unit[r],
+        "fees": np.full(len(r), float(fees)),
+        "slippage": slip,
+    })
+    return pd.DataFrame(out)
+
+
+def run_backtest(symbols, timeframe, strategies: Mapping[str, Callable], exit_rules,
+                 grid: Optional[Mapping], gates: Optional[LiquidityGates], regime_cfg,
+                 entry_filter: Optional[Callable] = None, grow_codec: bool = True):
+    """Backtest entry signals over the triple-barrier grid for each symbol.
+
+    strategies: name -> callable(bars) returning a boolean entry mask; the name is
+    the `candle` field of the trade's ContextKey. Callables from
+    `patterns.scanner.pattern_signal` are evaluated together in one scan. `context_key` is the packed
+    int64 form (`patterns.context.get_context_codec().to_strings` for labels).
+    grid: {"tp", "sl", "max_bars"} lists plus optional "start"/"end" bounds for
+    `load_bars`, "side" (+1/-1), "slip_frac_of_half" and "fees".
+    exit_rules: None trades the underlying over `grid`. Otherwise the `ExitRules`
+    grid ({"profit_target_pct", "max_loss_mult_credit",
+    "time_stop_days_before_expiry"} lists, as in configs/backtest_grid.yaml) plus
+    an optional "structure" callable returning the legs to open (default
+    `strategies.templates.long_call`): every entry opens that structure on the
+    as-of chain (`engine.data_layer.get_chain_store`) and trades are rows of the
+    ExitRules grid (see `simulate_structures`), gated per leg by `gates`.
+    entry_filter: optional callable(strategy, entry_ts array) -> bool mask of the
+    entries to simulate (used by incremental runs to skip settled entries).
+    grow_codec: False in worker processes, whose codec is a read-only copy of
+    the one the parent interned and saved; an unknown label then raises
+    KeyError instead of getting a code no other process knows.
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    codec = get_context_codec()
+    frames = []
+    for sym in symbols:
+        with span("data_load"):
+            bars = load_bars(sym, timeframe, start=grid.get("start"), end=grid.get("end"))
+        if len(bars) < 2:
+            continue
+        with span("indicators"):
+            bars = get_indicator_cache().attach(sym, timeframe, bars)
+        trend, vol_regime = classify_regime(bars, regime_cfg)
+        macd_sign = macd_sign_labels(bars["macd"] - bars["macd_signal"])
+        rsi_state = rsi_state_labels(bars["rsi"])
+        liquid = np.ones(len(bars), dtype=bool)
+        if gates is not None and exit_rules is None:  # structures are gated per leg instead
+            liquid = gates.admits(bars["spread"] if "spread" in bars else np.nan, bars["close"],
+                                  bars["volume"] if "volume" in bars else None)
+
+        tagged = {n: s for n, s in strategies.items() if hasattr(s, "pattern")}
+        with span("pattern_scan"):
+            bits = scan(Candles.from_frame(bars), [s.pattern for s in tagged.values()],
+                        {s.pattern: s.params for s in tagged.values()}) if tagged else None
+
+        for name, signal in strategies.items():
+            if name in tagged:
+                mask = has_pattern(bits, signal.pattern)
+            else:
+                mask = pd.Series(signal(bars), index=bars.index).fillna(False).to_numpy(bool)
+            entries = np.flatnonzero(mask & liquid)
+            if entry_filter is not None:
+                entries = entries[entry_filter(name, bars["ts"].to_numpy()[entries])]
+            with span("simulate"):
+                if exit_rules is None:
+                    trades = simulate_entries(bars, entries, grid, side=int(grid.get("side", 1)),
+                                              slip_frac_of_half=float(grid.get("slip_frac_of_half", 0.3)),
+                                              fees=float(grid.get("fees", 0.0)))
+                else:
+                    trades = simulate_structures(bars, entries, exit_rules.get("structure", long_call)(),
+                                                 exit_rules, get_chain_store(), sym,
+                                                 slip_frac_of_half=float(grid.get("slip_frac_of_half", 0.3)),
+                                                 fees=float(grid.get("fees", 0.0)))
+                    if gates is not None and not trades.empty:
+                        trades = trades[trade_admits(gates, trades)].reset_index(drop=True)
+            if trades.empty:
+                continue
+            e = trades["entry_idx"].to_numpy()
+            trades.insert(0, "context_key", codec.encode(
+                sym, timeframe, name, macd_sign[e], rsi_state[e], trend[e], vol_regime[e],
+                grow=grow_codec))
+            trades.insert(0, "strategy", name)
+            trades.insert(0, "timeframe", timeframe)
+            trades.insert(0, "symbol", sym)
+            frames.append(trades)
+    if not frames:
+        return pd.DataFrame(columns=["symbol", "timeframe", "strategy", "context_key",
+                                     "entry_ts", "exit_ts", *TRADE_STATS_COLUMNS])
+    return pd.concat(frames, ignore_index=True)
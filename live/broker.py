@@ -1,5 +1,26 @@
+import threading
+import time
+
+
 class AlpacaBroker:
     def __init__(self, paper=True):
         self.paper = paper
     def submit_multi_leg(self, legs, qty=1):
         print("BROKER STUB:", legs, qty)
+
+
+class StubBroker:
+    """Offline broker: records every submission (thread-safe) instead of routing it.
+
+    `clock` (anything with `.now()`) stamps orders; wall time if omitted.
+    """
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.orders = []
+        self._lock = threading.Lock()
+
+    def submit_multi_leg(self, legs, qty=1):
+        ts = self.clock.now() if self.clock is not None else time.time()
+        with self._lock:
+            self.orders.append({"ts": ts, "legs": legs, "qty": qty})
+        return {"id": len(self.orders), "status": "accepted"}
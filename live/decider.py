@@ -1,2 +1,136 @@
-def decide_and_route(symbol, timeframe, bars_df, summaries_lookup, rails, broker):
-    raise NotImplementedError
+import os
+import threading
+from typing import Callable, Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from live.whitelist import WhitelistHandle
+from patterns.candles import is_bullish_engulfing, is_hammer
+from patterns.context import get_context_codec, macd_sign_labels, rsi_state_labels
+from patterns.recursive import BASIC_COLUMNS, BasicIndicatorState
+from strategies.templates import long_call
+from utils.regimes import RegimeState, load_regime_cfg
+from utils.telemetry import incr, span
+
+# Candle name (the ContextKey `candle` field) -> (entry signal, structure to open)
+CANDLES: Dict[str, tuple[Callable, Callable]] = {
+    "bullish_engulfing": (is_bullish_engulfing, long_call),
+    "hammer": (is_hammer, long_call),
+}
+
+_whitelist: Optional[WhitelistHandle] = None
+
+
+def get_whitelist() -> WhitelistHandle:
+    global _whitelist
+    if _whitelist is None:
+        _whitelist = WhitelistHandle(os.getenv("WHITELIST_ROOT", "data/whitelist"),
+                                     check_every_s=float(os.getenv("WHITELIST_CHECK_S", "5")))
+    return _whitelist
+
+
+class _ContextStream:
+    """Indicator and regime state of one (symbol, timeframe) as of its last bar."""
+
+    def __init__(self, regime_cfg: dict):
+        self.cfg = regime_cfg
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget every bar seen; the caller holds `lock`, which is kept."""
+        self.basic = BasicIndicatorState()
+        self.regime = RegimeState(self.cfg)
+        self.last_ts: Optional[int] = None
+        self.last_close = np.nan
+        self.ctx: dict = {}
+
+    def feed(self, ts: np.ndarray, high, low, close):
+        for t, h, l, c in zip(ts.tolist(), high.tolist(), low.tolist(), close.tolist()):
+            rsi, macd, macd_signal, _ = self.basic.update(h, l, c)
+            trend, vol_regime = self.regime.update(h, l, c)
+            self.ctx = {"rsi": rsi, "macd": macd, "macd_signal": macd_signal,
+                        "trend": trend, "vol_regime": vol_regime}
+            self.last_ts, self.last_close = t, c
+
+
+_streams: Dict[tuple, _ContextStream] = {}
+_streams_lock = threading.Lock()
+
+
+def _last_bar_context(symbol: str, timeframe: str, bars_df: pd.DataFrame, regime_cfg=None) -> dict:
+    """Context fields of the last bar, from per-symbol streaming state.
+
+    Only bars after the last one seen are fed; the state is rebuilt from
+    `bars_df` when it doesn't overlap it (first call, a gap) or the overlapping
+    bar was revised.
+    """
+    cfg = load_regime_cfg(regime_cfg)
+    ts = pd.DatetimeIndex(pd.to_datetime(bars_df["ts"], utc=True)).tz_localize(None).as_unit("ns").asi8
+    high, low, close = (bars_df[c].to_numpy(np.float64) for c in ("high", "low", "close"))
+    with _streams_lock:
+        st = _streams.get((symbol, timeframe))
+        if st is None or st.cfg != cfg:
+            st = _streams[(symbol, timeframe)] = _ContextStream(cfg)
+    with st.lock:
+        i = int(np.searchsorted(ts, st.last_ts, side="right")) if st.last_ts is not None else 0
+        if st.last_ts is not None and not (i > 0 and ts[i - 1] == st.last_ts
+                                           and close[i - 1] == st.last_close):
+            st.reset()
+            i = 0
+        st.feed(ts[i:], high[i:], low[i:], close[i:])
+        ctx = dict(st.ctx)
+    if set(BASIC_COLUMNS) <= set(bars_df.columns):
+        last = bars_df.iloc[-1]
+        ctx.update(rsi=last["rsi"], macd=last["macd"], macd_signal=last["macd_signal"])
+    return {"macd_sign": macd_sign_labels(ctx["macd"] - ctx["macd_signal"]).item(),
+            "rsi_state": rsi_state_labels(ctx["rsi"]).item(),
+            "trend": ctx["trend"], "vol_regime": ctx["vol_regime"]}
+
+
+def decide_and_route(symbol, timeframe, bars_df, summaries_lookup, rails, broker,
+                     portfolio=None, regime_cfg=None, candles: Mapping = CANDLES) -> dict:
+    """Enter when a candle fires on the last closed bar and its ContextKey is whitelisted.
+
+    bars_df: lowercase OHLC bars with `ts`, all closed (indicator columns are
+    computed if missing, from state kept per symbol across calls).
+    summaries_lookup: a `live.whitelist.WhitelistHandle`/`Whitelist`, or any mapping
+    from packed ContextKey to stats with `.get`.
+    """
+    decision = {"symbol": symbol, "timeframe": timeframe, "action": "skip", "reason": "no_signal"}
+    if bars_df is None or len(bars_df) < 2:
+        decision["reason"] = "no_data"
+        return decision
+    with span("signal"):
+        fired = [name for name, (signal, _) in candles.items() if bool(np.asarray(signal(bars_df))[-1])]
+    if not fired:
+        return decision
+
+    ctx = _last_bar_context(symbol, timeframe, bars_df, regime_cfg)
+    # one snapshot for encoding and lookup, so a hot swap can't pair the old
+    # codec with the new table
+    if isinstance(summaries_lookup, WhitelistHandle):
+        summaries_lookup = summaries_lookup.current() or {}
+    codec = getattr(summaries_lookup, "codec", None) or get_context_codec()
+    for name in fired:
+        try:
+            key = int(codec.encode(symbol, timeframe, name, ctx["macd_sign"], ctx["rsi_state"],
+                                   ctx["trend"], ctx["vol_regime"], grow=False))
+        except KeyError:
+            continue  # a field the whitelist has never seen can't be whitelisted
+        stats = summaries_lookup.get(key)
+        if stats is None:
+            decision.update(reason="not_whitelisted", candle=name, context_key=key)
+            continue
+        decision.update(candle=name, context_key=key, stats=stats)
+        if rails is not None and not rails.ok_to_trade(portfolio):
+            decision["reason"] = "rails"
+            return decision
+        legs = candles[name][1]()
+        with span("order_submit"):
+            broker.submit_multi_leg(legs, qty=1)
+        incr("orders", source="decider")
+        decision.update(action="enter", reason="whitelisted", legs=len(legs))
+        return decision
+    return decision
@@ -4,6 +4,11 @@ from typing import List, Optional, Dict, Any
 import pandas as pd
 import yfinance as yf
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from live.market_data import DataProvider, fetch_universe, provider_from_env
+from live.streaming import StreamingIndicators
+from utils.telemetry import incr, render_prometheus, span, timed
 
 # Indicators
 from ta.momentum import RSIIndicator
@@ -47,6 +52,11 @@ def healthz():
 def run_once():
     return {"ok": True, "universe": get_universe(), "ts": time.time()}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text: per-stage latency histograms (fetch batches, /paper stages) and counters."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # ---------- strategy bits ----------
 
 def get_ohlcv(symbol: str, interval: str, lookback_days: int) -> pd.DataFrame:
@@ -76,10 +86,10 @@ def generate_signal(df: pd.DataFrame) -> str:
     """
     if len(df) < 3:
         return "HOLD"
-    rsi_prev1, rsi_now = df["RSI"].iloc[-2], df["RSI"].iloc[-1]
-    price_now = df["Close"].iloc[-1]
-    ema_now = df["EMA"].iloc[-1]
+    return signal_from_values(df["RSI"].iloc[-2], df["RSI"].iloc[-1],
+                              df["Close"].iloc[-1], df["EMA"].iloc[-1])
 
+def signal_from_values(rsi_prev1: float, rsi_now: float, price_now: float, ema_now: float) -> str:
     buy = (rsi_prev1 <= 30 and rsi_now > 30) and (price_now > ema_now)
     sell = (rsi_prev1 >= 70 and rsi_now < 70) and (price_now < ema_now)
 
@@ -89,6 +99,51 @@ def generate_signal(df: pd.DataFrame) -> str:
         return "SELL"
     return "HOLD"
 
+# Streaming indicator state survives across requests; one book per (RSI, EMA) setting.
+_streams: Dict[tuple, StreamingIndicators] = {}
+
+def get_streams(rsi_len: int, ema_len: int) -> StreamingIndicators:
+    key = (rsi_len, ema_len)
+    if key not in _streams:
+        _streams[key] = StreamingIndicators(rsi_len, ema_len)
+    return _streams[key]
+
+_provider: Optional[DataProvider] = None
+
+def get_provider() -> DataProvider:
+    global _provider
+    if _provider is None:
+        _provider = provider_from_env()
+    return _provider
+
+def refresh_indicators(streams: StreamingIndicators, provider: DataProvider, symbols: List[str],
+                       interval: str, lookback_days: int, refresh_days: int):
+    """Batch-fetch the universe and advance each symbol's streaming state.
+
+    Only symbols not seen before (or whose state fell behind) download the full
+    lookback; the rest fetch the short refresh window. Returns (values, errors).
+    """
+    timeout_s = env_float("FETCH_TIMEOUT_S", 20.0)
+    # one budget for the warm and cold fetches together
+    deadline = time.monotonic() + env_float("FETCH_TOTAL_TIMEOUT_S", 2 * timeout_s)
+    warm = [s for s in symbols if streams.is_warm(s, interval)]
+    cold = [s for s in symbols if not streams.is_warm(s, interval)]
+    frames, errors = fetch_universe(provider, warm, interval, refresh_days, timeout_s=timeout_s,
+                                    deadline=deadline)
+    out: Dict[str, Dict[str, Any]] = {}
+    for sym, df in frames.items():
+        try:
+            out[sym] = streams.update(sym, interval, df)
+        except LookupError:
+            streams.drop(sym, interval)
+            cold.append(sym)
+    frames, cold_errors = fetch_universe(provider, cold, interval, lookback_days, timeout_s=timeout_s,
+                                         deadline=deadline)
+    errors.update(cold_errors)
+    for sym, df in frames.items():
+        out[sym] = streams.warm_up(sym, interval, df)
+    return out, errors
+
 def alpaca_client_or_none() -> Optional[TradingClient]:
     key = os.getenv("ALPACA_KEY")
     sec = os.getenv("ALPACA_SECRET")
@@ -124,10 +179,13 @@ def maybe_place_order(client: TradingClient, symbol: str, side: str, qty: int) -
 # ---------- /paper endpoint ----------
 
 @app.get("/paper", summary="Paper trade dry-run / smoke test")
+@timed("paper")
 def paper():
     """
-    Pulls data with yfinance, computes RSI/EMA, emits signals,
-    and (if enabled) places paper market orders on Alpaca.
+    Pulls data for the universe in concurrent batches (yfinance by default,
+    DATA_PROVIDER=local for offline runs), updates streaming RSI/EMA state, emits signals,
+    and (if enabled) places paper market orders on Alpaca. The full LOOKBACK_DAYS
+    history is only downloaded the first time a symbol is seen.
 
     PLACE_ORDERS=false -> dry-run (no orders; just signals/prices)
     PLACE_ORDERS=true  -> places orders when signal is BUY/SELL
@@ -137,6 +195,8 @@ def paper():
     lookback = int(os.getenv("LOOKBACK_DAYS", "30"))
     rsi_len = int(os.getenv("RSI", "14"))
     ema_len = int(os.getenv("EMA", "50"))
+    refresh_days = int(os.getenv("REFRESH_DAYS", "1"))
+    streams = get_streams(rsi_len, ema_len)
 
     # trading controls
     place_orders = os.getenv("PLACE_ORDERS", "false").lower() == "true"
@@ -156,30 +216,43 @@ def paper():
     if place_orders and client is None:
         results["warning"] = "PLACE_ORDERS=true but ALPACA_KEY/ALPACA_SECRET not set; skipping orders."
 
-    for sym in uni:
+    with span("data_fetch"):
+        latest, errors = refresh_indicators(streams, get_provider(), uni, interval, lookback, refresh_days)
+
+    orders = []  # (symbol, side, qty), routed once every signal is computed
+    with span("signal"):
+        for sym in uni:
+            try:
+                vals = latest.get(sym)
+                if not vals:
+                    results["signals"][sym] = {"error": errors.get(sym, "no data")}
+                    continue
+                price = float(vals["close"])
+                rsi_now = float(vals["rsi"])
+                ema_now = float(vals["ema"])
+                sig = "HOLD" if vals["bars"] < 3 else signal_from_values(vals["rsi_prev"], rsi_now, price, ema_now)
+                incr("signals", signal=sig)
+
+                sig_result: Dict[str, Any] = {"signal": sig, "price": price, "rsi": rsi_now, "ema": ema_now}
+
+                if place_orders and sig in ("BUY", "SELL") and client is not None:
+                    qty = calc_qty(price, paper_equity, risk_pct)
+                    if qty > 0:
+                        orders.append((sym, sig, qty))
+                    else:
+                        sig_result["order_skipped"] = "qty=0 based on risk/equity/price"
+                results["signals"][sym] = sig_result
+            except Exception as e:
+                results["signals"][sym] = {"error": str(e)}
+
+    for sym, sig, qty in orders:
         try:
-            df = get_ohlcv(sym, interval, lookback)
-            if df.empty:
-                results["signals"][sym] = {"error": "no data"}
-                continue
-            df = compute_indicators(df, rsi_len, ema_len)
-            sig = generate_signal(df)
-            price = float(df["Close"].iloc[-1])
-            rsi_now = float(df["RSI"].iloc[-1])
-            ema_now = float(df["EMA"].iloc[-1])
-
-            sig_result: Dict[str, Any] = {"signal": sig, "price": price, "rsi": rsi_now, "ema": ema_now}
-
-            if place_orders and sig in ("BUY", "SELL") and client is not None:
-                qty = calc_qty(price, paper_equity, risk_pct)
-                if qty > 0:
-                    order_info = maybe_place_order(client, sym, sig, qty)
-                    sig_result["order"] = order_info
-                else:
-                    sig_result["order_skipped"] = "qty=0 based on risk/equity/price"
-            results["signals"][sym] = sig_result
+            with span("order_submit"):
+                order_info = maybe_place_order(client, sym, sig, qty)
+            incr("orders", source="paper")
+            results["signals"][sym]["order"] = order_info
         except Exception as e:
-            results["signals"][sym] = {"error": str(e)}
+            results["signals"][sym]["error"] = str(e)
 
     results["ts"] = time.time()
     return results
@@ -0,0 +1,283 @@
+"""
+Multi-symbol market data fetch for the live service.
+
+Symbols are grouped into multi-ticker batches that run concurrently on a shared
+thread pool; each pool thread keeps one HTTP session, so connections are reused
+across requests. Every request (a batch, or the one-by-one retry of a symbol a
+batch failed to return) has its own timeout, retries with backoff, and the
+whole fetch is bounded by an overall deadline; requests still queued at the
+deadline are cancelled. The per-request timeout is also passed to the
+provider, so a stalled download gives its pool thread back.
+
+Providers are pluggable: `YFinanceProvider` for production and `LocalProvider`
+(in-memory frames or the local bar store) for offline runs.
+
+Frames come back in the shape `get_ohlcv` has always returned: DatetimeIndex
+and capitalized Open/High/Low/Close/Volume columns.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.telemetry import incr, span
+
+
+def _utc(ts) -> pd.Timestamp:
+    t = pd.Timestamp(ts)
+    return t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC")
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return pd.DataFrame()
+    df = df.dropna(how="all")
+    return df.rename(columns={c: str(c).capitalize() for c in df.columns})
+
+
+class DataProvider(ABC):
+    """Returns {symbol: bars} for the symbols it could fetch; missing symbols are omitted.
+
+    `end` is the caller's clock: only bars opened at or before it, going back
+    `lookback_days` from it, are returned (None = the latest data available).
+    """
+
+    max_batch = 50
+
+    @abstractmethod
+    def fetch(self, symbols: List[str], interval: str, lookback_days: int,
+              timeout_s: Optional[float] = None, end=None) -> Dict[str, pd.DataFrame]:
+        ...
+
+
+def _http_session():
+    try:  # yfinance >= 0.2.59 wants a curl_cffi session
+        from curl_cffi import requests as curl_requests
+        return curl_requests.Session(impersonate="chrome")
+    except ImportError:
+        import requests
+        return requests.Session()
+
+
+class YFinanceProvider(DataProvider):
+    max_batch = 100
+
+    def __init__(self, session=None):
+        self.session = session
+        self._local = threading.local()
+
+    def _session(self):
+        """The session passed in, else one per calling thread (kept for reuse)."""
+        if self.session is not None:
+            return self.session
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = _http_session()
+        return s
+
+    def fetch(self, symbols, interval, lookback_days, timeout_s=None, end=None):
+        # live quotes always end at the wall clock, which is what `end` is in production
+        import yfinance as yf
+        # the window as asked: a warm refresh (REFRESH_DAYS=1) must stay a one-day pull
+        period = f"{max(int(lookback_days), 1)}d"
+        raw = yf.download(symbols, period=period, interval=interval, auto_adjust=True,
+                          group_by="ticker", threads=False, progress=False,
+                          session=self._session(), timeout=timeout_s or 10)
+        if not isinstance(raw, pd.DataFrame) or raw.empty:
+            return {}
+        if not isinstance(raw.columns, pd.MultiIndex):
+            return {symbols[0]: _normalize(raw)} if len(symbols) == 1 else {}
+        out = {}
+        for sym in symbols:
+            if sym in raw.columns.get_level_values(0):
+                df = _normalize(raw[sym])
+                if not df.empty:
+                    out[sym] = df
+        return out
+
+
+class LocalProvider(DataProvider):
+    """Offline provider over in-memory frames or a `engine.bar_store.BarStore` root.
+
+    `latency_s` adds a fixed sleep per call to stand in for network round trips.
+    With `end`, bars after it are hidden, so a replay under a simulated clock
+    only sees what had been published by then.
+    """
+
+    def __init__(self, frames: Optional[Dict[str, pd.DataFrame]] = None,
+                 bars_root: Optional[str] = None, latency_s: float = 0.0):
+        self.frames = frames or {}
+        self.bars_root = bars_root
+        self.latency_s = latency_s
+        self._store = None
+
+    def _load(self, symbol: str, interval: str) -> pd.DataFrame:
+        if symbol in self.frames:
+            return self.frames[symbol]
+        if self.bars_root is None:
+            return pd.DataFrame()
+        if self._store is None:
+            from engine.bar_store import BarStore
+            self._store = BarStore(self.bars_root)
+        bars = self._store.read(symbol, interval)
+        if bars.empty:
+            return pd.DataFrame()
+        return _normalize(bars.set_index("ts"))
+
+    def fetch(self, symbols, interval, lookback_days, timeout_s=None, end=None):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        out = {}
+        for sym in symbols:
+            df = self._load(sym, interval)
+            if df.empty:
+                continue
+            idx = pd.to_datetime(df.index, utc=True)
+            hi = idx[-1] if end is None else _utc(end)
+            keep = (idx <= hi) & (idx > hi - pd.Timedelta(days=lookback_days))
+            if keep.any():
+                out[sym] = df[keep]
+        return out
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=int(os.getenv("FETCH_WORKERS", "8")),
+                                       thread_name_prefix="fetch")
+        return _pool
+
+
+def _with_retries(provider: DataProvider, symbols: List[str], interval: str,
+                  lookback_days: int, retries: int, backoff_s: float,
+                  batch: str = "single", timeout_s: Optional[float] = None,
+                  end=None) -> Dict[str, pd.DataFrame]:
+    for attempt in range(retries + 1):
+        try:
+            with span("fetch_batch", provider=type(provider).__name__, batch=batch):
+                return provider.fetch(symbols, interval, lookback_days, timeout_s=timeout_s, end=end)
+        except Exception:
+            incr("fetch_failures", provider=type(provider).__name__)
+            if attempt == retries:
+                raise
+            time.sleep(backoff_s * 2 ** attempt)
+    return {}
+
+
+class _Request:
+    """One provider call on the pool; `started` is set when a thread picks it up."""
+    __slots__ = ("symbols", "started", "future")
+
+    def __init__(self, symbols: List[str]):
+        self.symbols = symbols
+        self.started: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def run(self, *args, **kwargs):
+        self.started = time.monotonic()
+        return _with_retries(*args, **kwargs)
+
+
+def _submit(pool: ThreadPoolExecutor, symbols: List[str], *args, **kwargs) -> _Request:
+    req = _Request(symbols)
+    req.future = pool.submit(req.run, *args, **kwargs)
+    return req
+
+
+def _collect(requests: List[_Request], timeout_s: float, deadline: float,
+             on_result, errors: Dict[str, str]):
+    """Wait for `requests`; each gets `timeout_s` from the moment it starts running,
+    and nothing waits past `deadline`. Expired requests are cancelled (a no-op if
+    already running) and their symbols recorded in `errors`."""
+    pending = {r.future: r for r in requests}
+    while pending:
+        now = time.monotonic()
+        for fut, r in list(pending.items()):
+            expired = now >= deadline or (r.started is not None and now - r.started >= timeout_s)
+            if expired and not fut.done():
+                fut.cancel()
+                del pending[fut]
+                for s in r.symbols:
+                    errors[s] = f"timeout after {timeout_s}s" if now < deadline else "fetch deadline exceeded"
+        if not pending:
+            break
+        expiries = [deadline] + [r.started + timeout_s for r in pending.values() if r.started is not None]
+        # queued requests have no expiry yet: re-check soon so they get one once started
+        wait_s = min(min(expiries) - now, 0.05 if any(r.started is None for r in pending.values()) else 1e9)
+        done, _ = wait(list(pending), timeout=max(wait_s, 0.0), return_when=FIRST_COMPLETED)
+        for fut in done:
+            r = pending.pop(fut)
+            try:
+                got = fut.result()
+            except Exception as e:
+                for s in r.symbols:
+                    errors[s] = str(e)
+                continue
+            on_result(r, got)
+
+
+def fetch_universe(provider: DataProvider, symbols: List[str], interval: str, lookback_days: int,
+                   batch_size: Optional[int] = None, timeout_s: float = 20.0, retries: int = 2,
+                   backoff_s: float = 0.5, deadline: Optional[float] = None, end=None
+                   ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """Fetch all `symbols` in concurrent batches -> (frames, errors by symbol).
+
+    `timeout_s` applies to each request; `deadline` (a `time.monotonic()` value,
+    default now + 2 x `timeout_s`) bounds the whole call, retries included, so
+    callers making several fetches can share one budget. `end` is passed to
+    the provider (see `DataProvider`).
+    """
+    if not symbols:
+        return {}, {}
+    if deadline is None:
+        deadline = time.monotonic() + 2 * timeout_s
+    pool = _get_pool()
+    size = max(1, min(batch_size or provider.max_batch, provider.max_batch))
+    batches = [symbols[i:i + size] for i in range(0, len(symbols), size)]
+    reqs = [_submit(pool, b, provider, b, interval, lookback_days, retries, backoff_s, str(i),
+                    timeout_s=timeout_s, end=end)
+            for i, b in enumerate(batches)]
+
+    frames: Dict[str, pd.DataFrame] = {}
+    errors: Dict[str, str] = {}
+    missing: List[str] = []
+
+    def batch_done(r: _Request, got: Dict[str, pd.DataFrame]):
+        frames.update(got)
+        missing.extend(s for s in r.symbols if s not in got)
+
+    _collect(reqs, timeout_s, deadline, batch_done, errors)
+
+    # symbols a successful batch did not return get one individual attempt each
+    def single_done(r: _Request, got: Dict[str, pd.DataFrame]):
+        sym = r.symbols[0]
+        if sym in got:
+            frames[sym] = got[sym]
+        else:
+            errors[sym] = "no data"
+
+    singles = [_submit(pool, [s], provider, [s], interval, lookback_days, 0, backoff_s,
+                       timeout_s=timeout_s, end=end) for s in missing]
+    _collect(singles, timeout_s, deadline, single_done, errors)
+    if errors:
+        incr("fetch_errors", len(errors))
+    return frames, errors
+
+
+def provider_from_env() -> DataProvider:
+    kind = os.getenv("DATA_PROVIDER", "yfinance").lower()
+    if kind == "local":
+        return LocalProvider(bars_root=os.getenv("BARS_ROOT", "data/bars"),
+                             latency_s=float(os.getenv("LOCAL_PROVIDER_LATENCY_S", "0")))
+    return YFinanceProvider()
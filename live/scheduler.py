@@ -0,0 +1,152 @@
+"""
+Bar-close-aligned asyncio trading loop.
+
+`BarCloseScheduler` sleeps until the next bar close of `interval` (plus a short
+settle delay for the data source to publish the bar), with bars aligned to the
+sessions of `utils.trading_calendar` the same way `engine.resample` builds
+them, so nights, weekends and holidays are skipped. It fetches the universe
+once, then evaluates every symbol concurrently in worker threads through
+`live.decider.decide_and_route`, which gates orders on `Rails.ok_to_trade` and
+submits them through the broker.
+
+Time comes from a clock object, so the same loop runs against wall time
+(`SystemClock`) or offline against a `SimulatedClock`, with a `LocalProvider`
+and `live.broker.StubBroker`. Every decision records its bar-close-to-decision
+latency: how late the loop woke on the clock plus the wall time spent fetching
+and evaluating since the wake-up.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from live.decider import decide_and_route, get_whitelist
+from live.market_data import DataProvider, fetch_universe
+from utils.telemetry import incr, observe, span
+from utils.timeframes import interval_delta
+from utils.trading_calendar import get_calendar
+
+
+def _utc(ts) -> pd.Timestamp:
+    t = pd.Timestamp(ts)
+    return t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC")
+
+
+class SystemClock:
+    def now(self) -> pd.Timestamp:
+        return pd.Timestamp.now(tz="UTC")
+
+    async def sleep_until(self, ts: pd.Timestamp):
+        await asyncio.sleep(max(0.0, (ts - self.now()).total_seconds()))
+
+
+class SimulatedClock:
+    """Clock that jumps straight to whatever time the loop sleeps until."""
+
+    def __init__(self, start):
+        self.t = _utc(start)
+
+    def now(self) -> pd.Timestamp:
+        return self.t
+
+    def advance(self, delta):
+        self.t += pd.Timedelta(delta)
+
+    async def sleep_until(self, ts: pd.Timestamp):
+        self.t = max(self.t, ts)
+        await asyncio.sleep(0)
+
+
+def next_bar_close(now: pd.Timestamp, interval: str, calendar=None) -> pd.Timestamp:
+    """First session bar boundary strictly after `now`."""
+    return (calendar or get_calendar()).next_bar(now, interval_delta(interval))[1]
+
+
+def _closed_bars(df: pd.DataFrame, bar_open: pd.Timestamp) -> pd.DataFrame:
+    """Provider frame (DatetimeIndex, capitalized OHLCV) -> decider frame (ts +
+    lowercase columns) up to and including the bar that opened at `bar_open`."""
+    idx = pd.to_datetime(df.index, utc=True)
+    df = df[idx <= bar_open]
+    return df.rename(columns=str.lower).rename_axis("ts").reset_index()
+
+
+class BarCloseScheduler:
+    def __init__(self, symbols: List[str], interval: str, provider: DataProvider, rails, broker,
+                 clock=None, summaries_lookup=None, portfolio=None, regime_cfg=None,
+                 lookback_days: int = 5, settle_s: float = 2.0, concurrency: int = 8,
+                 fetch_timeout_s: float = 20.0, decide: Callable = decide_and_route,
+                 history: int = 10_000, calendar=None):
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.step = interval_delta(interval)
+        self.provider = provider
+        self.rails = rails
+        self.broker = broker
+        self.clock = clock or SystemClock()
+        self.calendar = calendar or get_calendar()
+        self.summaries_lookup = summaries_lookup
+        self.portfolio = portfolio
+        self.regime_cfg = regime_cfg
+        self.lookback_days = lookback_days
+        self.settle = pd.Timedelta(seconds=settle_s)
+        self.concurrency = concurrency
+        self.fetch_timeout_s = fetch_timeout_s
+        self.decide = decide
+        self.decisions = deque(maxlen=history)
+        self.bars_run = 0
+
+    async def run(self, max_bars: Optional[int] = None, until=None):
+        """Loop over bar closes; stops after `max_bars` session bars or at `until`."""
+        until = _utc(until) if until is not None else None
+        while max_bars is None or self.bars_run < max_bars:
+            bar_open, close = self.calendar.next_bar(self.clock.now() - self.settle, self.step)
+            if until is not None and close > until:
+                return
+            await self.clock.sleep_until(close + self.settle)
+            await self.on_bar_close(close, bar_open)
+            self.bars_run += 1
+
+    async def on_bar_close(self, close: pd.Timestamp, bar_open: Optional[pd.Timestamp] = None) -> list:
+        """Fetch, then evaluate all symbols concurrently for the bar ending at `close`
+        (`bar_open` defaults to one interval earlier; the session's last bar can be shorter)."""
+        bar_open = close - self.step if bar_open is None else bar_open
+        woke = time.perf_counter()
+        lag = (self.clock.now() - close).total_seconds()
+        with span("bar_fetch"):
+            frames, errors = await asyncio.to_thread(fetch_universe, self.provider, self.symbols,
+                                                     self.interval, self.lookback_days,
+                                                     timeout_s=self.fetch_timeout_s,
+                                                     end=self.clock.now())
+        lookup = self.summaries_lookup if self.summaries_lookup is not None else get_whitelist()
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def one(sym: str) -> dict:
+            df = frames.get(sym)
+            bars = _closed_bars(df, bar_open) if df is not None else None
+            async with sem:
+                try:
+                    d = await asyncio.to_thread(self.decide, sym, self.interval, bars, lookup,
+                                                self.rails, self.broker, self.portfolio, self.regime_cfg)
+                except Exception as e:
+                    d = {"symbol": sym, "timeframe": self.interval, "action": "skip", "reason": "error",
+                         "error": repr(e)}
+            if df is None:
+                d.setdefault("error", errors.get(sym, "no data"))
+            d["bar_close"] = close
+            d["latency_s"] = lag + (time.perf_counter() - woke)
+            observe("bar_to_decision", d["latency_s"], action=d["action"])
+            incr("decisions", action=d["action"], reason=d["reason"])
+            return d
+
+        with span("bar_evaluate"):
+            out = await asyncio.gather(*(one(s) for s in self.symbols))
+        self.decisions.extend(out)
+        return out
+
+    def latency_frame(self) -> pd.DataFrame:
+        """Recorded decisions (symbol, bar_close, action, reason, latency_s, ...)."""
+        return pd.DataFrame(list(self.decisions))
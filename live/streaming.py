@@ -0,0 +1,98 @@
+"""
+Per-symbol streaming indicator state for the live service.
+
+The full lookback is fetched once per symbol to warm the state; afterwards each
+request only feeds bars newer than the last one seen, at O(1) per bar. The
+latest bar returned by the data source may still be forming, so it is applied
+to a copy of the state and only committed once a later bar supersedes it; the
+values therefore match a full recompute over the same bars.
+"""
+from __future__ import annotations
+
+import copy
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from patterns.recursive import NAN, BasicIndicatorState, EWMState, TaRSIState, ta_ema_state
+
+
+@dataclass
+class SymbolStream:
+    rsi: TaRSIState
+    ema: EWMState
+    basic: BasicIndicatorState = field(default_factory=BasicIndicatorState)
+    last_ts: Optional[pd.Timestamp] = None  # last committed (closed) bar
+    values: dict = field(default_factory=dict)  # indicator values at last_ts
+    provisional: dict = field(default_factory=dict)  # values at the newest bar
+    n_bars: int = 0  # committed bars
+
+    def _step(self, high: float, low: float, close: float) -> dict:
+        rsi = self.rsi.update(close)
+        ema = self.ema.update(close)
+        _, macd, macd_signal, atr = self.basic.update(high, low, close)
+        return {"close": close, "rsi": rsi, "ema": ema, "macd": macd,
+                "macd_signal": macd_signal, "atr": atr}
+
+    def feed(self, df: pd.DataFrame) -> int:
+        """Consume bars newer than `last_ts`; the final row stays provisional."""
+        if df.empty:
+            return 0
+        new = df if self.last_ts is None else df[df.index > self.last_ts]
+        if new.empty:
+            return 0
+        high = new["High"].to_numpy(np.float64).tolist()
+        low = new["Low"].to_numpy(np.float64).tolist()
+        close = new["Close"].to_numpy(np.float64).tolist()
+        for i in range(len(close) - 1):
+            self.values = self._step(high[i], low[i], close[i])
+        if len(close) > 1:
+            self.last_ts = new.index[-2]
+            self.n_bars += len(close) - 1
+        committed = (self.rsi, self.ema, self.basic)
+        self.rsi, self.ema, self.basic = copy.deepcopy(committed)
+        latest = self._step(high[-1], low[-1], close[-1])
+        self.rsi, self.ema, self.basic = committed
+        self.provisional = {**latest, "rsi_prev": self.values.get("rsi", NAN),
+                            "ts": new.index[-1], "bars": self.n_bars + 1}
+        return len(close)
+
+
+class StreamingIndicators:
+    """Thread-safe book of `SymbolStream`s keyed by (symbol, interval)."""
+
+    def __init__(self, rsi_len: int = 14, ema_len: int = 50):
+        self.rsi_len = rsi_len
+        self.ema_len = ema_len
+        self._streams: dict[tuple[str, str], SymbolStream] = {}
+        self._lock = threading.Lock()
+
+    def is_warm(self, symbol: str, interval: str) -> bool:
+        return (symbol, interval) in self._streams
+
+    def warm_up(self, symbol: str, interval: str, df: pd.DataFrame) -> dict:
+        stream = SymbolStream(TaRSIState(self.rsi_len), ta_ema_state(self.ema_len))
+        stream.feed(df)
+        with self._lock:
+            self._streams[(symbol, interval)] = stream
+        return self.latest(symbol, interval)
+
+    def update(self, symbol: str, interval: str, df: pd.DataFrame) -> dict:
+        stream = self._streams[(symbol, interval)]
+        with self._lock:
+            if stream.last_ts is not None and not df.empty and df.index[0] > stream.last_ts:
+                # gap since the last committed bar: the recent window can't extend the state
+                raise LookupError(f"{symbol}: refresh window does not overlap the stream")
+            stream.feed(df)
+        return self.latest(symbol, interval)
+
+    def latest(self, symbol: str, interval: str) -> dict:
+        stream = self._streams.get((symbol, interval))
+        return dict(stream.provisional) if stream else {}
+
+    def drop(self, symbol: str, interval: str):
+        with self._lock:
+            self._streams.pop((symbol, interval), None)
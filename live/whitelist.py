@@ -0,0 +1,210 @@
+"""
+Live strategy whitelist (PLAN Phase 4: top-K keys per regime).
+
+The nightly export writes an open-addressing hash table over packed ContextKeys
+as plain .npy files (slots, row ids, stats records) plus the ContextKey codec
+it was built with, into a new version directory, then atomically repoints
+`CURRENT`. The service memory-maps the table, so opening a version costs no
+parse and a lookup is a couple of array reads whatever the table size.
+`WhitelistHandle` notices a new `CURRENT` and swaps the table in between
+requests without a restart.
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from patterns.context import ContextKeyCodec, get_context_codec
+from utils.telemetry import incr
+
+EMPTY = -1
+_MULT = 0x9E3779B97F4A7C15  # Fibonacci hashing
+_MASK64 = (1 << 64) - 1
+
+STATS_DTYPE = np.dtype([("n", "i8"), ("win_pct", "f8"), ("profit_factor", "f8"), ("sharpe", "f8"),
+                        ("avg_pnl", "f8"), ("max_drawdown", "f8"), ("tp", "f8"), ("sl", "f8"),
+                        ("max_bars", "i8")])
+
+
+def _slot_bits(n: int) -> int:
+    return max(3, int(np.ceil(np.log2(max(2 * n, 1)))))  # load factor <= 0.5
+
+
+def _hash_many(keys: np.ndarray, bits: int) -> np.ndarray:
+    return ((keys.astype(np.uint64) * np.uint64(_MULT)) >> np.uint64(64 - bits)).astype(np.int64)
+
+
+def build_table(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Linear-probing table -> (slots of keys or EMPTY, row index per slot)."""
+    keys = np.asarray(keys, dtype=np.int64)
+    if len(np.unique(keys)) != len(keys):
+        raise ValueError("whitelist keys must be unique")
+    bits = _slot_bits(len(keys))
+    size = 1 << bits
+    slots = np.full(size, EMPTY, dtype=np.int64)
+    rows = np.full(size, EMPTY, dtype=np.int32)
+    pending = np.arange(len(keys))
+    pos = _hash_many(keys, bits)
+    while len(pending):
+        # the first key aiming at each free slot claims it; the rest probe on
+        free = slots[pos] == EMPTY
+        cand, at = pending[free], pos[free]
+        _, first = np.unique(at, return_index=True)
+        slots[at[first]] = keys[cand[first]]
+        rows[at[first]] = cand[first]
+        placed = np.zeros(len(pending), dtype=bool)
+        placed[np.flatnonzero(free)[first]] = True
+        pending, pos = pending[~placed], (pos[~placed] + 1) & (size - 1)
+    return slots, rows
+
+
+class Whitelist:
+    """Read-only view of one exported whitelist version."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.slots = np.asarray(np.load(self.path / "slots.npy", mmap_mode="r"))
+        self.rows = np.asarray(np.load(self.path / "rows.npy", mmap_mode="r"))
+        self.stats = np.load(self.path / "stats.npy", mmap_mode="r")
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.codec = ContextKeyCodec.load(self.path / "codec.json")
+        self._shift = 64 - int(np.log2(len(self.slots)))
+        self._mask = len(self.slots) - 1
+
+    @property
+    def version(self) -> str:
+        return self.path.name
+
+    def __len__(self):
+        return len(self.stats)
+
+    def find(self, key: int) -> int:
+        """Stats row of `key`, or -1."""
+        i = ((int(key) * _MULT) & _MASK64) >> self._shift
+        slots = self.slots
+        while True:
+            k = slots[i]
+            if k == key:
+                return int(self.rows[i])
+            if k == EMPTY:
+                return -1
+            i = (i + 1) & self._mask
+
+    def __contains__(self, key) -> bool:
+        return self.find(key) >= 0
+
+    def get(self, key, default=None):
+        row = self.find(key)
+        if row < 0:
+            return default
+        rec = self.stats[row]
+        return {name: rec[name].item() for name in STATS_DTYPE.names}
+
+
+def _select(summary: pd.DataFrame, codec: ContextKeyCodec, top_k: int, min_trades: int,
+            min_win_pct: float, min_sharpe: float, by: str) -> pd.DataFrame:
+    df = summary[(summary["n"] >= min_trades) & (summary["win_pct"] >= min_win_pct)
+                 & (summary["sharpe"] >= min_sharpe)]
+    # one grid cell per key (its best), then the top K keys of each trend x vol regime
+    df = df.sort_values(by, ascending=False, kind="stable").drop_duplicates("context_key")
+    fields = codec.decode(df["context_key"].to_numpy())
+    df = df.assign(_trend=fields["trend"], _vol=fields["vol_regime"])
+    return df.groupby(["_trend", "_vol"], sort=False).head(top_k).drop(columns=["_trend", "_vol"])
+
+
+def export_whitelist(summary: pd.DataFrame, root: str | Path = "data/whitelist", top_k: int = 20,
+                     min_trades: int = 50, min_win_pct: float = 0.0, min_sharpe: float = float("-inf"),
+                     by: str = "sharpe", codec: Optional[ContextKeyCodec] = None, keep: int = 3) -> Path:
+    """Write the top-K keys per regime of a ContextKey summary as a new version.
+
+    `summary` is `backtests.summarize.summarize_to_contextkeys` output (packed keys).
+    """
+    codec = codec or get_context_codec()
+    df = _select(summary, codec, top_k, min_trades, min_win_pct, min_sharpe, by)
+    keys = df["context_key"].to_numpy(np.int64)
+    slots, rows = build_table(keys)
+    stats = np.zeros(len(df), dtype=STATS_DTYPE)
+    for name in STATS_DTYPE.names:
+        if name in df:
+            stats[name] = df[name].to_numpy()
+
+    root = Path(root)
+    # sortable by creation time; the microseconds and pid keep same-second exports apart
+    stamp = time.strftime("%Y%m%dT%H%M%S") + f".{time.time_ns() // 1000 % 1_000_000:06d}-{os.getpid()}"
+    root.mkdir(parents=True, exist_ok=True)
+    for n in itertools.count():
+        version = stamp if n == 0 else f"{stamp}-{n}"
+        out = root / version
+        try:
+            out.mkdir()
+            break
+        except FileExistsError:
+            continue
+    np.save(out / "slots.npy", slots)
+    np.save(out / "rows.npy", rows)
+    np.save(out / "stats.npy", stats)
+    np.save(out / "keys.npy", keys)
+    codec.save(out / "codec.json")
+    (out / "meta.json").write_text(json.dumps({"count": len(keys), "top_k": top_k, "by": by,
+                                               "min_trades": min_trades, "created": time.time()}))
+    tmp = root / f".CURRENT.{os.getpid()}.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, root / "CURRENT")
+
+    # older versions may still be mapped by a running service; unlinking is safe
+    for old in sorted(p for p in root.iterdir() if p.is_dir())[:-keep]:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+    return out
+
+
+class WhitelistHandle:
+    """The current whitelist under `root`, re-checked at most every `check_every_s`."""
+
+    def __init__(self, root: str | Path = "data/whitelist", check_every_s: float = 5.0):
+        self.root = Path(root)
+        self.check_every_s = check_every_s
+        self._current: Optional[Whitelist] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Whitelist]:
+        now = time.monotonic()
+        if now - self._checked >= self.check_every_s:
+            with self._lock:
+                if now - self._checked >= self.check_every_s:
+                    self._reload()
+                    self._checked = now
+        return self._current
+
+    def _reload(self):
+        try:
+            version = (self.root / "CURRENT").read_text().strip()
+            if self._current is None or self._current.version != version:
+                self._current = Whitelist(self.root / version)  # single reference swap
+        except (OSError, ValueError, KeyError):
+            # CURRENT missing, or its version pruned / half-published mid-swap:
+            # keep serving the mapping we have and try again on the next check
+            incr("whitelist_reload_errors")
+
+    @property
+    def codec(self) -> ContextKeyCodec:
+        wl = self.current()
+        return get_context_codec() if wl is None else wl.codec
+
+    def get(self, key, default=None):
+        wl = self.current()
+        return default if wl is None else wl.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        wl = self.current()
+        return wl is not None and key in wl
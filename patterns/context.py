@@ -1,4 +1,10 @@
-from typing import Literal
+import json
+import os
+from pathlib import Path
+from typing import Dict, Literal, Optional
+
+import numpy as np
+import pandas as pd
 
 def build_context_key(
     symbol: str,
@@ -10,3 +16,129 @@ def build_context_key(
     vol_regime: Literal["low","mid","high"],
 ) -> str:
     return "|".join([symbol, timeframe, candle, macd_sign, rsi_state, trend, vol_regime])
+
+def macd_sign_labels(macd_hist, eps: float = 0.0):
+    """Vectorized `macd_sign` field from a MACD histogram (macd - signal)."""
+    h = np.asarray(macd_hist, dtype=float)
+    return np.where(h > eps, "pos", np.where(h < -eps, "neg", "flat"))
+
+def rsi_state_labels(rsi, overbought: float = 70.0, oversold: float = 30.0):
+    """Vectorized `rsi_state` field; NaN (warm-up) maps to neutral."""
+    r = np.asarray(rsi, dtype=float)
+    return np.where(r >= overbought, "overbought", np.where(r <= oversold, "oversold", "neutral"))
+
+def build_context_keys(symbol, timeframe, candle, macd_sign, rsi_state, trend, vol_regime):
+    """Column-wise `build_context_key`; scalar fields broadcast against array fields."""
+    parts = np.broadcast_arrays(*[np.asarray(p, dtype=object) for p in
+                                  (symbol, timeframe, candle, macd_sign, rsi_state, trend, vol_regime)])
+    out = parts[0].astype(object)
+    for p in parts[1:]:
+        out = out + "|" + p
+    return out
+
+# Packed ContextKey: each field is a code into an append-only, interned vocabulary,
+# bit-packed into one int64 (symbol in the high bits, so sorting groups by symbol).
+CONTEXT_FIELDS = ["symbol", "timeframe", "candle", "macd_sign", "rsi_state", "trend", "vol_regime"]
+FIELD_BITS = {"symbol": 20, "timeframe": 4, "candle": 8, "macd_sign": 2,
+              "rsi_state": 2, "trend": 2, "vol_regime": 2}
+FIXED_VOCAB = {"macd_sign": ["flat", "pos", "neg"],
+               "rsi_state": ["neutral", "overbought", "oversold"],
+               "trend": ["flat", "up", "down"],
+               "vol_regime": ["low", "mid", "high"]}
+
+_SHIFTS = {}
+_shift = 0
+for _f in reversed(CONTEXT_FIELDS):
+    _SHIFTS[_f] = _shift
+    _shift += FIELD_BITS[_f]
+
+
+class ContextKeyCodec:
+    """Vectorized ContextKey <-> int64 codec over per-field interned dictionaries.
+
+    Codes are assigned in first-seen order and never reused, so a persisted
+    codec keeps decoding keys written by earlier runs.
+    """
+
+    def __init__(self, vocab: Optional[Dict[str, list]] = None):
+        vocab = vocab or {}
+        self.vocab = {f: list(vocab.get(f, FIXED_VOCAB.get(f, []))) for f in CONTEXT_FIELDS}
+        self._index = {f: pd.Index(v, dtype=object) for f, v in self.vocab.items()}
+
+    def intern(self, field: str, values) -> None:
+        new = [v for v in pd.unique(np.asarray(values, dtype=object).ravel())
+               if v not in self._index[field]]
+        if not new:
+            return
+        if len(self.vocab[field]) + len(new) > 1 << FIELD_BITS[field]:
+            raise OverflowError(f"{field}: more than {1 << FIELD_BITS[field]} distinct values")
+        self.vocab[field] += [str(v) for v in new]
+        self._index[field] = pd.Index(self.vocab[field], dtype=object)
+
+    def _codes(self, field: str, values, grow: bool) -> np.ndarray:
+        values = np.asarray(values, dtype=object)
+        codes = self._index[field].get_indexer(values.ravel())
+        if (codes < 0).any():
+            if not grow:
+                missing = pd.unique(values.ravel()[codes < 0])[:5]
+                raise KeyError(f"{field}: not in codec vocabulary: {list(missing)}")
+            self.intern(field, values)
+            codes = self._index[field].get_indexer(values.ravel())
+        return codes.astype(np.int64).reshape(values.shape)
+
+    def encode(self, symbol, timeframe, candle, macd_sign, rsi_state, trend, vol_regime,
+               grow: bool = True) -> np.ndarray:
+        """Pack fields (scalars broadcast against arrays) into int64 keys."""
+        fields = (symbol, timeframe, candle, macd_sign, rsi_state, trend, vol_regime)
+        key = np.zeros(np.broadcast_shapes(*[np.shape(v) for v in fields]), dtype=np.int64)
+        for f, v in zip(CONTEXT_FIELDS, fields):
+            key |= self._codes(f, v, grow) << _SHIFTS[f]
+        return key
+
+    def decode(self, keys) -> Dict[str, np.ndarray]:
+        """int64 keys -> {field: object array of labels}."""
+        keys = np.asarray(keys, dtype=np.int64)
+        return {f: np.asarray(self.vocab[f], dtype=object)[(keys >> _SHIFTS[f]) & ((1 << FIELD_BITS[f]) - 1)]
+                for f in CONTEXT_FIELDS}
+
+    def to_strings(self, keys) -> np.ndarray:
+        """Packed keys -> `build_context_key` strings (each distinct key joined once)."""
+        uniq, inv = np.unique(np.asarray(keys, dtype=np.int64), return_inverse=True)
+        return build_context_keys(*self.decode(uniq).values())[inv.reshape(np.shape(keys))]
+
+    def from_strings(self, strings, grow: bool = True) -> np.ndarray:
+        parts = pd.Series(np.asarray(strings, dtype=object)).str.split("|", expand=True)
+        if parts.shape[1] != len(CONTEXT_FIELDS):
+            raise ValueError(f"expected {len(CONTEXT_FIELDS)} '|'-separated fields")
+        return self.encode(*[parts[i].to_numpy(object) for i in range(len(CONTEXT_FIELDS))], grow=grow)
+
+    def to_dict(self) -> dict:
+        return {"bits": FIELD_BITS, "vocab": self.vocab}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ContextKeyCodec":
+        if d.get("bits", FIELD_BITS) != FIELD_BITS:
+            raise ValueError("codec was written with a different bit layout")
+        return cls(d.get("vocab"))
+
+    def save(self, path: str | Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.to_dict(), indent=1))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "ContextKeyCodec":
+        path = Path(path)
+        return cls.from_dict(json.loads(path.read_text())) if path.exists() else cls()
+
+
+_codec: Optional[ContextKeyCodec] = None
+
+
+def get_context_codec() -> ContextKeyCodec:
+    global _codec
+    if _codec is None:
+        _codec = ContextKeyCodec.load(os.getenv("CONTEXT_CODEC", "data/parquet/_state/context_codec.json"))
+    return _codec
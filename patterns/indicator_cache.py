@@ -0,0 +1,158 @@
+"""
+On-disk, incrementally extended indicator cache.
+
+Per (symbol, timeframe, indicator params) the cache keeps the computed columns,
+partitioned by month like `engine.bar_store`, and the recursive state after the
+last cached bar:
+
+    <root>/<timeframe>/<SYMBOL>/<params>/<YYYY-MM>.parquet   ts, close + indicator columns
+    <root>/<timeframe>/<SYMBOL>/<params>/state.json           state after the last row
+
+Bars newer than the last cached timestamp are fed through the saved state, so
+extending the cache only rewrites the month(s) the new bars fall in, and a read
+only opens the months the requested bars cover. Values equal a recompute over
+the bars since the first cached bar (not over history the cache never saw). If
+the requested bars don't line up with the cache (a cached bar's close was
+revised, a bar is missing, or they start before it) the entry is rebuilt from
+the given bars. `retain_months` (INDICATOR_RETAIN_MONTHS, 24 by default; 0 keeps
+everything) drops months that far behind the newest one.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .recursive import BASIC_COLUMNS, BasicIndicatorState
+
+STATE_FILE = "state.json"
+
+
+def _params_key(state: BasicIndicatorState) -> str:
+    p = state.params
+    return f"rsi{p['rsi']}_macd{'-'.join(map(str, p['macd']))}_atr{p['atr']}"
+
+
+def _ns(ts) -> np.ndarray:
+    return pd.DatetimeIndex(pd.to_datetime(ts, utc=True)).tz_localize(None).as_unit("ns").asi8
+
+
+def _month(ts) -> str:
+    return pd.Timestamp(ts).strftime("%Y-%m")
+
+
+class IndicatorCache:
+    def __init__(self, root: str | Path = "data/indicators", retain_months: int = 0):
+        self.root = Path(root)
+        self.retain_months = retain_months
+
+    def _dir(self, symbol: str, timeframe: str, key: str) -> Path:
+        return self.root / timeframe / symbol.upper() / key
+
+    def _load_state(self, d: Path):
+        p = d / STATE_FILE
+        if not p.exists():
+            return None, None
+        payload = json.loads(p.read_text())
+        return BasicIndicatorState.from_dict(payload["state"]), payload["last_ts"]
+
+    def _read(self, d: Path, start) -> pd.DataFrame:
+        """Cached rows from the month of `start` on."""
+        first = _month(start)
+        parts = [pd.read_parquet(p) for p in sorted(d.glob("*.parquet")) if p.stem >= first]
+        if not parts:
+            return pd.DataFrame(columns=["ts", "close", *BASIC_COLUMNS])
+        return pd.concat(parts, ignore_index=True)
+
+    def _append(self, d: Path, rows: pd.DataFrame, state: BasicIndicatorState):
+        """Merge `rows` into their month files, then record `state` as of the last row."""
+        d.mkdir(parents=True, exist_ok=True)
+        ts = pd.to_datetime(rows["ts"], utc=True)
+        for month, part in rows.groupby(ts.dt.strftime("%Y-%m").to_numpy(), sort=True):
+            path = d / f"{month}.parquet"
+            if path.exists():
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+                part = part.drop_duplicates("ts", keep="last").reset_index(drop=True)
+            tmp = path.with_suffix(".parquet.tmp")
+            part.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        payload = {"last_ts": str(ts.iloc[-1]), "state": state.to_dict()}
+        tmp = d / f"{STATE_FILE}.tmp"
+        tmp.write_text(json.dumps(payload))
+        os.replace(tmp, d / STATE_FILE)
+        if self.retain_months:
+            cutoff = (ts.iloc[-1].tz_localize(None).to_period("M") - self.retain_months).strftime("%Y-%m")
+            for p in d.glob("*.parquet"):
+                if p.stem < cutoff:
+                    p.unlink()
+
+    def attach(self, symbol: str, timeframe: str, bars: pd.DataFrame,
+               state: Optional[BasicIndicatorState] = None) -> pd.DataFrame:
+        """Return `bars` with rsi/macd/macd_signal/atr columns, extending the cache.
+
+        `bars` needs ts/high/low/close; `state` only selects the parameters
+        (a fresh `BasicIndicatorState()` -> add_basic_indicators defaults).
+        """
+        out = bars.drop(columns=[c for c in BASIC_COLUMNS if c in bars]).reset_index(drop=True)
+        if out.empty:
+            return out.assign(**{c: pd.Series(dtype=float) for c in BASIC_COLUMNS})
+        fresh = BasicIndicatorState.from_dict(state.to_dict()) if state else BasicIndicatorState()
+        d = self._dir(symbol, timeframe, _params_key(fresh))
+        saved, last_ts = self._load_state(d)
+
+        ts = _ns(out["ts"])
+        values = None
+        if saved is not None:
+            cached = self._read(d, out["ts"].iloc[0])
+            cts = _ns(cached["ts"])
+            last = int(_ns([last_ts])[0])
+            new = ts > last
+            n_old = int((~new).sum())
+            pos = np.minimum(np.searchsorted(cts, ts[:n_old]), max(len(cts) - 1, 0))
+            aligned = bool((cts[pos] == ts[:n_old]).all()) if len(cts) else n_old == 0
+            # the cached values only hold for the closes they were computed from
+            aligned = aligned and "close" in cached and np.array_equal(
+                cached["close"].to_numpy(np.float64)[pos],
+                out["close"].to_numpy(np.float64)[:n_old], equal_nan=True)
+            # new bars may only extend the cache if they pick up right after its last row
+            contiguous = not new.any() or (n_old > 0 and ts[n_old - 1] == last)
+            if aligned and contiguous:
+                tail = out.iloc[n_old:]
+                ext = saved.run(tail["high"], tail["low"], tail["close"])
+                if len(tail):
+                    add = pd.DataFrame(ext, columns=BASIC_COLUMNS)
+                    add.insert(0, "close", tail["close"].to_numpy(np.float64))
+                    add.insert(0, "ts", tail["ts"].to_numpy())
+                    self._append(d, add, saved)
+                values = np.concatenate([cached[BASIC_COLUMNS].to_numpy(np.float64)[pos], ext])
+        if values is None:
+            values = fresh.run(out["high"], out["low"], out["close"])
+            rows = pd.DataFrame(values, columns=BASIC_COLUMNS)
+            rows.insert(0, "close", out["close"].to_numpy(np.float64))
+            rows.insert(0, "ts", out["ts"].to_numpy())
+            shutil.rmtree(d, ignore_errors=True)
+            self._append(d, rows, fresh)
+        for i, c in enumerate(BASIC_COLUMNS):
+            out[c] = values[:, i]
+        return out
+
+
+_cache: Optional[IndicatorCache] = None
+
+
+def get_indicator_cache() -> IndicatorCache:
+    global _cache
+    if _cache is None:
+        _cache = IndicatorCache(os.getenv("INDICATORS_ROOT", "data/indicators"),
+                                retain_months=int(os.getenv("INDICATOR_RETAIN_MONTHS", "24")))
+    return _cache
+
+
+def add_basic_indicators_cached(df: pd.DataFrame, symbol: str, timeframe: str) -> pd.DataFrame:
+    """Cached, incremental counterpart of `patterns.indicators.add_basic_indicators`."""
+    return get_indicator_cache().attach(symbol, timeframe, df)
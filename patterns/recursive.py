@@ -0,0 +1,222 @@
+"""
+Recursive indicator state.
+
+Each state object consumes one bar at a time and can be serialized, so a
+series can be extended later from where it stopped. The update rules mirror
+pandas' `ewm(...).mean()` step for step (including its NaN handling), which is
+what pandas_ta and ta build RSI/EMA/MACD/ATR on, so resuming from saved state
+reproduces a full recompute exactly.
+"""
+from __future__ import annotations
+
+import math
+import sys
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+NAN = float("nan")
+EPS = sys.float_info.epsilon
+
+
+@dataclass
+class EWMState:
+    """`Series.ewm(alpha=alpha, adjust=adjust, min_periods=min_periods).mean()`."""
+    alpha: float
+    adjust: bool = False
+    min_periods: int = 0
+    weighted: float = NAN
+    old_wt: float = 1.0
+    nobs: int = 0
+
+    def update(self, x: float) -> float:
+        is_obs = x == x
+        self.nobs += is_obs
+        w = self.weighted
+        if w == w:
+            self.old_wt *= 1.0 - self.alpha
+            if is_obs:
+                new_wt = 1.0 if self.adjust else self.alpha
+                if w != x:
+                    self.weighted = (self.old_wt * w + new_wt * x) / (self.old_wt + new_wt)
+                self.old_wt = self.old_wt + new_wt if self.adjust else 1.0
+        elif is_obs:
+            self.weighted = x
+        return self.weighted if self.nobs >= max(self.min_periods, 1) else NAN
+
+
+@dataclass
+class SeededEMAState:
+    """pandas_ta `ema(length)`: SMA of the first `length` values, then adjust=False EWM."""
+    length: int
+    warm: list = field(default_factory=list)
+    ewm: EWMState = None
+
+    def __post_init__(self):
+        if self.ewm is None:
+            self.ewm = EWMState(alpha=2.0 / (self.length + 1), adjust=False)
+        elif isinstance(self.ewm, dict):
+            self.ewm = EWMState(**self.ewm)
+
+    def update(self, x: float) -> float:
+        if len(self.warm) < self.length:
+            if x != x and not self.warm:
+                return NAN  # leading NaNs are dropped (pandas_ta slices from first_valid_index)
+            self.warm.append(x)
+            if len(self.warm) < self.length:
+                return NAN
+            valid = [v for v in self.warm if v == v]
+            x = math.fsum(valid) / len(valid) if valid else NAN  # Series.mean skips NaN
+        return self.ewm.update(x)
+
+
+@dataclass
+class RSIState:
+    """pandas_ta `rsi(length)`: Wilder averages via adjust=True RMA."""
+    length: int = 14
+    prev: float = NAN
+    up: EWMState = None
+    down: EWMState = None
+
+    def __post_init__(self):
+        for name in ("up", "down"):
+            v = getattr(self, name)
+            if v is None:
+                setattr(self, name, EWMState(alpha=1.0 / self.length, adjust=True,
+                                             min_periods=self.length))
+            elif isinstance(v, dict):
+                setattr(self, name, EWMState(**v))
+
+    def update(self, close: float) -> float:
+        d = close - self.prev
+        self.prev = close
+        pos = self.up.update(d if d != d or d > 0 else 0.0)
+        neg = self.down.update(d if d != d or d < 0 else 0.0)
+        return 100.0 * pos / (pos + abs(neg))
+
+
+@dataclass
+class TaRSIState:
+    """ta `RSIIndicator(window)`: adjust=False Wilder averages, 100 when there are no losses."""
+    window: int = 14
+    prev: float = NAN
+    up: EWMState = None
+    down: EWMState = None
+
+    def __post_init__(self):
+        for name in ("up", "down"):
+            v = getattr(self, name)
+            if v is None:
+                setattr(self, name, EWMState(alpha=1.0 / self.window, adjust=False,
+                                             min_periods=self.window))
+            elif isinstance(v, dict):
+                setattr(self, name, EWMState(**v))
+
+    def update(self, close: float) -> float:
+        d = close - self.prev
+        self.prev = close
+        up = self.up.update(d if d > 0 else 0.0)  # first diff is NaN -> 0.0, as Series.where
+        down = self.down.update(-d if d < 0 else 0.0)
+        if down == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + up / down)
+
+
+def ta_ema_state(window: int) -> EWMState:
+    """ta `EMAIndicator(window)`."""
+    return EWMState(alpha=2.0 / (window + 1), adjust=False, min_periods=window)
+
+
+@dataclass
+class MACDState:
+    """pandas_ta `macd(fast, slow, signal)` -> (macd, signal line)."""
+    fast: int = 12
+    slow: int = 26
+    signal: int = 9
+    fast_ema: SeededEMAState = None
+    slow_ema: SeededEMAState = None
+    signal_ema: SeededEMAState = None
+
+    def __post_init__(self):
+        for name, length in (("fast_ema", self.fast), ("slow_ema", self.slow),
+                             ("signal_ema", self.signal)):
+            v = getattr(self, name)
+            if v is None:
+                setattr(self, name, SeededEMAState(length))
+            elif isinstance(v, dict):
+                setattr(self, name, SeededEMAState(**v))
+
+    def update(self, close: float) -> tuple[float, float]:
+        m = self.fast_ema.update(close) - self.slow_ema.update(close)
+        return m, self.signal_ema.update(m)
+
+
+@dataclass
+class ATRState:
+    """pandas_ta `atr(length)`: RMA of the true range. The first bar has no range;
+    a zero high-low range counts as machine epsilon (`non_zero_range`) and a
+    missing previous close leaves just the high-low range (row-wise max skips NaN)."""
+    length: int = 14
+    prev_close: float = NAN
+    rma: EWMState = None
+    seen: int = 0
+
+    def __post_init__(self):
+        if self.rma is None:
+            self.rma = EWMState(alpha=1.0 / self.length, adjust=True, min_periods=self.length)
+        elif isinstance(self.rma, dict):
+            self.rma = EWMState(**self.rma)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        pc = self.prev_close
+        self.prev_close = close
+        first = not self.seen
+        self.seen = 1
+        if first:
+            return self.rma.update(NAN)
+        hl = high - low
+        if hl == 0:
+            hl = EPS
+        parts = [v for v in (hl, abs(high - pc), abs(pc - low)) if v == v]
+        return self.rma.update(max(parts) if parts else NAN)
+
+
+BASIC_COLUMNS = ["rsi", "macd", "macd_signal", "atr"]
+
+
+@dataclass
+class BasicIndicatorState:
+    """The RSI/MACD/ATR set of `patterns.indicators.add_basic_indicators`."""
+    rsi: RSIState = None
+    macd: MACDState = None
+    atr: ATRState = None
+
+    def __post_init__(self):
+        self.rsi = RSIState(**self.rsi) if isinstance(self.rsi, dict) else (self.rsi or RSIState())
+        self.macd = MACDState(**self.macd) if isinstance(self.macd, dict) else (self.macd or MACDState())
+        self.atr = ATRState(**self.atr) if isinstance(self.atr, dict) else (self.atr or ATRState())
+
+    @property
+    def params(self) -> dict:
+        return {"rsi": self.rsi.length, "macd": [self.macd.fast, self.macd.slow, self.macd.signal],
+                "atr": self.atr.length}
+
+    def update(self, high: float, low: float, close: float) -> tuple[float, float, float, float]:
+        m, s = self.macd.update(close)
+        return self.rsi.update(close), m, s, self.atr.update(high, low, close)
+
+    def run(self, high, low, close) -> np.ndarray:
+        """Feed arrays of bars; returns an (n, 4) array in `BASIC_COLUMNS` order."""
+        out = np.empty((len(close), 4))
+        for i, (h, l, c) in enumerate(zip(np.asarray(high, float).tolist(),
+                                          np.asarray(low, float).tolist(),
+                                          np.asarray(close, float).tolist())):
+            out[i] = self.update(h, l, c)
+        return out
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "BasicIndicatorState":
+        return cls(**d)
@@ -0,0 +1,173 @@
+"""
+Panel-wide candle pattern scanner.
+
+OHLC is laid out as 2-D (time x symbol) arrays and every registered pattern is
+a small NumPy kernel over them. Shared intermediates (previous bar, body, range,
+wicks) are computed once per scan, so each extra pattern costs one kernel, not
+another pass over per-symbol frames. The result is one uint64 bitmask per bar
+and symbol; bit `pattern_bit(name)` is set when `name` fires, and the pattern
+name is the `candle` field of the ContextKey.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+MAX_PATTERNS = 64
+
+# name -> kernel(candles, **params) -> bool array shaped like the panel
+PATTERNS: Dict[str, Callable] = {}
+
+
+def register_pattern(name: str):
+    """Decorator adding a kernel to the registry; bits follow registration order."""
+    def wrap(fn):
+        if name not in PATTERNS and len(PATTERNS) >= MAX_PATTERNS:
+            raise OverflowError(f"at most {MAX_PATTERNS} patterns fit a uint64 mask")
+        PATTERNS[name] = fn
+        return fn
+    return wrap
+
+
+def pattern_bit(name: str) -> int:
+    return list(PATTERNS).index(name)
+
+
+@dataclass
+class Candles:
+    """OHLC arrays, 1-D (one symbol) or 2-D (time x symbol); NaN for missing bars."""
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "Candles":
+        return cls(*(df[c].to_numpy(np.float64) for c in ("open", "high", "low", "close")))
+
+    @staticmethod
+    def _prev(x: np.ndarray) -> np.ndarray:
+        out = np.empty_like(x)
+        out[:1] = np.nan
+        out[1:] = x[:-1]
+        return out
+
+    @cached_property
+    def prev_open(self):
+        return self._prev(self.open)
+
+    @cached_property
+    def prev_close(self):
+        return self._prev(self.close)
+
+    @cached_property
+    def body(self):
+        return np.abs(self.close - self.open)
+
+    @cached_property
+    def range(self):
+        r = self.high - self.low
+        return np.where(r == 0, 1e-9, r)
+
+    @cached_property
+    def body_low(self):
+        return np.where(self.close >= self.open, self.open, self.close)
+
+    @cached_property
+    def body_high(self):
+        return np.where(self.close >= self.open, self.close, self.open)
+
+    @cached_property
+    def lower_wick(self):
+        return np.abs(self.body_low - self.low)
+
+    @cached_property
+    def upper_wick(self):
+        return np.abs(self.high - self.body_high)
+
+
+@register_pattern("bullish_engulfing")
+def bullish_engulfing(b: Candles) -> np.ndarray:
+    po, pc = b.prev_open, b.prev_close
+    return (b.close > b.open) & (pc < po) & (b.close >= po) & (b.open <= pc)
+
+
+@register_pattern("hammer")
+def hammer(b: Candles, body_thresh: float = 0.3, lower_wick_mult: float = 2.0) -> np.ndarray:
+    return (b.body / b.range < body_thresh) & (b.lower_wick > lower_wick_mult * b.body)
+
+
+@register_pattern("bearish_engulfing")
+def bearish_engulfing(b: Candles) -> np.ndarray:
+    po, pc = b.prev_open, b.prev_close
+    return (b.close < b.open) & (pc > po) & (b.close <= po) & (b.open >= pc)
+
+
+@register_pattern("shooting_star")
+def shooting_star(b: Candles, body_thresh: float = 0.3, upper_wick_mult: float = 2.0) -> np.ndarray:
+    return (b.body / b.range < body_thresh) & (b.upper_wick > upper_wick_mult * b.body)
+
+
+@register_pattern("doji")
+def doji(b: Candles, body_thresh: float = 0.1) -> np.ndarray:
+    return b.body / b.range < body_thresh
+
+
+def scan(candles: Candles, names: Optional[Iterable[str]] = None,
+         params: Optional[Mapping[str, dict]] = None) -> np.ndarray:
+    """Evaluate `names` (default: all registered) -> uint64 bitmask shaped like the panel."""
+    params = params or {}
+    mask = np.zeros(np.shape(candles.close), dtype=np.uint64)
+    with np.errstate(invalid="ignore"):
+        for name in (PATTERNS if names is None else names):
+            hit = PATTERNS[name](candles, **params.get(name, {}))
+            mask |= hit.astype(np.uint64) << np.uint64(pattern_bit(name))
+    return mask
+
+
+def has_pattern(mask: np.ndarray, name: str) -> np.ndarray:
+    return (mask >> np.uint64(pattern_bit(name))) & np.uint64(1) == 1
+
+
+def mask_names(mask: int) -> List[str]:
+    """Pattern names set in one bitmask value."""
+    return [name for i, name in enumerate(PATTERNS) if int(mask) >> i & 1]
+
+
+@dataclass
+class OHLCPanel:
+    ts: pd.DatetimeIndex
+    symbols: List[str]
+    candles: Candles
+
+    @classmethod
+    def from_frames(cls, frames: Mapping[str, pd.DataFrame], symbols: Optional[Sequence[str]] = None):
+        """Align per-symbol bar frames (ts + lowercase OHLC) on the union of timestamps."""
+        symbols = list(symbols or frames)
+        ts = pd.DatetimeIndex(sorted(set().union(*(frames[s]["ts"] for s in symbols)))) if symbols \
+            else pd.DatetimeIndex([])
+        cols = {c: np.full((len(ts), len(symbols)), np.nan) for c in ("open", "high", "low", "close")}
+        for j, s in enumerate(symbols):
+            df = frames[s]
+            rows = ts.get_indexer(df["ts"])
+            for c in cols:
+                cols[c][rows, j] = df[c].to_numpy(np.float64)
+        return cls(ts, symbols, Candles(**cols))
+
+    def scan(self, names: Optional[Iterable[str]] = None, params: Optional[Mapping[str, dict]] = None):
+        return scan(self.candles, names, params)
+
+
+def pattern_signal(name: str, **params) -> Callable[[pd.DataFrame], np.ndarray]:
+    """Per-frame entry callable for `engine.simulator.run_backtest`; tagged so the
+    simulator can evaluate all tagged strategies of a symbol in one `scan`."""
+    def signal(bars: pd.DataFrame) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            return PATTERNS[name](Candles.from_frame(bars), **params)
+    signal.pattern = name
+    signal.params = params
+    return signal
@@ -1,22 +1,46 @@
-import time
-# Placeholder imports; replace with real modules from your project
-# from engine.simulator import Simulator
-# from strategies.your_strategy import YourStrategy
+# scripts/paper_trader.py
+import asyncio
+import os
+
+from live.broker import AlpacaBroker, StubBroker
+from live.market_data import provider_from_env
+from live.rails import Rails
+from live.scheduler import BarCloseScheduler, SimulatedClock, SystemClock
+
+# ENV expected
+UNIVERSE = [s.strip().upper() for s in os.getenv("UNIVERSE", "SPY,QQQ").split(",") if s.strip()]
+INTERVAL = os.getenv("INTERVAL", "5m")
+LOOKBACK_DAYS = int(os.getenv("LOOKBACK_DAYS", "5"))
+SETTLE_S = float(os.getenv("BAR_SETTLE_S", "2"))  # wait after the close for the bar to publish
+CONCURRENCY = int(os.getenv("SIGNAL_CONCURRENCY", "8"))
+MAX_DAILY_DD_PCT = float(os.getenv("MAX_DAILY_DD_PCT", "2.0"))
+MAX_POSITIONS = int(os.getenv("MAX_POSITIONS", "10"))
+# Offline replay: SIM_START=2024-01-03T14:30 runs on a simulated clock with a stub broker
+SIM_START = os.getenv("SIM_START")
+SIM_END = os.getenv("SIM_END")
+MAX_BARS = int(os.getenv("MAX_BARS", "0")) or None
+
 
 def main():
-    """
-    A simple example trading loop using the project’s modules.
-    This is a stub: replace it with actual trading logic.
-    """
-    # simulator = Simulator()
-    # strategy = YourStrategy()
-    while True:
-        # In a real loop, fetch market data and generate orders, e.g.:
-        # data = simulator.get_market_data()
-        # order = strategy.compute_order(data)
-        # simulator.execute_order(order)
-        print("Running paper-trading loop iteration...")
-        time.sleep(5)
+    sim = SIM_START is not None
+    clock = SimulatedClock(SIM_START) if sim else SystemClock()
+    broker = StubBroker(clock) if sim else AlpacaBroker(paper=True)
+    scheduler = BarCloseScheduler(UNIVERSE, INTERVAL, provider_from_env(),
+                                  Rails(MAX_DAILY_DD_PCT, MAX_POSITIONS), broker, clock=clock,
+                                  lookback_days=LOOKBACK_DAYS, settle_s=SETTLE_S,
+                                  concurrency=CONCURRENCY)
+    print(f"[paper] {len(UNIVERSE)} symbols interval={INTERVAL} clock={type(clock).__name__}")
+    try:
+        asyncio.run(scheduler.run(max_bars=MAX_BARS, until=SIM_END))
+    except KeyboardInterrupt:
+        pass
+    df = scheduler.latency_frame()
+    if len(df):
+        lat = df["latency_s"]
+        print(f"[paper] bars={scheduler.bars_run} decisions={len(df)} "
+              f"entries={(df['action'] == 'enter').sum()} "
+              f"latency p50={lat.median():.3f}s p99={lat.quantile(0.99):.3f}s")
+
 
 if __name__ == "__main__":
     main()
@@ -1,24 +1,66 @@
 # scripts/run_backtests.py
-import os, json, math, time, pathlib
+import os, json, math, time, pathlib, shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import timedelta
 import pandas as pd
 
+from backtests.chunking import lpt_partition
+from backtests.incremental import IncrementalPlan, ResultsManifest, config_fingerprint
+from backtests.search import BacktestEvaluator, SearchLog, coarse_to_fine
+from engine.data_layer import get_chain_store, load_bars
+from engine.fill_model import LiquidityGates
+from engine.simulator import run_backtest
+from patterns.context import FIXED_VOCAB, get_context_codec
+from patterns.scanner import pattern_signal
+from utils.io import read_parquet_local, write_parquet_local, write_results
+from utils.object_store import BackgroundUploader, object_store_from_env
+from utils.telemetry import collect, span
+
 # ENV expected
 BUCKET = os.getenv("GCS_BUCKET")
 RESULTS_PREFIX = os.getenv("RESULTS_PREFIX", "nightly")
 TIMEFRAME = os.getenv("TIMEFRAME", "5m")
 LOOKBACK_DAYS = int(os.getenv("LOOKBACK_DAYS", "30"))
-TP_GRID = os.getenv("TP_GRID", "0.01,0.015,0.02").split(",")
-SL_GRID = os.getenv("SL_GRID", "0.005,0.01").split(",")
-MAXBARS_GRID = os.getenv("MAXBARS_GRID", "20,30").split(",")
+TP_GRID = [float(x) for x in os.getenv("TP_GRID", "0.01,0.015,0.02").split(",")]
+SL_GRID = [float(x) for x in os.getenv("SL_GRID", "0.005,0.01").split(",")]
+MAXBARS_GRID = [int(x) for x in os.getenv("MAXBARS_GRID", "20,30").split(",")]
 MIN_TRADES = int(os.getenv("MIN_TRADES", "1"))
 BATCH_SLEEP_S = int(os.getenv("BATCH_SLEEP_S", "0"))  # optional throttle
 DRY_RUN = os.getenv("DRY_RUN", "false").lower() == "true"
+# Only simulate entries after the stored watermark (plus still-open trades)
+INCREMENTAL = os.getenv("INCREMENTAL", "true").lower() == "true"
 
 # Shard info from Cloud Run Jobs
 TASK_INDEX = int(os.getenv("CLOUD_RUN_TASK_INDEX", "0"))
 TASK_COUNT = int(os.getenv("CLOUD_RUN_TASK_COUNT", "1"))
 
+# Worker processes per task (0 = all cores) and how often to push the shard manifest
+WORKERS = int(os.getenv("WORKERS", "0")) or os.cpu_count() or 1
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "25"))
+# Results go to the bucket (or RESULTS_STORE_DIR offline) file by file, in the
+# background, as each symbol finishes
+RESULTS_ROOT = pathlib.Path("data/parquet")
+STORE = object_store_from_env(RESULTS_PREFIX)
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+# Same id across retries of one execution, so a restarted task resumes its manifest
+RUN_ID = os.getenv("RUN_ID") or os.getenv("CLOUD_RUN_EXECUTION") or time.strftime("%Y%m%d")
+MANIFEST_ROOT = pathlib.Path("data/parquet/_manifest")
+MANIFEST = MANIFEST_ROOT / RUN_ID / f"shard-{TASK_INDEX}.jsonl"
+# Per-symbol stage timings (utils.telemetry spans), one parquet per shard
+TIMINGS = pathlib.Path("data/parquet/_timings") / RUN_ID / f"shard-{TASK_INDEX}.parquet"
+# Balance shards by last runs' per-symbol runtime instead of symbol count
+BALANCE_SHARDS = os.getenv("BALANCE_SHARDS", "true").lower() == "true"
+HISTORY_RUNS = int(os.getenv("HISTORY_RUNS", "7"))
+# Coarse-to-fine search: only cells surviving successive halving are kept (full recompute)
+SEARCH = os.getenv("SEARCH", "false").lower() == "true"
+SEARCH_ETA = int(os.getenv("SEARCH_ETA", "3"))
+SEARCH_RUNGS = int(os.getenv("SEARCH_RUNGS", "3"))
+THRESHOLDS = {"min_win_pct": float(os.getenv("MIN_WIN_PCT", "0.60")),
+              "min_sharpe": float(os.getenv("MIN_SHARPE", "0.8")),
+              "min_samples": int(os.getenv("MIN_SAMPLES", "50"))}
+# Interned ContextKey vocabularies, shared by all runs so packed keys stay stable
+CODEC_PATH = os.getenv("CONTEXT_CODEC", "data/parquet/_state/context_codec.json")
+
 # Optional: limit symbols for smoke-tests: "AAPL,MSFT,SPY"
 LIMIT_SYMBOLS = [s for s in os.getenv("LIMIT_SYMBOLS","").split(",") if s]
 
@@ -45,33 +87,285 @@ def shard_slice(items, idx, total):
     end = start + base + (1 if idx < extra else 0)
     return items[start:end]
 
+# Entry signals; each name becomes the `candle` field of the trade's ContextKey.
+# Scanner patterns are evaluated together in one pass per symbol.
+STRATEGIES = {name: pattern_signal(name) for name in
+              os.getenv("PATTERNS", "bullish_engulfing,hammer").split(",") if name}
+
+def load_runtime_history():
+    # Per-symbol cost from earlier runs' manifests (never this run's, which other
+    # tasks are still writing), so every task sees the same history. Only the
+    # HISTORY_RUNS most recently written runs are downloaded, each into a temp dir
+    # renamed into place once complete. If the store can't be read this task would
+    # plan its shard from different history than the others, and the shards would
+    # no longer partition the universe, so a balanced multi-task run stops here.
+    if STORE:
+        try:
+            updated = {}
+            for key, mtime in STORE.list("_manifest").items():
+                run = key.split("/")[1]
+                if run != RUN_ID:
+                    updated[run] = max(updated.get(run, 0.0), mtime)
+            for run in sorted(updated, key=updated.get)[-HISTORY_RUNS:]:
+                tmp = MANIFEST_ROOT / f".{run}.tmp"
+                shutil.rmtree(tmp, ignore_errors=True)
+                STORE.pull(f"_manifest/{run}", tmp)
+                shutil.rmtree(MANIFEST_ROOT / run, ignore_errors=True)
+                if tmp.exists():
+                    os.replace(tmp, MANIFEST_ROOT / run)
+        except OSError as e:
+            if BALANCE_SHARDS and TASK_COUNT > 1:
+                raise SystemExit(f"[plan] runtime history unavailable, cannot plan shard: {e}")
+            print(f"[plan] runtime history unavailable: {e}")
+            return {}
+    runs = []
+    for d in MANIFEST_ROOT.glob("*") if MANIFEST_ROOT.exists() else []:
+        if not d.is_dir() or d.name == RUN_ID or d.name.startswith("."):
+            continue
+        recs = []
+        for f in sorted(d.glob("shard-*.jsonl")):
+            for line in f.read_text().splitlines():
+                try:
+                    recs.append(json.loads(line))
+                except ValueError:
+                    continue
+        recs = [r for r in recs if r.get("ok") and "ts" in r]
+        if recs:
+            runs.append((max(r["ts"] for r in recs), d.name, recs))
+    history = {}
+    for _, _, recs in sorted(runs)[-HISTORY_RUNS:]:
+        for r in sorted(recs, key=lambda r: r["ts"]):
+            history[r["symbol"]] = r
+    return history
+
+def plan_shard(symbols, idx, total, history):
+    # LPT bin packing on predicted seconds; symbols without history get the median cost
+    known = {s: history[s]["seconds"] for s in symbols if s in history}
+    if not BALANCE_SHARDS or total <= 1 or not known:
+        return shard_slice(symbols, idx, total)
+    vals = sorted(known.values())
+    default = vals[len(vals) // 2]
+    costs = {s: max(known.get(s, default), 1e-3) for s in symbols}
+    return lpt_partition(costs, total)[idx]
+
+def store_key(path):
+    return pathlib.Path(path).relative_to(RESULTS_ROOT).as_posix()
+
+def fetch_previous(*paths):
+    # Yesterday's trades/state live in the bucket; a fresh container has no local copy
+    if not STORE:
+        return
+    for p in paths:
+        p = pathlib.Path(p)
+        if not p.exists():
+            STORE.get(store_key(p), p)
+
+def prepare_codec(symbols):
+    # Every task seeds the vocabulary from the full universe in the same order (not
+    # just its shard), so packed keys agree across shards; workers only read it
+    # and encode with grow=False, so every field is interned here.
+    fetch_previous(CODEC_PATH)
+    codec = get_context_codec()
+    codec.intern("symbol", symbols)
+    codec.intern("timeframe", [TIMEFRAME])
+    codec.intern("candle", list(STRATEGIES))
+    for field, labels in FIXED_VOCAB.items():
+        codec.intern(field, labels)
+    codec.save(CODEC_PATH)
+
+def search_one_symbol(symbol, start, out_path):
+    # Explored cells and pruning decisions go to _search/<run>/<symbol>_<tf>.jsonl
+    log_path = RESULTS_ROOT / "_search" / RUN_ID / f"{symbol}_{TIMEFRAME}.jsonl"
+    log = SearchLog(log_path)
+    axes = {"tp": sorted(TP_GRID), "sl": sorted(SL_GRID), "max_bars": sorted(MAXBARS_GRID)}
+    parts, simulated = [], 0
+    for name, signal in STRATEGIES.items():
+        ev = BacktestEvaluator([symbol], TIMEFRAME, name, signal, LiquidityGates(), None, {"start": start},
+                               grow_codec=False)
+        keep = coarse_to_fine(ev, axes, THRESHOLDS, eta=SEARCH_ETA, rungs=SEARCH_RUNGS, log=log,
+                              tag={"symbol": symbol, "strategy": name})
+        simulated += ev.simulated
+        if len(keep) and len(ev.trades):
+            parts.append(ev.trades.merge(keep[list(axes)], on=list(axes)))
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    df = df.drop(columns=["entry_idx", "exit_idx"], errors="ignore")
+    if len(df) >= MIN_TRADES:
+        write_results(df, out_path)
+    elif out_path.exists():
+        out_path.unlink()  # nothing passed tonight: drop yesterday's cells (the upload deletes it too)
+    # The file now holds only surviving cells, so the incremental state of the
+    # full grid no longer describes it: drop it (locally and, via the upload, in
+    # the store) and the next incremental run starts with a full recompute.
+    state_path = ResultsManifest().path(symbol, TIMEFRAME)
+    state_path.unlink(missing_ok=True)
+    bars = load_bars(symbol, TIMEFRAME, start=start, columns=["ts"])
+    return {"bars": len(bars), "trades": len(df), "simulated": simulated,
+            "contracts": get_chain_store().contract_count(symbol),
+            "files": [str(out_path), str(log_path), str(state_path)]}
+
 def run_one_symbol(symbol):
-    # === call your existing backtest runner here ===
-    # should return a dataframe of trades OR save parquet to local disk
-    # Example:
-    # df = backtest(symbol, timeframe=TIMEFRAME, tp_list=TP_GRID, sl_list=SL_GRID, maxbars_list=MAXBARS_GRID, lookback_days=LOOKBACK_DAYS)
-    # df.to_parquet(f"data/parquet/{symbol}_{TIMEFRAME}.parquet")
-    return True
+    # All TP x SL x MAXBARS cells are evaluated in one pass per entry (engine.barriers).
+    start = pd.Timestamp.now(tz="UTC") - timedelta(days=LOOKBACK_DAYS)
+    grid = {"tp": TP_GRID, "sl": SL_GRID, "max_bars": MAXBARS_GRID, "start": start}
+    out_path = RESULTS_ROOT / f"{symbol}_{TIMEFRAME}.parquet"
+    if SEARCH:
+        return search_one_symbol(symbol, start, out_path)
+    manifest = ResultsManifest()
+
+    configs = {name: config_fingerprint(strategy=name, timeframe=TIMEFRAME, tp=TP_GRID, sl=SL_GRID,
+                                        max_bars=MAXBARS_GRID, gates=vars(LiquidityGates()))
+               for name in STRATEGIES}
+    existing, state = pd.DataFrame(), {}
+    if INCREMENTAL:
+        fetch_previous(out_path, manifest.path(symbol, TIMEFRAME))
+        state = manifest.load(symbol, TIMEFRAME)
+        if out_path.exists():
+            existing = read_parquet_local(out_path)
+    plan = IncrementalPlan(existing, state, configs)
+
+    fresh = run_backtest([symbol], TIMEFRAME, STRATEGIES, None, grid, LiquidityGates(), None,
+                         entry_filter=plan.entry_filter, grow_codec=False)
+    fresh = fresh.drop(columns=["entry_idx", "exit_idx"], errors="ignore")  # window-relative
+    df = plan.merge(existing, fresh, start)
+    files = []
+    if len(df) >= MIN_TRADES:
+        write_results(df, out_path)
+        files.append(str(out_path))
+
+    bars = load_bars(symbol, TIMEFRAME, start=start, columns=["ts"])
+    if len(bars):
+        watermark = str(bars["ts"].iloc[-1])
+        manifest.save(symbol, TIMEFRAME, {name: {"config": cfg, "watermark": watermark}
+                                          for name, cfg in configs.items()})
+        files.append(str(manifest.path(symbol, TIMEFRAME)))
+    # size stats feed the runtime history used to balance the next run;
+    # `files` are what the parent process uploads for this symbol
+    return {"bars": len(bars), "trades": len(df), "simulated": len(fresh),
+            "contracts": get_chain_store().contract_count(symbol), "files": files}
 
 def upload_results():
-    # Mirror local parquet to GCS prefix
-    # (requires gsutil in container or python GCS client; gsutil is simplest)
-    os.system(f'gsutil -m rsync -r data/parquet gs://{BUCKET}/{RESULTS_PREFIX}/')
+    # Full mirror of local parquet to the GCS prefix; only a fallback now that
+    # files are uploaded as they finish
+    with span("upload"):
+        os.system(f'gsutil -m rsync -r data/parquet gs://{BUCKET}/{RESULTS_PREFIX}/')
+
+def upload(uploader, *paths):
+    if uploader is not None:
+        for p in paths:
+            if pathlib.Path(p).is_relative_to(RESULTS_ROOT):
+                uploader.submit(p, store_key(p))
+
+def restore_manifest():
+    # A retried task starts on a fresh container: pull the manifest it pushed before dying
+    if STORE and not MANIFEST.exists():
+        STORE.get(store_key(MANIFEST), MANIFEST)
+
+def load_manifest():
+    done = set()
+    if MANIFEST.exists():
+        for line in MANIFEST.read_text().splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash
+            if rec.get("ok"):
+                done.add(rec["symbol"])
+    return done
+
+def record(rec):
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    with open(MANIFEST, "a") as f:
+        f.write(json.dumps(rec) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def run_symbol_task(symbol):
+    # Runs in a worker process; each symbol writes its own parquet, so workers never share a file
+    t0 = time.time()
+    with collect() as stages:
+        try:
+            stats = run_one_symbol(symbol)
+            rec = {"symbol": symbol, "ok": True, **(stats or {})}
+        except Exception as e:
+            rec = {"symbol": symbol, "ok": False, "error": repr(e)}
+    return {**rec, "seconds": round(time.time() - t0, 3), "ts": time.time(),
+            "stages": {k: round(v, 4) for k, v in stages.items()}}
+
+def write_timings(recs):
+    # One row per symbol: total seconds plus <stage>_s columns; shard totals to stdout
+    if not recs:
+        return
+    df = pd.DataFrame([{"symbol": r["symbol"], "ok": r["ok"], "seconds": r["seconds"],
+                        **{f"{k}_s": v for k, v in r.get("stages", {}).items()}} for r in recs])
+    write_parquet_local(df, TIMINGS)
+    totals = df.filter(regex=r"_s$").sum().sort_values(ascending=False)
+    print("[timing] " + " ".join(f"{k[:-2]}={v:.1f}s" for k, v in totals.items()))
+
+def run_pool(symbols, workers):
+    # Bounded queue: at most 2 x workers symbols in flight at once
+    if workers <= 1:
+        for sym in symbols:
+            yield run_symbol_task(sym)
+            if BATCH_SLEEP_S:
+                time.sleep(BATCH_SLEEP_S)
+        return
+    pending = iter(symbols)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = set()
+        for sym in pending:
+            inflight.add(pool.submit(run_symbol_task, sym))
+            if len(inflight) >= 2 * workers:
+                break
+        while inflight:
+            finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                yield fut.result()
+                nxt = next(pending, None)
+                if nxt is not None:
+                    inflight.add(pool.submit(run_symbol_task, nxt))
 
 def main():
     symbols = load_universe()
-    my_slice = shard_slice(symbols, TASK_INDEX, TASK_COUNT)
-    print(f"[shard] index={TASK_INDEX}/{TASK_COUNT} symbols={len(my_slice)}")
-
-    for i, sym in enumerate(my_slice, 1):
-        print(f"[{i}/{len(my_slice)}] backtesting {sym}")
-        if not DRY_RUN:
-            run_one_symbol(sym)
-        if BATCH_SLEEP_S:
-            time.sleep(BATCH_SLEEP_S)
-
-    if not DRY_RUN:
-        upload_results()
+    history = load_runtime_history()
+    my_slice = plan_shard(symbols, TASK_INDEX, TASK_COUNT, history)
+    predicted = sum(history[s]["seconds"] for s in my_slice if s in history)
+    print(f"[plan] history={len(history)} predicted={predicted:.0f}s")
+    restore_manifest()
+    done = load_manifest()
+    todo = [s for s in my_slice if s not in done]
+    print(f"[shard] index={TASK_INDEX}/{TASK_COUNT} symbols={len(my_slice)} "
+          f"done={len(my_slice) - len(todo)} workers={WORKERS} run={RUN_ID}")
+
+    if DRY_RUN:
+        for i, sym in enumerate(todo, 1):
+            print(f"[{i}/{len(todo)}] backtesting {sym}")
+        print("[done] shard complete")
+        return
+
+    prepare_codec(symbols)
+    uploader = BackgroundUploader(STORE, UPLOAD_WORKERS) if STORE else None
+    upload(uploader, CODEC_PATH)
+    recs = []
+    for i, rec in enumerate(run_pool(todo, WORKERS), 1):
+        files = rec.pop("files", [])
+        record(rec)
+        recs.append(rec)
+        upload(uploader, *files)
+        status = "ok" if rec["ok"] else f"FAILED {rec['error']}"
+        print(f"[{i}/{len(todo)}] {rec['symbol']} {rec['seconds']}s {status}")
+        if CHECKPOINT_EVERY and i % CHECKPOINT_EVERY == 0:
+            upload(uploader, MANIFEST)
+
+    write_timings(recs)
+    if uploader is not None:
+        upload(uploader, MANIFEST, *([TIMINGS] if recs else []))
+        t0 = time.time()
+        with span("upload"):
+            errors = uploader.flush()
+        uploader.close()
+        print(f"[upload] files={uploader.uploaded} errors={len(errors)} tail={time.time() - t0:.1f}s")
+        if errors and BUCKET:
+            upload_results()  # retry everything in one rsync
     print("[done] shard complete")
 
 if __name__ == "__main__":
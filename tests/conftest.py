@@ -0,0 +1,19 @@
+import pytest
+
+import engine.data_layer
+import patterns.context
+import patterns.indicator_cache
+
+
+@pytest.fixture
+def data_env(tmp_path, monkeypatch):
+    """Point the bar/chain stores, indicator cache and ContextKey codec singletons at `tmp_path`."""
+    monkeypatch.setenv("BARS_ROOT", str(tmp_path / "bars"))
+    monkeypatch.setenv("CHAINS_ROOT", str(tmp_path / "chains"))
+    monkeypatch.setenv("INDICATORS_ROOT", str(tmp_path / "indicators"))
+    monkeypatch.setenv("CONTEXT_CODEC", str(tmp_path / "context_codec.json"))
+    monkeypatch.setattr(engine.data_layer, "_bar_store", None)
+    monkeypatch.setattr(engine.data_layer, "_chain_store", None)
+    monkeypatch.setattr(patterns.indicator_cache, "_cache", None)
+    monkeypatch.setattr(patterns.context, "_codec", None)
+    return tmp_path
@@ -0,0 +1,56 @@
+import pandas as pd
+import pandas.testing as pdt
+
+from benchmarks.synthetic import synthetic_bars
+from engine.bar_store import BAR_COLUMNS, BarStore, _LRU
+
+
+def _bars(days=8, start="2024-01-25"):
+    df = synthetic_bars(["SYN0000"], days=days, seed=2, start=start)["SYN0000"][BAR_COLUMNS]
+    return df.assign(ts=pd.to_datetime(df["ts"], utc=True))
+
+
+def test_round_trip_across_months_and_ranges(tmp_path):
+    store = BarStore(tmp_path, derive_from=None)
+    bars = _bars()
+    store.write_bars("syn0000", "1m", bars)
+    assert store.months("SYN0000", "1m") == ["2024-01", "2024-02"]
+    pdt.assert_frame_equal(store.read("SYN0000", "1m"), bars.reset_index(drop=True), check_dtype=False)
+
+    start, end = pd.Timestamp("2024-01-30 15:00", tz="UTC"), pd.Timestamp("2024-02-01 16:00", tz="UTC")
+    want = bars[(bars["ts"] >= start) & (bars["ts"] < end)].reset_index(drop=True)
+    got = store.read("SYN0000", "1m", start=start, end=end, columns=["close"])
+    assert list(got.columns) == ["ts", "close"]
+    pdt.assert_frame_equal(got, want[["ts", "close"]], check_dtype=False)
+
+
+def test_write_replaces_rows_and_invalidates_cached_reads(tmp_path):
+    store = BarStore(tmp_path, derive_from=None)
+    bars = _bars()
+    store.write_bars("SYN0000", "1m", bars)
+    first = store.read("SYN0000", "1m")
+    first.loc[0, "close"] = -1.0  # callers get a copy, not the cached frame
+    assert store.read("SYN0000", "1m")["close"].iloc[0] == bars["close"].iloc[0]
+    assert store.cache.hits > 0
+
+    revised = bars.iloc[[10, 3000]].assign(close=[1.0, 2.0])
+    store.write_bars("SYN0000", "1m", revised)
+    again = store.read("SYN0000", "1m")
+    assert len(again) == len(bars)
+    assert again["close"].iloc[[10, 3000]].tolist() == [1.0, 2.0]
+
+
+def test_lru_evicts_least_recently_used_within_the_byte_bound():
+    df = pd.DataFrame({"x": range(100)})
+    size = int(df.memory_usage(index=True).sum())
+    lru = _LRU(2 * size)
+    lru.put("a", df)
+    lru.put("b", df)
+    assert lru.get("a") is df  # "b" is now the oldest
+    lru.put("c", df)
+    assert lru.get("b") is None and lru.get("a") is df and lru.get("c") is df
+    assert lru.nbytes == 2 * size
+    lru.put("big", pd.DataFrame({"x": range(1000)}))  # larger than the bound: not cached
+    assert lru.get("big") is None and lru.nbytes == 2 * size
+    lru.drop(lambda k: k == "a")
+    assert lru.get("a") is None and lru.nbytes == size
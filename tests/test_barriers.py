@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from benchmarks.synthetic import synthetic_bars, synthetic_chains
+from engine.barriers import REASON_OPEN, REASONS, price_barrier_grid
+from engine.chain_store import NS_PER_DAY
+from engine.data_layer import get_bar_store, get_chain_store
+from engine.fill_model import LiquidityGates
+from engine.portfolio import PositionBook
+from engine.simulator import EXIT_RULE_COLUMNS, run_backtest
+from strategies.templates import vertical_credit_bull_put
+
+RULES = {"profit_target_pct": [0.2, 0.5], "max_loss_mult_credit": [0.3, 1.0],
+         "time_stop_days_before_expiry": [1, 3]}
+EVERY_200 = {"every": lambda b: (np.arange(len(b)) % 200 == 10)}
+
+
+def _naive_barrier(o, h, l, c, e, tp, sl, mb, side):
+    """Walk the bars after entry `e` one at a time -> (offset, reason, return)."""
+    px = c[e]
+    for k in range(mb):
+        j = e + 1 + k
+        if j >= len(c):
+            return None, "open", None
+        fav = side * ((h[j] if side > 0 else l[j]) / px - 1.0)
+        adv = side * ((l[j] if side > 0 else h[j]) / px - 1.0)
+        if adv <= -sl:
+            return k, "sl", min(-sl, side * (o[j] / px - 1.0))
+        if fav >= tp:
+            return k, "tp", tp
+        if k == mb - 1:
+            return k, "time", side * (c[j] / px - 1.0)
+
+
+@pytest.mark.parametrize("side", [1, -1])
+def test_price_barrier_grid_matches_a_bar_by_bar_loop(side):
+    rng = np.random.default_rng(7)
+    n = 400
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    o = np.r_[c[0], c[:-1]] * np.exp(rng.normal(0, 0.002, n))  # gaps between bars
+    h = np.maximum(o, c) * np.exp(np.abs(rng.normal(0, 0.002, n)))
+    l = np.minimum(o, c) * np.exp(-np.abs(rng.normal(0, 0.002, n)))
+    entries = np.r_[rng.choice(n - 40, 60, replace=False), n - 15, n - 2, n - 1]
+    tp, sl, mb = [0.005, 0.01, 0.02], [0.004, 0.01], [5, 12, 30]
+    res = price_barrier_grid(c, h, l, entries, tp, sl, mb, side=side, open_=o)
+    assert set(REASONS[res["reason"].ravel()]) == {"tp", "sl", "time", "open"}
+    for r, e in enumerate(entries):
+        for i, j, m in np.ndindex(len(tp), len(sl), len(mb)):
+            k, reason, ret = _naive_barrier(o, h, l, c, e, tp[i], sl[j], mb[m], side)
+            assert REASONS[res["reason"][r, i, j, m]] == reason
+            if reason != "open":
+                assert res["exit_k"][r, i, j, m] == k
+                assert res["ret"][r, i, j, m] == pytest.approx(ret, abs=1e-12)
+
+
+def _structure():
+    return vertical_credit_bull_put(dte=(7, 10))
+
+
+def _contract_ids(snap):
+    strike = np.round(np.asarray(snap["strike"]) * 100).astype(np.int64)
+    return (snap["expiry_day"].astype(np.int64) * 2 + snap["opt_type"]) * 10**7 + strike
+
+
+def _replay(ts, entry, chains, pt, ml, stop):
+    """Naive reference: open the structure in a PositionBook and walk bar by bar,
+    marking from the as-of snapshot and checking the exit rules each bar."""
+    legs = _structure()
+    snap = chains.snapshot("SYN0000", int(ts[entry]))
+    rows = snap.select_legs(legs)
+    book = PositionBook()
+    book.add([0], int(snap["expiry_day"][rows].min()), np.zeros(len(legs), int), _contract_ids(snap)[rows],
+             [1 if l.side == "long" else -1 for l in legs], [l.qty for l in legs], snap.mid[rows], ts[entry])
+    expiry, marked = book.structs["expiry_day"][0], None
+    for i in range(entry + 1, len(ts)):
+        today = ts[i] // NS_PER_DAY
+        if today > expiry:
+            break
+        k = chains.asof_index("SYN0000", int(ts[i]))
+        if k != marked:  # marks only move when a new snapshot arrives
+            s = chains.snapshot("SYN0000", int(ts[i]))
+            book.mark(_contract_ids(s), s.mid)
+            marked = k
+        reason = book.check_exits(today, pt, ml, stop)[0]
+        if reason != REASON_OPEN:
+            return i, REASONS[reason], book.unrealized()[0] / book.multiplier
+    return None, "open", None
+
+
+@pytest.fixture
+def chain_bars(data_env):
+    bars = synthetic_bars(["SYN0000"], days=12, seed=3)["SYN0000"]
+    get_bar_store().write_bars("SYN0000", "1m", bars)
+    get_chain_store().write_chains("SYN0000", synthetic_chains(bars, n_strikes=30, every=30, seed=3))
+    return bars
+
+
+def test_structure_exit_grid_matches_portfolio_replay(chain_bars):
+    bars = chain_bars
+    rules = {**RULES, "structure": _structure}
+    trades = run_backtest(["SYN0000"], "1m", EVERY_200, rules, {"slip_frac_of_half": 0.0}, None, None)
+    assert set(trades["exit_reason"]) >= {"tp", "sl", "time"}
+    assert len(trades) == trades["entry_idx"].nunique() * 8
+    ts = pd.DatetimeIndex(bars["ts"]).tz_localize(None).as_unit("ns").asi8
+    for t in trades.itertuples():
+        exit_idx, reason, pnl = _replay(ts, t.entry_idx, get_chain_store(), t.profit_target_pct,
+                                        t.max_loss_mult_credit, t.time_stop_days_before_expiry)
+        assert t.exit_reason == reason
+        if reason != "open":
+            assert t.exit_idx == exit_idx
+            assert t.pnl == pytest.approx(pnl, abs=1e-9)
+    short = trades["leg0_side"] == -1
+    assert short.all() and (trades["premium"] < 0).all()  # a credit spread
+
+
+def test_exit_rules_from_the_backtest_config(chain_bars):
+    cfg = yaml.safe_load(open("configs/backtest_grid.yaml"))
+    rules = {c: cfg[c] for c in EXIT_RULE_COLUMNS}
+    trades = run_backtest(["SYN0000"], "1m", EVERY_200, rules, None, LiquidityGates(**cfg["liquidity"]), None)
+    assert len(trades)
+    cells = trades.groupby("entry_idx")[EXIT_RULE_COLUMNS].nunique()
+    assert (cells.to_numpy() == [3, 3, 2]).all()
+    assert (trades[["leg0_entry_oi", "leg0_entry_volume"]].min().to_numpy() >= [100, 20]).all()
+    last_day = (trades["leg0_expiry_day"].to_numpy(np.int64) + 1) * NS_PER_DAY
+    assert (pd.DatetimeIndex(trades["exit_ts"]).as_unit("ns").asi8 < last_day).all()
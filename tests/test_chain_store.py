@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_bars, synthetic_chains
+from engine.chain_store import ChainStore
+from strategies.legs import Leg
+
+
+@pytest.fixture
+def chains(tmp_path):
+    bars = synthetic_bars(["SYN0000"], days=3, seed=4)["SYN0000"]
+    df = synthetic_chains(bars, n_strikes=30, every=60, seed=4)
+    store = ChainStore(tmp_path)
+    store.write_chains("SYN0000", df.sample(frac=1.0, random_state=0))  # row order must not matter
+    return store, df, pd.DatetimeIndex(bars["ts"]).tz_localize(None)
+
+
+def _naive_asof(df, t):
+    seen = df[df["ts"] <= t]
+    return None if seen.empty else seen[seen["ts"] == seen["ts"].max()]
+
+
+def test_snapshot_is_the_latest_at_or_before_the_query(chains):
+    store, df, ts = chains
+    snap_ts = pd.DatetimeIndex(np.sort(df["ts"].unique()))
+    queries = [ts[0] - pd.Timedelta("1min"), *snap_ts[:3], snap_ts[1] - pd.Timedelta("1ns"),
+               *ts[::97], ts[-1] + pd.Timedelta("1D")]
+    for q in queries:
+        want = _naive_asof(df, q)
+        snap = store.snapshot("syn0000", q)
+        if want is None:
+            assert snap is None and store.asof_index("SYN0000", [q.value])[0] == -1
+            continue
+        assert snap.ts == pd.Timestamp(want["ts"].iloc[0]).value <= q.value  # never a later snapshot
+        want = want.sort_values(["expiry", "opt_type", "strike"], kind="stable")
+        np.testing.assert_array_equal(snap["strike"], want["strike"].to_numpy())
+        np.testing.assert_array_equal(snap["bid"], want["bid"].to_numpy())
+        assert snap.underlying == want["underlying"].iloc[0]
+
+
+def test_max_age_hides_stale_snapshots(chains):
+    store, df, _ = chains
+    t = pd.Timestamp(df["ts"].iloc[0])
+    assert store.snapshot("SYN0000", t + pd.Timedelta("30s"), max_age_s=60).ts == t.value
+    assert store.snapshot("SYN0000", t + pd.Timedelta("61s"), max_age_s=60) is None
+
+
+def test_leg_selection_matches_a_frame_filter(chains):
+    store, df, _ = chains
+    leg = Leg("put", "short", {"type": "delta", "value": 0.3}, [10, 20])
+    for t in np.sort(df["ts"].unique())[::5]:
+        snap = store.snapshot("SYN0000", t)
+        row = snap.select(leg)
+        cur = df[df["ts"] == t]
+        dte = (cur["expiry"].to_numpy().astype("datetime64[D]")
+               - np.datetime64(pd.Timestamp(t).date())).astype(int)
+        ok = cur[(dte >= 10) & (dte <= 20) & (cur["opt_type"] == "put")]
+        ok = ok[ok["expiry"] == ok["expiry"].min()]
+        best = ok.iloc[int((ok["delta"].abs() - 0.3).abs().to_numpy().argmin())]
+        assert snap["strike"][row] == best["strike"] and snap["delta"][row] == best["delta"]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from patterns.context import FIXED_VOCAB, ContextKeyCodec, build_context_key
+
+
+def _fields(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.choice(["AAPL", "MSFT", "SPY", "QQQ"], n), rng.choice(["1m", "5m"], n),
+            rng.choice(["hammer", "bullish_engulfing"], n),
+            *(rng.choice(FIXED_VOCAB[f], n) for f in ("macd_sign", "rsi_state", "trend", "vol_regime")))
+
+
+def test_encode_decode_round_trip():
+    codec = ContextKeyCodec()
+    fields = _fields(1000)
+    keys = codec.encode(*fields)
+    assert keys.dtype == np.int64
+    decoded = codec.decode(keys)
+    for (name, got), want in zip(decoded.items(), fields):
+        np.testing.assert_array_equal(got, want, err_msg=name)
+    strings = codec.to_strings(keys)
+    assert strings[0] == build_context_key(*(f[0] for f in fields))
+    np.testing.assert_array_equal(codec.from_strings(strings, grow=False), keys)
+
+
+def test_keys_survive_save_and_load(tmp_path):
+    codec = ContextKeyCodec()
+    fields = _fields(200, seed=1)
+    keys = codec.encode(*fields)
+    codec.save(tmp_path / "codec.json")
+    loaded = ContextKeyCodec.load(tmp_path / "codec.json")
+    np.testing.assert_array_equal(loaded.encode(*fields, grow=False), keys)
+    np.testing.assert_array_equal(loaded.to_strings(keys), codec.to_strings(keys))
+
+
+def test_codes_are_append_only():
+    codec = ContextKeyCodec()
+    first = codec.encode("AAPL", "5m", "hammer", "pos", "neutral", "up", "mid")
+    codec.intern("symbol", ["ZZZ", "AAA"])
+    assert codec.encode("AAPL", "5m", "hammer", "pos", "neutral", "up", "mid") == first
+
+
+def test_frozen_codec_rejects_unknown_labels():
+    codec = ContextKeyCodec()
+    codec.intern("symbol", ["AAPL"])
+    codec.intern("timeframe", ["5m"])
+    codec.intern("candle", ["hammer"])
+    with pytest.raises(KeyError):
+        codec.encode("MSFT", "5m", "hammer", "pos", "neutral", "up", "mid", grow=False)
+    assert codec.vocab["symbol"] == ["AAPL"]
+
+
+def test_sorting_packed_keys_groups_by_symbol():
+    codec = ContextKeyCodec()
+    fields = _fields(500, seed=2)
+    keys = codec.encode(*fields)
+    sym = codec.decode(np.sort(keys))["symbol"]
+    assert (sym[1:] != sym[:-1]).sum() == len(set(fields[0])) - 1
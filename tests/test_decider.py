@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+import live.decider as decider
+from benchmarks.synthetic import synthetic_bars
+from live.whitelist import Whitelist, WhitelistHandle, export_whitelist
+from patterns.context import ContextKeyCodec
+
+
+def test_decider_encodes_and_looks_up_in_one_snapshot(tmp_path, monkeypatch):
+    codec = ContextKeyCodec()
+    ctx = {"macd_sign": "pos", "rsi_state": "neutral", "trend": "up", "vol_regime": "low"}
+    key = codec.encode("AAPL", "5m", "hammer", *ctx.values())
+    df = pd.DataFrame({"context_key": key, "n": [100], "win_pct": [0.7], "sharpe": [1.0]})
+    wl = Whitelist(export_whitelist(df, tmp_path, codec=codec))
+
+    class SwappingHandle(WhitelistHandle):
+        calls = 0
+
+        def current(self):
+            # the published version is replaced by an empty one right after the first read
+            self.calls += 1
+            return wl if self.calls == 1 else None
+
+    class Broker:
+        orders = []
+
+        def submit_multi_leg(self, legs, qty):
+            self.orders.append(legs)
+
+    monkeypatch.setattr(decider, "_last_bar_context", lambda *a: ctx)
+    handle, broker = SwappingHandle(tmp_path), Broker()
+    bars = pd.DataFrame({"ts": [0, 1], "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0})
+    out = decider.decide_and_route("AAPL", "5m", bars, handle, None, broker,
+                                   candles={"hammer": (lambda b: np.ones(len(b), bool), lambda: ["leg"])})
+    assert out["action"] == "enter" and out["context_key"] == int(key)
+    assert handle.calls == 1 and broker.orders == [["leg"]]
+
+
+def test_revised_bar_rebuilds_stream_under_the_same_lock(monkeypatch):
+    monkeypatch.setattr(decider, "_streams", {})
+    bars = synthetic_bars(["AAA"], days=2)["AAA"]
+    decider._last_bar_context("AAA", "1m", bars.iloc[:500])
+    st = decider._streams[("AAA", "1m")]
+    lock = st.lock
+    revised = bars.iloc[:600].copy()
+    revised.loc[499, "close"] *= 1.01
+    got = decider._last_bar_context("AAA", "1m", revised)
+    assert st.lock is lock and decider._streams[("AAA", "1m")] is st
+    monkeypatch.setattr(decider, "_streams", {})
+    assert decider._last_bar_context("AAA", "1m", revised) == got
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from backtests.incremental import IncrementalPlan, config_fingerprint
+from benchmarks.synthetic import synthetic_bars
+from engine.data_layer import get_bar_store
+from engine.simulator import run_backtest
+from patterns.scanner import pattern_signal
+
+GRID = {"tp": [0.005, 0.02], "sl": [0.01], "max_bars": [12, 78]}
+STRATEGIES = {name: pattern_signal(name) for name in ("bullish_engulfing", "hammer")}
+CONFIGS = {name: config_fingerprint(strategy=name, **GRID) for name in STRATEGIES}
+
+
+def _backtest(entry_filter=None):
+    out = run_backtest(["SYN0000"], "5m", STRATEGIES, None, GRID, None, None, entry_filter=entry_filter)
+    return out.drop(columns=["entry_idx", "exit_idx"])
+
+
+def _bars_5m(days):
+    bars = synthetic_bars(["SYN0000"], days=days)["SYN0000"]
+    g = bars.groupby(bars.index // 5)
+    return g.agg({"ts": "first", "open": "first", "high": "max", "low": "min", "close": "last",
+                  "volume": "sum", "spread": "mean"})
+
+
+def test_incremental_merge_matches_full_recompute(data_env):
+    bars = _bars_5m(12)
+    first = bars.iloc[: len(bars) * 2 // 3]
+    store = get_bar_store()
+    store.write_bars("SYN0000", "5m", first)
+    existing = _backtest()
+    assert (existing["exit_reason"] == "open").any()  # the rerun has open trades to resume
+    state = {name: {"config": cfg, "watermark": str(first["ts"].iloc[-1])} for name, cfg in CONFIGS.items()}
+
+    store.write_bars("SYN0000", "5m", bars)
+    plan = IncrementalPlan(existing, state, CONFIGS)
+    fresh = _backtest(plan.entry_filter)
+    merged = plan.merge(existing, fresh, None)
+    assert len(fresh) < len(merged)
+
+    full = plan.merge(pd.DataFrame(), _backtest(), None)  # same sort, nothing carried over
+    pd.testing.assert_frame_equal(merged, full)
+
+
+def test_config_change_forces_full_recompute():
+    existing = pd.DataFrame({"strategy": ["hammer"], "entry_ts": [pd.Timestamp("2024-01-02", tz="UTC")],
+                             "exit_reason": ["tp"]})
+    state = {"hammer": {"config": "stale", "watermark": "2024-01-03"}}
+    plan = IncrementalPlan(existing, state, {"hammer": "current"})
+    assert plan.full("hammer")
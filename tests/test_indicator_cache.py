@@ -0,0 +1,29 @@
+import numpy as np
+
+from benchmarks.synthetic import synthetic_bars
+from patterns.indicator_cache import get_indicator_cache
+from patterns.recursive import BASIC_COLUMNS, BasicIndicatorState
+
+
+def _recompute(bars):
+    return BasicIndicatorState().run(bars["high"], bars["low"], bars["close"])
+
+
+def test_extension_matches_a_recompute(data_env):
+    bars = synthetic_bars(["SYN0000"], days=3, seed=5)["SYN0000"]
+    cache = get_indicator_cache()
+    cache.attach("SYN0000", "1m", bars.iloc[:500])
+    out = cache.attach("SYN0000", "1m", bars)
+    np.testing.assert_allclose(out[BASIC_COLUMNS].to_numpy(), _recompute(bars), equal_nan=True)
+
+
+def test_revised_close_rebuilds_instead_of_reusing_cached_values(data_env):
+    bars = synthetic_bars(["SYN0000"], days=3, seed=5)["SYN0000"]
+    cache = get_indicator_cache()
+    cache.attach("SYN0000", "1m", bars.iloc[:500])
+    revised = bars.copy()
+    revised.loc[400, "close"] *= 1.05  # same timestamps, a corrected price
+    for upto in (500, len(bars)):  # a plain re-read and an extension
+        out = cache.attach("SYN0000", "1m", revised.iloc[:upto])
+        np.testing.assert_allclose(out[BASIC_COLUMNS].to_numpy(), _recompute(revised.iloc[:upto]),
+                                   equal_nan=True)
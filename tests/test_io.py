@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from utils.io import ParquetStreamWriter, write_results
+
+
+def _frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"context_key": rng.integers(0, 20, n), "strategy": rng.choice(["a", "b"], n),
+                         "symbol": "AAA", "entry_ts": np.arange(n), "pnl": rng.standard_normal(n)})
+
+
+def _leftovers(d):
+    return sorted(p.name for p in d.iterdir() if p.name.endswith(".tmp"))
+
+
+def test_stream_writer_fixed_row_groups(tmp_path):
+    df = _frame(250)
+    path = tmp_path / "out.parquet"
+    with ParquetStreamWriter(path, row_group_rows=100) as w:
+        for lo in range(0, len(df), 37):
+            w.write(df.iloc[lo:lo + 37])
+        w.write(df.iloc[:0])
+    meta = pq.ParquetFile(path).metadata
+    assert [meta.row_group(i).num_rows for i in range(meta.num_row_groups)] == [100, 100, 50]
+    assert w.rows == 250
+    pd.testing.assert_frame_equal(pd.read_parquet(path), df)
+    assert _leftovers(tmp_path) == []
+
+
+def test_stream_writer_replaces_only_on_close(tmp_path):
+    path = tmp_path / "out.parquet"
+    _frame(10).to_parquet(path, index=False)
+    old = path.read_bytes()
+    w = ParquetStreamWriter(path, row_group_rows=4)
+    w.write(_frame(30, seed=1))  # several row groups already flushed to the temp file
+    assert path.read_bytes() == old
+    assert _leftovers(tmp_path) == [w.tmp.name]
+    assert w.close() == path
+    pd.testing.assert_frame_equal(pd.read_parquet(path), _frame(30, seed=1))
+    assert _leftovers(tmp_path) == []
+
+
+def test_stream_writer_error_leaves_nothing_behind(tmp_path):
+    path = tmp_path / "out.parquet"
+    _frame(10).to_parquet(path, index=False)
+    old = path.read_bytes()
+    with pytest.raises(RuntimeError):
+        with ParquetStreamWriter(path, row_group_rows=4) as w:
+            w.write(_frame(30, seed=1))
+            raise RuntimeError("worker died")
+    assert path.read_bytes() == old
+    assert _leftovers(tmp_path) == []
+
+    fresh = tmp_path / "fresh.parquet"
+    with pytest.raises(RuntimeError):
+        with ParquetStreamWriter(fresh) as w:
+            w.write(_frame(5))
+            raise RuntimeError("worker died")
+    assert not fresh.exists() and _leftovers(tmp_path) == []
+
+
+def test_stream_writer_without_rows_writes_nothing(tmp_path):
+    path = tmp_path / "out.parquet"
+    with ParquetStreamWriter(path) as w:
+        w.write(_frame(0))
+    assert w.close() is None and not path.exists()
+
+
+def test_write_results_sorts_and_dictionary_encodes(tmp_path):
+    df = _frame(1000, seed=2)
+    path = write_results(df, tmp_path / "trades.parquet", row_group_rows=300)
+    got = pd.read_parquet(path)
+    ref = df.sort_values(["context_key", "strategy", "entry_ts"], kind="stable", ignore_index=True)
+    pd.testing.assert_frame_equal(got, ref)
+    meta = pq.ParquetFile(path).metadata
+    assert [meta.row_group(i).num_rows for i in range(meta.num_row_groups)] == [300, 300, 300, 100]
+    enc = {meta.schema.column(j).name: meta.row_group(0).column(j).encodings for j in range(meta.num_columns)}
+    assert "RLE_DICTIONARY" in enc["context_key"] and "RLE_DICTIONARY" in enc["symbol"]
+    assert "RLE_DICTIONARY" not in enc["pnl"]
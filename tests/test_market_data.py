@@ -0,0 +1,14 @@
+import pandas as pd
+import pytest
+
+yf = pytest.importorskip("yfinance")
+
+from live.market_data import YFinanceProvider
+
+
+@pytest.mark.parametrize("lookback_days, period", [(1, "1d"), (3, "3d"), (30, "30d")])
+def test_yfinance_fetch_asks_for_the_requested_window(monkeypatch, lookback_days, period):
+    calls = []
+    monkeypatch.setattr(yf, "download", lambda *a, **kw: calls.append(kw) or pd.DataFrame())
+    assert YFinanceProvider(session=object()).fetch(["AAPL"], "5m", lookback_days) == {}
+    assert calls[0]["period"] == period
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from engine.barriers import REASON_OPEN, REASON_SL, REASON_TIME, REASON_TP
+from engine.portfolio import Portfolio, PositionBook
+
+MULT = 100.0
+
+
+def _naive_pnl(structs, marks):
+    """Per-structure P&L from a list-of-dicts book, one leg at a time."""
+    out = []
+    for legs in structs:
+        out.append(sum(l["side"] * l["qty"] * (marks.get(l["contract"], l["price"]) - l["price"]) * MULT
+                       for l in legs))
+    return np.array(out)
+
+
+def test_book_marks_and_pnl_match_a_per_leg_loop():
+    rng = np.random.default_rng(3)
+    book = PositionBook(MULT)
+    structs = []
+    for batch in range(20):  # many small opens: the columns grow past their initial capacity
+        m = int(rng.integers(1, 5))
+        parent = np.repeat(np.arange(m), 2)
+        contract = rng.integers(0, 40, 2 * m)
+        side = rng.choice([-1, 1], 2 * m)
+        qty = rng.integers(1, 4, 2 * m)
+        price = rng.uniform(0.5, 5.0, 2 * m)
+        book.add(np.zeros(m), 20000, parent, contract, side, qty, price, batch)
+        for s in range(m):
+            structs.append([{"contract": contract[i], "side": side[i], "qty": qty[i], "price": price[i]}
+                            for i in np.flatnonzero(parent == s)])
+    assert book.structs.n == len(structs) and book.legs.n == 2 * len(structs)
+    premium = [sum(l["side"] * l["qty"] * l["price"] * MULT for l in legs) for legs in structs]
+    np.testing.assert_allclose(book.structs["premium"], premium)
+
+    ids = np.arange(0, 40, 2)  # half the contracts quoted; the rest keep their entry mark
+    quotes = rng.uniform(0.5, 5.0, len(ids))
+    quotes[3] = np.nan  # a NaN quote keeps the previous mark too
+    pnl = book.mark(ids, quotes)
+    marks = {c: q for c, q in zip(ids, quotes) if q == q}
+    np.testing.assert_allclose(pnl, _naive_pnl(structs, marks))
+
+
+def test_exit_rules_precedence_and_closing():
+    book = PositionBook(MULT)
+    # four one-leg debit structures, premium 100 each
+    book.add(np.zeros(4), [105, 105, 102, 105], np.arange(4), np.arange(4), np.ones(4), np.ones(4),
+             np.ones(4), 0)
+    book.mark(np.arange(4), [1.6, 0.4, 1.0, 1.0])
+    reason = book.check_exits(100, profit_target_pct=0.5, max_loss_mult_credit=0.5, time_stop_days=3)
+    assert reason.tolist() == [REASON_TP, REASON_SL, REASON_TIME, REASON_OPEN]
+    # a loss past the stop on the time-stop day is still a stop
+    book.mark([2], [0.3])
+    assert book.check_exits(100, 0.5, 0.5, 3)[2] == REASON_SL
+
+    cash = book.close(reason != REASON_OPEN, ts=7)
+    assert cash == pytest.approx((1.6 + 0.4 + 0.3) * MULT)
+    assert book.open_count == 1
+    assert book.check_exits(100, 0.5, 0.5, 3)[:3].tolist() == [REASON_OPEN] * 3  # closed stay closed
+    book.mark([0], [9.0])
+    assert book.structs["pnl"][0] == pytest.approx(60.0) and book.unrealized()[0] == 0.0
+
+
+def test_portfolio_opens_the_prefix_that_fits():
+    pf = Portfolio(starting_cash=1000.0, max_positions=3, multiplier=MULT)
+    # debits of 300, 500, 400 (credits would add cash); the third no longer fits the cash
+    sids = pf.open_structures([0, 0, 1], 100, [0, 1, 2], [10, 11, 12], [1, 1, 1], [1, 1, 1],
+                              [3.0, 5.0, 4.0], ts=0)
+    assert len(sids) == 2 and pf.cash == pytest.approx(200.0)
+    assert pf.equity() == pytest.approx(1000.0)
+    reason = pf.mark_and_exit([10, 11], [4.5, 5.0], ts=1, today=90, profit_target_pct=0.5,
+                              max_loss_mult_credit=0.5, time_stop_days=3)
+    assert reason.tolist() == [REASON_TP, REASON_OPEN]
+    assert pf.cash == pytest.approx(200.0 + 450.0)
+    assert pf.equity() == pytest.approx(1150.0)
+    att = pf.book.attribution(symbols=["AAA", "BBB"]).set_index("symbol")
+    assert att.loc["AAA", "realized"] == pytest.approx(150.0) and att.loc["AAA", "open_structures"] == 1
@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+import pytest
+
+from engine.pricing import bs_greeks, bs_price, implied_vol, ndtr, ndtri, strike_for_delta
+
+
+@pytest.fixture
+def grid():
+    S, K, T, sigma, call = np.meshgrid(100.0, np.linspace(70, 130, 13), [1 / 365, 7 / 365, 0.25, 1.0],
+                                       [0.05, 0.2, 0.6, 1.5, 4.0], [True, False], indexing="ij")
+    return S.ravel(), K.ravel(), T.ravel(), sigma.ravel(), call.ravel()
+
+
+@pytest.mark.parametrize("r,q", [(0.0, 0.0), (0.05, 0.02)])
+def test_implied_vol_recovers_sigma(grid, r, q):
+    S, K, T, sigma, call = grid
+    price = bs_price(S, K, T, sigma, call, r, q)
+    iv = implied_vol(price, S, K, T, call, r, q)
+    vega = bs_greeks(S, K, T, sigma, call, r, q)["vega"]
+    solvable = vega > 1e-4
+    assert solvable.sum() > len(sigma) // 2
+    # the solver stops once the price is within tol (1e-8), so sigma is within ~tol / vega
+    assert (np.abs(iv[solvable] - sigma[solvable]) * vega[solvable] < 2e-8).all()
+    # wherever it did converge, the solved vol reprices the option
+    ok = np.isfinite(iv)
+    np.testing.assert_allclose(bs_price(S[ok], K[ok], T[ok], iv[ok], call[ok], r, q), price[ok], atol=1e-6)
+
+
+def test_implied_vol_is_nan_outside_no_arbitrage_bounds():
+    S, K, T = 100.0, np.array([90.0, 90.0, 110.0, 100.0]), np.array([0.5, 0.5, 0.5, 0.0])
+    price = np.array([9.0, 101.0, 0.0, 5.0])  # below intrinsic, above spot, zero, expired
+    assert np.isnan(implied_vol(price, S, K, T, True)).all()
+
+
+def test_put_call_parity(grid):
+    S, K, T, sigma, _ = grid
+    r, q = 0.03, 0.01
+    lhs = bs_price(S, K, T, sigma, True, r, q) - bs_price(S, K, T, sigma, False, r, q)
+    np.testing.assert_allclose(lhs, S * np.exp(-q * T) - K * np.exp(-r * T), atol=1e-5)
+
+
+def test_greeks_match_finite_differences(grid):
+    S, K, T, sigma, call = grid
+    keep = T >= 0.25
+    S, K, T, sigma, call = S[keep], K[keep], T[keep], sigma[keep], call[keep]
+    g = bs_greeks(S, K, T, sigma, call, 0.02, 0.0)
+    # wide steps: without scipy, ndtr is only good to ~1e-7, which tiny steps would amplify
+    dS, dv = 0.05, 1e-3
+    delta = (bs_price(S + dS, K, T, sigma, call, 0.02) - bs_price(S - dS, K, T, sigma, call, 0.02)) / (2 * dS)
+    vega = (bs_price(S, K, T, sigma + dv, call, 0.02) - bs_price(S, K, T, sigma - dv, call, 0.02)) / (2 * dv)
+    np.testing.assert_allclose(g["delta"], delta, atol=1e-4)
+    np.testing.assert_allclose(g["vega"], vega, rtol=1e-3, atol=2e-3)
+
+
+def test_strike_for_delta_inverts_delta():
+    T, sigma = 30 / 365, 0.25
+    for target, call in [(0.30, True), (0.15, True), (0.30, False)]:
+        K = strike_for_delta(100.0, T, sigma, target, call)
+        delta = bs_greeks(100.0, K, T, sigma, call)["delta"]
+        assert abs(delta) == pytest.approx(target, abs=1e-6)
+
+
+def test_normal_cdf_and_inverse():
+    x = np.linspace(-6, 6, 241)
+    ref = np.array([0.5 * math.erfc(-v / math.sqrt(2)) for v in x])
+    np.testing.assert_allclose(ndtr(x), ref, rtol=2e-7, atol=1e-12)
+    p = np.linspace(1e-6, 1 - 1e-6, 501)
+    np.testing.assert_allclose(ndtr(ndtri(p)), p, rtol=1e-6)
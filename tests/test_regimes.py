@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_bars
+from patterns.scanner import OHLCPanel
+from utils.regimes import RegimeState, RollingQuantile, classify_panel, classify_regime
+
+SMALL = {"trend_ma_window": 20, "atr_window": 5, "atr_quantile_window": 60}
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return synthetic_bars(["AAA", "BBB", "CCC"], days=3, seed=5)
+
+
+@pytest.mark.parametrize("cfg", [None, SMALL])
+def test_streaming_state_matches_batch_labels(frames, cfg):
+    bars = frames["AAA"]
+    trend, vol = classify_regime(bars, cfg)
+    st = RegimeState(cfg)
+    # fed in two chunks, as the live decider does across calls
+    half = len(bars) // 2
+    t1, v1 = st.run(bars["high"][:half], bars["low"][:half], bars["close"][:half])
+    t2, v2 = st.run(bars["high"][half:], bars["low"][half:], bars["close"][half:])
+    assert (np.concatenate([t1, t2]) == trend).all()
+    assert (np.concatenate([v1, v2]) == vol).all()
+    assert set(trend) == {"flat", "up", "down"} and set(vol) == {"low", "mid", "high"}
+
+
+def test_panel_matches_per_symbol_with_missing_bars(frames):
+    frames = dict(frames)
+    frames["BBB"] = frames["BBB"].drop(frames["BBB"].index[100:130]).reset_index(drop=True)
+    panel = OHLCPanel.from_frames(frames)
+    trend, vol = classify_panel(panel, SMALL)
+    for j, sym in enumerate(panel.symbols):
+        # the panel counts a missing bar as a NaN row of the window
+        bars = frames[sym].set_index("ts").reindex(panel.ts).reset_index()
+        t, v = classify_regime(bars, SMALL)
+        assert (trend[:, j] == t).all() and (vol[:, j] == v).all()
+
+
+def test_rolling_quantile_matches_pandas():
+    x = np.random.default_rng(0).standard_normal(3000)
+    x[[5, 100, 101, 2000]] = np.nan
+    qs = [0.1, 0.5, 0.93]
+    rq = RollingQuantile(200, qs, min_periods=20)
+    got = np.array([rq.update(v) for v in x])
+    for j, q in enumerate(qs):
+        ref = pd.Series(x).rolling(200, min_periods=20).quantile(q).to_numpy()
+        np.testing.assert_allclose(got[:, j], ref, rtol=1e-12, atol=1e-12)
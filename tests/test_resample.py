@@ -0,0 +1,103 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.bar_store import BarStore
+from engine.resample import resample_bars
+from utils.trading_calendar import TradingCalendar, get_calendar
+
+NY = "America/New_York"
+
+
+def _minute_bars(start, end, seed=0):
+    """1m bars for 09:30-16:00 New York time on every weekday, holidays and early
+    closes included (a feed that doesn't know the calendar)."""
+    days = pd.bdate_range(start, end)
+    local = (days.repeat(390) + pd.to_timedelta(np.tile(np.arange(390), len(days)) + 570, "min"))
+    ts = local.tz_localize(NY).tz_convert("UTC")
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.standard_normal(len(ts)) * 1e-3))
+    open_ = np.r_[100.0, close[:-1]]
+    return pd.DataFrame({"ts": ts, "open": open_, "high": np.maximum(open_, close) + 0.01,
+                         "low": np.minimum(open_, close) - 0.01, "close": close,
+                         "volume": rng.integers(1, 1000, len(ts)).astype(float)})
+
+
+def _reference(bars, timeframe, cal):
+    """Plain pandas: bin each session's minutes from its local open, cut at its close."""
+    sessions = cal.sessions().set_index("date")
+    local = pd.DatetimeIndex(bars["ts"]).tz_convert(NY)
+    date = local.tz_localize(None).normalize()
+    ok = date.isin(sessions.index)
+    s = sessions.reindex(date)
+    ts = bars["ts"].to_numpy()
+    inside = ok & (ts >= s["open"].to_numpy()) & (ts < s["close"].to_numpy())
+    b, o = bars[inside], pd.DatetimeIndex(s["open"][inside])
+    step = pd.Timedelta(timeframe.replace("m", "min").replace("d", "D"))
+    key = o + (pd.DatetimeIndex(b["ts"]) - o) // step * step
+    g = b.groupby(key.to_numpy())
+    out = g.agg(open=("open", "first"), high=("high", "max"), low=("low", "min"),
+                close=("close", "last"), volume=("volume", "sum"))
+    return out.rename_axis("ts").reset_index()
+
+
+@pytest.mark.parametrize("timeframe", ["5m", "15m", "1h", "1d"])
+@pytest.mark.parametrize("start,end", [("2024-03-04", "2024-04-05"),  # DST switch, Good Friday
+                                       ("2024-07-01", "2024-07-12"),  # early close, July 4th
+                                       ("2024-11-25", "2024-12-31")])  # Thanksgiving, Christmas
+def test_resample_matches_pandas_reference(timeframe, start, end):
+    cal = get_calendar()
+    bars = _minute_bars(start, end)
+    got = resample_bars(bars, timeframe, calendar=cal)
+    ref = _reference(bars, timeframe, cal)
+    pd.testing.assert_frame_equal(got, ref, check_dtype=False)
+
+
+def test_session_edges():
+    cal = get_calendar()
+    minutes = _minute_bars("2024-07-01", "2024-07-05")
+    hourly = resample_bars(minutes, "1h", calendar=cal)
+    local = pd.DatetimeIndex(hourly["ts"]).tz_convert(NY)
+    per_day = pd.Series(local.strftime("%H:%M")).groupby(local.strftime("%m-%d")).agg(list)
+    assert per_day["07-01"] == ["09:30", "10:30", "11:30", "12:30", "13:30", "14:30", "15:30"]
+    assert per_day["07-03"] == ["09:30", "10:30", "11:30", "12:30"]  # 13:00 close
+    assert "07-04" not in per_day
+    # the last bar of the early close only holds 12:30-12:59
+    last = hourly.set_index("ts").loc[pd.Timestamp("2024-07-03 16:30", tz="UTC"), "volume"]
+    assert last == minutes.set_index("ts").loc["2024-07-03 16:30":"2024-07-03 16:59", "volume"].sum()
+
+
+def test_trailing_partial_bar_is_dropped():
+    bars = _minute_bars("2024-07-01", "2024-07-01").iloc[:100]  # through 11:09
+    full = resample_bars(bars, "15m", calendar=get_calendar())
+    partial = resample_bars(bars, "15m", calendar=get_calendar(), complete_only=False)
+    assert len(partial) == len(full) + 1
+    assert pd.Timestamp(full["ts"].iloc[-1]).tz_convert(NY).strftime("%H:%M") == "10:45"
+
+
+def test_derive_rebuilds_a_changed_older_month(tmp_path):
+    store = BarStore(tmp_path, calendar=get_calendar())
+    bars = _minute_bars("2024-01-02", "2024-02-29")
+    store.write_bars("AAA", "1m", bars)
+    before = store.read("AAA", "1h")
+
+    jan = bars[bars["ts"] < pd.Timestamp("2024-02-01", tz="UTC")].assign(volume=lambda d: d["volume"] * 2)
+    store.write_bars("AAA", "1m", jan)
+    after = store.read("AAA", "1h")
+    rebuilt = resample_bars(store.read("AAA", "1m"), "1h", calendar=get_calendar())
+    pd.testing.assert_frame_equal(after, rebuilt, check_dtype=False)
+    in_jan = after["ts"] < pd.Timestamp("2024-02-01", tz="UTC")
+    np.testing.assert_allclose(after.loc[in_jan, "volume"], 2 * before.loc[in_jan, "volume"])
+
+
+def test_calendar_warns_once_outside_covered_years():
+    cal = TradingCalendar()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        cal.session_index(pd.Timestamp("2024-07-01 15:00", tz="UTC"))
+        assert not caught
+        cal.session_index(pd.Timestamp("2040-07-02 15:00", tz="UTC"))
+        cal.next_bar(pd.Timestamp("1999-07-02 15:00", tz="UTC"), "5m")
+    assert len(caught) == 1 and "2000-2035" in str(caught[0].message)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from patterns.candles import is_bullish_engulfing, is_hammer
+from patterns.scanner import (PATTERNS, Candles, OHLCPanel, has_pattern, mask_names, pattern_bit,
+                              pattern_signal, scan)
+
+
+def _frame(seed, n=2000):
+    rng = np.random.default_rng(seed)
+    close = 50.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]] * np.exp(rng.normal(0, 0.004, n))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.006, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.006, n)))
+    flat = rng.random(n) < 0.02  # zero-range bars
+    open_[flat] = high[flat] = low[flat] = close[flat]
+    ts = pd.date_range("2024-01-02 14:30", periods=n, freq="1min", tz="UTC")
+    return pd.DataFrame({"ts": ts, "open": open_, "high": high, "low": low, "close": close})
+
+
+def _pandas_reference(df, name):
+    """Per-pattern, per-symbol pandas formulation of each registered kernel."""
+    o, h, l, c = df["open"], df["high"], df["low"], df["close"]
+    po, pc = o.shift(1), c.shift(1)
+    body, rng = (c - o).abs(), (h - l).replace(0, 1e-9)
+    lower = (o.where(c >= o, c) - l).abs()
+    upper = (h - c.where(c >= o, o)).abs()
+    return {
+        "bullish_engulfing": lambda: is_bullish_engulfing(df),
+        "hammer": lambda: is_hammer(df),
+        "bearish_engulfing": lambda: (c < o) & (pc > po) & (c <= po) & (o >= pc),
+        "shooting_star": lambda: (body / rng < 0.3) & (upper > 2.0 * body),
+        "doji": lambda: body / rng < 0.1,
+    }[name]().to_numpy(bool)
+
+
+def test_panel_scan_matches_per_pattern_pandas():
+    frames = {f"S{i}": _frame(i) for i in range(4)}
+    panel = OHLCPanel.from_frames(frames)
+    mask = panel.scan()
+    assert mask.shape == (2000, 4) and mask.dtype == np.uint64
+    for name in PATTERNS:
+        hits = has_pattern(mask, name)
+        for j, sym in enumerate(panel.symbols):
+            want = _pandas_reference(frames[sym], name)
+            assert want.any()
+            np.testing.assert_array_equal(hits[:, j], want, err_msg=f"{name} {sym}")
+
+
+def test_missing_bars_never_fire_and_params_pass_through():
+    frames = {"A": _frame(1), "B": _frame(2).iloc[::2]}
+    panel = OHLCPanel.from_frames(frames)
+    mask = panel.scan()
+    assert (mask[1::2, 1] == 0).all()
+    loose = scan(panel.candles, ["hammer"], {"hammer": {"body_thresh": 0.6, "lower_wick_mult": 1.0}})
+    np.testing.assert_array_equal(has_pattern(loose, "hammer")[:, 0],
+                                  is_hammer(frames["A"], 0.6, 1.0).to_numpy(bool))
+    assert has_pattern(loose, "doji").sum() == 0  # only the requested pattern is evaluated
+
+
+def test_single_symbol_helpers():
+    df = _frame(3)
+    mask = scan(Candles.from_frame(df))
+    signal = pattern_signal("doji", body_thresh=0.05)
+    assert signal.pattern == "doji" and signal.params == {"body_thresh": 0.05}
+    np.testing.assert_array_equal(signal(df), (df["close"] - df["open"]).abs().to_numpy()
+                                  / (df["high"] - df["low"]).replace(0, 1e-9).to_numpy() < 0.05)
+    i = int(np.flatnonzero(has_pattern(mask, "bullish_engulfing"))[0])
+    assert "bullish_engulfing" in mask_names(mask[i])
+    assert mask_names(np.uint64(1) << np.uint64(pattern_bit("hammer"))) == ["hammer"]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_bars
+from live.market_data import LocalProvider
+from live.scheduler import BarCloseScheduler, SimulatedClock, next_bar_close
+
+
+def _frames(symbols):
+    bars = synthetic_bars(symbols, days=8, seed=6)
+    return {s: df.set_index("ts").rename(columns=str.capitalize) for s, df in bars.items()}
+
+
+def _scheduler(start, interval="1m", settle_s=2.0, **kw):
+    clock = SimulatedClock(start)
+    seen = []
+
+    def decide(sym, timeframe, bars, lookup, rails, broker, portfolio, regime_cfg):
+        seen.append((sym, clock.now(), bars["ts"].iloc[-1]))
+        return {"symbol": sym, "timeframe": timeframe, "action": "skip", "reason": "no_signal"}
+
+    symbols = ["SYN0000", "SYN0001"]
+    sched = BarCloseScheduler(symbols, interval, LocalProvider(frames=_frames(symbols)), None, None,
+                              clock=clock, summaries_lookup={}, settle_s=settle_s, decide=decide, **kw)
+    return sched, seen
+
+
+def test_fires_after_each_bar_close_and_skips_to_the_next_session():
+    # Friday 2024-01-05: the session closes at 21:00 UTC; the next opens Monday 14:30 UTC
+    sched, seen = _scheduler("2024-01-05 20:57:30")
+    asyncio.run(sched.run(max_bars=5))
+    closes = pd.DatetimeIndex(["2024-01-05 20:58", "2024-01-05 20:59", "2024-01-05 21:00",
+                               "2024-01-08 14:31", "2024-01-08 14:32"], tz="UTC")
+    frame = sched.latency_frame()
+    assert list(pd.DatetimeIndex(frame["bar_close"]).unique()) == list(closes)
+    for sym, woke, last in seen:
+        close = frame.loc[frame["symbol"] == sym, "bar_close"]
+        assert woke - pd.Timedelta(seconds=2) in set(close)  # woke at close + settle
+        # only closed bars reach the decider, though the provider already has the forming one
+        assert last == woke - pd.Timedelta(seconds=2) - pd.Timedelta(minutes=1)
+    assert len(seen) == 10 and (frame["latency_s"] >= 2.0).all()
+
+
+def test_run_stops_at_until_and_follows_the_interval():
+    sched, seen = _scheduler("2024-01-08 14:30", interval="5m", settle_s=0.0)
+    asyncio.run(sched.run(until="2024-01-08 14:50"))
+    assert sched.bars_run == 4
+    assert sorted({woke for _, woke, _ in seen})[-1] == pd.Timestamp("2024-01-08 14:50", tz="UTC")
+    assert next_bar_close(pd.Timestamp("2024-01-08 14:50", tz="UTC"), "5m") == \
+        pd.Timestamp("2024-01-08 14:55", tz="UTC")
+
+
+def test_a_failing_symbol_does_not_stop_the_others():
+    sched, _ = _scheduler("2024-01-08 15:00:30")
+
+    def decide(sym, *args):
+        if sym == "SYN0001":
+            raise RuntimeError("boom")
+        return {"symbol": sym, "timeframe": "1m", "action": "skip", "reason": "no_signal"}
+
+    sched.decide = decide
+    asyncio.run(sched.run(max_bars=1))
+    by = {d["symbol"]: d for d in sched.decisions}
+    assert by["SYN0000"]["reason"] == "no_signal"
+    assert by["SYN0001"]["reason"] == "error" and "boom" in by["SYN0001"]["error"]
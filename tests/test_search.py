@@ -0,0 +1,96 @@
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtests.search import (BacktestEvaluator, SearchLog, cell_stats, coarse_to_fine, sharpe_upper,
+                             wilson_upper)
+from benchmarks.synthetic import synthetic_bars
+from engine.data_layer import get_bar_store
+from engine.simulator import run_backtest
+from patterns.scanner import pattern_signal
+
+AXES = {"tp": list(np.round(np.linspace(0.005, 0.045, 9), 4)),
+        "sl": list(np.round(np.linspace(0.002, 0.018, 9), 4))}
+PEAK = (0.03, 0.008)
+
+
+class Surface:
+    """Noise-free cell stats peaking at PEAK; records every evaluation."""
+
+    def __init__(self, entries=2000):
+        self.entries = entries
+        self.calls = []
+
+    def truth(self, tp, sl):
+        d = ((np.asarray(tp) - PEAK[0]) / 0.02) ** 2 + ((np.asarray(sl) - PEAK[1]) / 0.008) ** 2
+        return 0.75 - 0.2 * d, 1.5 - 1.2 * d  # win_pct, sharpe
+
+    def __call__(self, cells, budget):
+        self.calls.append((budget, len(cells)))
+        win, sharpe = self.truth(cells["tp"], cells["sl"])
+        n = round(self.entries * budget)
+        return cells.assign(n=n, wins=np.round(win * n), win_pct=win, sharpe=sharpe)
+
+
+def test_halving_finds_the_exhaustive_best_with_fewer_evaluations(tmp_path):
+    surface = Surface()
+    log = SearchLog(tmp_path / "search.jsonl")
+    result = coarse_to_fine(surface, AXES, eta=3, rungs=3, log=log, tag={"strategy": "s"})
+
+    grid = pd.DataFrame(list(itertools.product(*AXES.values())), columns=list(AXES))
+    win, sharpe = surface.truth(grid["tp"], grid["sl"])
+    best = grid.iloc[int(np.argmax(sharpe))]
+    assert ((result["tp"] == best["tp"]) & (result["sl"] == best["sl"])).any()
+    assert (result["win_pct"] >= 0.6).all() and (result["sharpe"] >= 0.8).all() and (result["n"] >= 50).all()
+
+    assert [b for b, _ in surface.calls] == pytest.approx([1 / 9, 1 / 3, 1.0])
+    assert surface.calls[0][1] == 9  # stride-4 subgrid: indices 0, 4, 8 per axis
+    assert sum(b * m for b, m in surface.calls) < 0.5 * len(grid)  # entry-cells vs exhaustive
+
+    rows = [json.loads(line) for line in open(tmp_path / "search.jsonl")]
+    assert sum(r["rung"] == 0 for r in rows) == 9 and all(r["strategy"] == "s" for r in rows)
+    decisions = {r["decision"] for r in rows}
+    assert {"keep", "prune_halving", "pass"} <= decisions
+
+
+def test_cells_below_their_upper_bounds_are_pruned_early():
+    surface = Surface(entries=20_000)  # rung 0 sees ~2200 entries per cell: tight bounds
+    stats = []
+    log = SearchLog()
+    log.write = stats.extend
+    coarse_to_fine(surface, AXES, eta=3, rungs=3, log=log)
+    rung0 = pd.DataFrame([r for r in stats if r["rung"] == 0])
+    bound = rung0["decision"] == "prune_bound"
+    assert bound.any()
+    low = rung0.loc[bound]
+    assert ((low["sharpe"] < 0.8) | (low["win_pct"] < 0.6)).all()
+
+
+def test_confidence_bounds():
+    # Wilson upper bound of 30/50 at z=1.645 and Lo's Sharpe standard error
+    assert wilson_upper(30, 50) == pytest.approx(0.7060, abs=1e-4)
+    assert wilson_upper(0, 0) == 1.0
+    assert sharpe_upper(0.5, 100) == pytest.approx(0.5 + 1.645 * np.sqrt(1.125 / 100))
+    assert sharpe_upper(np.nan, 100) == np.inf
+
+
+def test_backtest_evaluator_matches_a_full_grid_run(data_env):
+    bars = synthetic_bars(["SYN0000"], days=5, seed=1)["SYN0000"]
+    get_bar_store().write_bars("SYN0000", "1m", bars)
+    signal = pattern_signal("doji")
+    cells = pd.DataFrame({"tp": [0.001, 0.002], "sl": [0.001, 0.002], "max_bars": [10, 20]})
+    evaluator = BacktestEvaluator(["SYN0000"], "1m", "doji", signal)
+    got = evaluator(cells, 1.0).sort_values(["tp", "sl", "max_bars"]).reset_index(drop=True)
+
+    grid = {"tp": [0.001, 0.002], "sl": [0.001, 0.002], "max_bars": [10, 20]}
+    full = run_backtest(["SYN0000"], "1m", {"doji": signal}, None, grid, None, None)
+    want = cell_stats(full, ["tp", "sl", "max_bars"]).merge(cells).sort_values(["tp", "sl", "max_bars"])
+    pd.testing.assert_frame_equal(got, want.reset_index(drop=True), check_dtype=False)
+    assert len(evaluator.trades) == len(full[full.set_index(["tp", "sl", "max_bars"]).index.isin(
+        cells.set_index(["tp", "sl", "max_bars"]).index)])
+
+    thin = evaluator(cells, 1 / 3)
+    assert (thin.set_index(["tp", "sl"])["n"] < got.set_index(["tp", "sl"])["n"]).all()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import yaml
+
+from backtests.stress import reprice, scenario_pnl
+from benchmarks.synthetic import synthetic_bars
+from engine.data_layer import get_bar_store
+from engine.fill_model import LiquidityGates, leg_fill_columns, trade_slippage
+from engine.simulator import run_backtest
+
+GRID = {"tp": [0.005], "sl": [0.005], "max_bars": [12]}
+SIGNALS = {"up": lambda b: (b["close"] > b["close"].shift()).to_numpy()}
+
+
+def test_config_gates_load():
+    cfg = yaml.safe_load(open("configs/backtest_grid.yaml"))["liquidity"]
+    assert LiquidityGates(**cfg).min_oi == cfg["min_oi"]
+
+
+def test_reprice_matches_a_rerun(data_env):
+    bars = synthetic_bars(["SYN0000"], days=3)["SYN0000"]
+    get_bar_store().write_bars("SYN0000", "1m", bars)
+    gates = LiquidityGates(max_spread_pct=float(np.median(bars["spread"] / bars["close"])),
+                           min_volume=float(np.median(bars["volume"])))
+    base = run_backtest(["SYN0000"], "1m", SIGNALS, None, GRID, None, None)
+    direct = run_backtest(["SYN0000"], "1m", SIGNALS, None, {**GRID, "slip_frac_of_half": 0.6}, gates, None)
+    got = reprice(base, 2.0, gates)
+    assert 0 < len(got) < len(base)
+    pd.testing.assert_frame_equal(got.reset_index(drop=True)[["entry_ts", "pnl", "ret_on_risk"]],
+                                  direct[["entry_ts", "pnl", "ret_on_risk"]])
+    pnl, admitted = scenario_pnl(base, [1.0, 2.0], [gates])
+    np.testing.assert_allclose(pnl[:, 0], base["pnl"])
+    np.testing.assert_allclose(pnl[admitted[:, 1], 1], got["pnl"])
+
+
+def test_multi_leg_fills():
+    rng = np.random.default_rng(0)
+    t = pd.DataFrame({c: rng.uniform(1.0, 2.0, 4) for c in leg_fill_columns(2)})
+    t["leg1_entry_oi"] = [50, 200, 200, 200]
+    one = [t[f"leg{i}_slip_frac"] * (t[f"leg{i}_entry_spread"] + t[f"leg{i}_exit_spread"]) / 2
+           * t[f"leg{i}_qty"] for i in range(2)]
+    np.testing.assert_allclose(trade_slippage(t), one[0] + one[1])
+    t["slippage"], t["pnl"], t["ret_on_risk"] = trade_slippage(t), 1.0, 0.5
+    got = reprice(t, 3.0, LiquidityGates(max_spread_pct=10.0, min_volume=0))
+    assert len(got) == 3  # the first trade's second leg is below min_oi
+    np.testing.assert_allclose(got["pnl"], 1.0 - 2 * t["slippage"][1:])
+    np.testing.assert_allclose(got["ret_on_risk"], got["pnl"] / 2.0)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtests.summarize import (ContextKeyAggregator, merge_partial_summaries,
+                                 summarize_to_contextkeys)
+
+GROUP = ["context_key", "tp"]
+
+
+@pytest.fixture
+def trades():
+    rng = np.random.default_rng(7)
+    n = 5000
+    return pd.DataFrame({"context_key": rng.integers(0, 12, n), "tp": rng.choice([0.01, 0.02], n),
+                         "pnl": rng.normal(0.0, 1.0, n),
+                         "exit_reason": rng.choice(["tp", "sl", "time", "open"], n, p=[.3, .3, .3, .1])})
+
+
+def _reference(trades):
+    rows = []
+    for key, g in trades[trades["exit_reason"] != "open"].groupby(GROUP, sort=False):
+        pnl = g["pnl"].to_numpy()
+        eq = np.cumsum(pnl)
+        peak = np.maximum.accumulate(np.maximum(eq, 0.0))
+        rows.append((*key, len(pnl), (pnl > 0).mean(), pnl.sum(), (peak - eq).max()))
+    return pd.DataFrame(rows, columns=[*GROUP, "n", "win_pct", "total_pnl", "max_drawdown"])
+
+
+def _check(out, ref):
+    got = out.set_index(GROUP).sort_index()
+    ref = ref.set_index(GROUP).sort_index()
+    assert list(got.index) == list(ref.index)
+    np.testing.assert_array_equal(got["n"], ref["n"])
+    for c in ("win_pct", "total_pnl", "max_drawdown"):
+        np.testing.assert_allclose(got[c], ref[c], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("batch_size", [37, 1 << 16])
+def test_streamed_batches_match_single_pass(tmp_path, trades, batch_size):
+    trades.to_parquet(tmp_path / "t.parquet")
+    out = summarize_to_contextkeys(tmp_path / "t.parquet", group_cols=GROUP, batch_size=batch_size)
+    _check(out, _reference(trades))
+
+
+def test_merged_partials_treat_shards_as_consecutive_segments(tmp_path, trades):
+    paths = []
+    for i, lo in enumerate(range(0, len(trades), 2000)):
+        part = trades.iloc[lo:lo + 2000]
+        part.to_parquet(tmp_path / f"t{i}.parquet")
+        paths.append(tmp_path / f"s{i}.parquet")
+        summarize_to_contextkeys(tmp_path / f"t{i}.parquet", paths[-1], group_cols=GROUP, partial=True)
+    _check(merge_partial_summaries(paths, group_cols=GROUP), _reference(trades))
+
+
+def test_drawdown_spanning_segments():
+    # peak in the first segment, trough in the second
+    agg = ContextKeyAggregator(["k"])
+    agg.update(pd.DataFrame({"k": [1, 1], "pnl": [5.0, -1.0]}))
+    agg.update(pd.DataFrame({"k": [1, 1], "pnl": [-3.0, 2.0]}))
+    assert agg.to_frame()["max_drawdown"].item() == pytest.approx(4.0)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtests.walkforward import fold_masks, make_folds, walk_forward
+
+
+@pytest.fixture
+def trades():
+    rng = np.random.default_rng(11)
+    n = 3000
+    entry = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 90 * 1440, n)), "min")
+    exit_ = entry + pd.to_timedelta(rng.integers(1, 5 * 1440, n), "min")
+    return pd.DataFrame({"context_key": rng.integers(0, 5, n), "entry_ts": entry, "exit_ts": exit_,
+                         "pnl": rng.normal(0.0, 1.0, n),
+                         "exit_reason": rng.choice(["tp", "sl", "open"], n, p=[.45, .45, .1])})
+
+
+def _index_sets(trades, fold, embargo):
+    """Train/test trade indices of one fold, spelled out trade by trade."""
+    emb = pd.Timedelta(embargo or 0)
+    train, test = set(), set()
+    for i, (a, b) in enumerate(zip(trades["entry_ts"], trades["exit_ts"])):
+        if fold.test_start <= a < fold.test_end:
+            test.add(i)
+        elif not fold.train_start <= a < fold.train_end:
+            continue
+        elif a < fold.test_end and b >= fold.test_start:
+            continue  # purged: the trade is still open when the test window starts
+        elif fold.test_end <= a < fold.test_end + emb:
+            continue  # embargoed: enters right after the test window
+        else:
+            train.add(i)
+    return train, test
+
+
+@pytest.mark.parametrize("mode, embargo", [("expanding", None), ("rolling", "2D"), ("kfold", "3D")])
+def test_fold_masks_match_purged_embargoed_index_sets(trades, mode, embargo):
+    folds = make_folds(trades["entry_ts"].min(), trades["entry_ts"].max(), 4, mode, train_blocks=2)
+    train, test = fold_masks(trades["entry_ts"], trades["exit_ts"], folds, embargo)
+    purged = 0
+    for k, fold in enumerate(folds.itertuples()):
+        want_train, want_test = _index_sets(trades, fold, embargo)
+        assert set(np.flatnonzero(train[k])) == want_train
+        assert set(np.flatnonzero(test[k])) == want_test
+        raw = (trades["entry_ts"] >= fold.train_start) & (trades["entry_ts"] < fold.train_end)
+        purged += int((raw & ~test[k]).sum()) - len(want_train)
+    assert purged > 0
+    assert not (train & test).any()
+
+
+def test_fold_layouts(trades):
+    t0, t1 = trades["entry_ts"].min(), trades["entry_ts"].max()
+    exp = make_folds(t0, t1, 4, "expanding")
+    assert (exp["train_start"] == t0).all() and (exp["train_end"] == exp["test_start"]).all()
+    assert (exp["test_start"].iloc[1:].to_numpy() == exp["test_end"].iloc[:-1].to_numpy()).all()
+    roll = make_folds(t0, t1, 4, "rolling", train_blocks=1)
+    assert (roll["train_start"].iloc[1:].to_numpy() == exp["test_start"].iloc[:-1].to_numpy()).all()
+    kf = make_folds(t0, t1, 4, "kfold")
+    assert kf["test_start"].iloc[0] == t0 and kf["test_end"].iloc[-1] > t1
+    with pytest.raises(ValueError):
+        make_folds(t0, t1, 4, "random")
+
+
+def test_walk_forward_metrics_are_fold_subsets(trades):
+    folds, metrics = walk_forward(trades, n_folds=3, embargo="1D", group_cols=["context_key"])
+    done = trades[trades["exit_reason"] != "open"].reset_index(drop=True)
+    train, test = fold_masks(done["entry_ts"], done["exit_ts"], folds, "1D")
+    for k in range(3):
+        for split, mask in (("train", train[k]), ("test", test[k])):
+            got = metrics[(metrics["fold"] == k) & (metrics["split"] == split)].set_index("context_key")
+            want = done[mask].groupby("context_key")["pnl"].agg(["size", "sum"])
+            assert got["n"].sort_index().tolist() == want["size"].tolist()
+            np.testing.assert_allclose(got["total_pnl"].sort_index(), want["sum"], rtol=1e-9)
+    assert (folds["n_test"] > 0).all()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from live.whitelist import EMPTY, Whitelist, WhitelistHandle, build_table, export_whitelist
+from patterns.context import ContextKeyCodec
+
+
+def test_build_table_finds_every_key():
+    rng = np.random.default_rng(0)
+    keys = np.unique(rng.integers(1, 1 << 40, 5000))
+    slots, rows = build_table(keys)
+    placed = slots != EMPTY
+    assert placed.sum() == len(keys)
+    np.testing.assert_array_equal(keys[rows[placed]], slots[placed])
+
+
+@pytest.fixture
+def summary():
+    codec = ContextKeyCodec()
+    rng = np.random.default_rng(1)
+    n = 400
+    keys = codec.encode(rng.choice(["AAPL", "MSFT", "SPY"], n), "5m", rng.choice(["hammer", "doji"], n),
+                        rng.choice(["pos", "neg", "flat"], n), rng.choice(["neutral", "oversold"], n),
+                        rng.choice(["up", "down", "flat"], n), rng.choice(["low", "mid", "high"], n))
+    df = pd.DataFrame({"context_key": keys, "tp": 0.01, "sl": 0.005, "max_bars": 20,
+                       "n": rng.integers(10, 200, n), "win_pct": rng.uniform(0.3, 0.8, n),
+                       "sharpe": rng.normal(0.5, 0.5, n), "profit_factor": 1.2,
+                       "avg_pnl": 0.1, "max_drawdown": 1.0})
+    return df, codec
+
+
+def test_export_and_lookup(tmp_path, summary):
+    df, codec = summary
+    out = export_whitelist(df, tmp_path, top_k=5, min_trades=50, codec=codec)
+    wl = Whitelist(out)
+    chosen = np.load(out / "keys.npy")
+    assert 0 < len(chosen) <= 5 * 9
+
+    best = (df[df["n"] >= 50].sort_values("sharpe", ascending=False, kind="stable")
+              .drop_duplicates("context_key").set_index("context_key"))
+    for key in chosen:
+        stats = wl.get(int(key))
+        assert stats["sharpe"] == pytest.approx(best.loc[key, "sharpe"])
+        assert stats["n"] == best.loc[key, "n"]
+    for key in set(df["context_key"]) - set(chosen.tolist()):
+        assert key not in wl
+    # at most top_k keys per trend x vol regime
+    fields = wl.codec.decode(chosen)
+    assert pd.Series(list(zip(fields["trend"], fields["vol_regime"]))).value_counts().max() <= 5
+
+
+def test_handle_swaps_versions_and_survives_a_vanished_one(tmp_path, summary, monkeypatch):
+    df, codec = summary
+    first = export_whitelist(df, tmp_path, min_trades=50, codec=codec)
+    handle = WhitelistHandle(tmp_path, check_every_s=0)
+    assert handle.current().version == first.name
+
+    monkeypatch.setattr("live.whitelist.time.strftime", lambda fmt: "29991231T000000")
+    second = export_whitelist(df[df["n"] >= 150], tmp_path, min_trades=50, codec=codec)
+    assert handle.current().version == second.name
+
+    (tmp_path / "CURRENT").write_text("removed-during-swap")
+    assert handle.current().version == second.name
+    key = int(np.load(second / "keys.npy")[0])
+    assert handle.get(key) is not None
+
+
+def test_same_second_exports_get_distinct_versions(tmp_path, summary, monkeypatch):
+    df, codec = summary
+    monkeypatch.setattr("live.whitelist.time.strftime", lambda fmt: "20240102T000000")
+    monkeypatch.setattr("live.whitelist.time.time_ns", lambda: 0)
+    first = export_whitelist(df, tmp_path, min_trades=50, codec=codec)
+    second = export_whitelist(df, tmp_path, min_trades=50, codec=codec)
+    assert first != second and first.exists() and second.exists()
+    assert (tmp_path / "CURRENT").read_text() == second.name
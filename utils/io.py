@@ -1,12 +1,130 @@
+import os
 from pathlib import Path
+from typing import Optional, Sequence
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # >>> REPLACE THIS <<<
 GCS_BUCKET = "gs://infra-throne-470123-k3-btopt"  # e.g., gs://btopt-results
 
+# Trade tables: clustered by ContextKey + exit cell so keys, grid values and the
+# repeated string columns collapse into long dictionary runs, and readers that
+# group by key see each key in few row groups.
+RESULT_SORT = ["context_key", "tp", "sl", "max_bars", "profit_target_pct", "max_loss_mult_credit",
+               "time_stop_days_before_expiry", "strategy", "entry_ts"]
+RESULT_DICT_COLUMNS = ["symbol", "timeframe", "strategy", "exit_reason", "context_key",
+                       "tp", "sl", "max_bars", "side", "qty", "slip_frac"]
+RESULT_ROW_GROUP_ROWS = 1 << 16
+RESULT_COMPRESSION = os.getenv("RESULT_COMPRESSION", "zstd")
+
 def write_parquet_local(df: pd.DataFrame, path: str | Path):
-    Path(path).parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(path, index=False)
+    # write-then-rename so readers (and a crash) never see a half-written file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
 
 def read_parquet_local(path: str | Path) -> pd.DataFrame:
     return pd.read_parquet(path)
+
+
+class ParquetStreamWriter:
+    """Append frames to one Parquet file, a row group at a time.
+
+    Only the output is streamed: at most `row_group_rows` rows are buffered
+    before they are flushed as one row group, but the writer does not sort or
+    regroup what it is given, so any clustering (see `write_results`) has to be
+    done by the caller beforehand. The file is written under a temp name and
+    renamed on `close()`, so a crash never leaves a partial file at `path`.
+    Columns in `dictionary` are dictionary encoded (the rest plain), the schema
+    is fixed by the first frame.
+    """
+
+    def __init__(self, path: str | Path, dictionary: Optional[Sequence[str]] = None,
+                 row_group_rows: int = RESULT_ROW_GROUP_ROWS, compression: str = RESULT_COMPRESSION):
+        self.path = Path(path)
+        self.dictionary = list(dictionary) if dictionary is not None else None
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+        self.tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self.rows = 0
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._buf: list[pa.Table] = []
+        self._buffered = 0
+
+    def _open(self, schema: pa.Schema):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        use_dict = True if self.dictionary is None else [c for c in self.dictionary if c in schema.names]
+        self._writer = pq.ParquetWriter(self.tmp, schema, compression=self.compression,
+                                        use_dictionary=use_dict)
+
+    def write(self, df: pd.DataFrame):
+        if df is None or df.empty:
+            return
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._open(table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+        self._buf.append(table)
+        self._buffered += len(table)
+        while self._buffered >= self.row_group_rows:
+            self._flush(self.row_group_rows)
+
+    def _flush(self, n: Optional[int] = None):
+        if not self._buffered:
+            return
+        table = pa.concat_tables(self._buf)
+        n = len(table) if n is None else n
+        self._writer.write_table(table.slice(0, n), row_group_size=n)
+        rest = table.slice(n)
+        self._buf = [rest] if len(rest) else []
+        self._buffered = len(rest)
+        self.rows += n
+
+    def close(self) -> Optional[Path]:
+        """Finish the file; returns its path, or None if nothing was written."""
+        if self._writer is None:
+            return None
+        self._flush()
+        self._writer.close()
+        self._writer = None
+        os.replace(self.tmp, self.path)
+        return self.path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_results(df: pd.DataFrame, path: str | Path, sort_by: Sequence[str] = RESULT_SORT,
+                  row_group_rows: int = RESULT_ROW_GROUP_ROWS) -> Path:
+    """Trade table -> Parquet sorted by ContextKey, dictionary-encoded keys and
+    strings, zstd, `row_group_rows` per row group; written atomically.
+
+    The sort happens in memory on the whole frame (a sorted copy of `df` is
+    held alongside it); only the write is streamed, one row group at a time.
+    """
+    keys = [c for c in sort_by if c in df.columns]
+    if keys:
+        df = df.sort_values(keys, kind="stable", ignore_index=True)
+    with ParquetStreamWriter(path, dictionary=RESULT_DICT_COLUMNS,
+                             row_group_rows=row_group_rows) as w:
+        for lo in range(0, len(df), row_group_rows):
+            w.write(df.iloc[lo:lo + row_group_rows])
+    return Path(path)
@@ -0,0 +1,218 @@
+"""
+Object storage for backtest results.
+
+`ObjectStore` is the small interface the batch jobs need: put / get / delete a
+file by key, list the keys under a prefix with their modification times, and
+pull every object under a prefix into a local directory.
+`GCSObjectStore` shells out to gsutil like the rest of the jobs;
+`LocalObjectStore` mirrors into a directory and stands in for the bucket in
+offline runs and tests.
+
+`BackgroundUploader` puts finished files from a thread pool while the caller
+keeps working. Uploads of one key are serialized and re-submitting a key that
+is still queued is a no-op, since the queued upload will read the newest file
+anyway; `flush()` is the only point that waits.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from utils.telemetry import incr, span
+
+
+class ObjectStore(ABC):
+    """Failures raise OSError; a missing key or prefix is not a failure."""
+
+    @abstractmethod
+    def put(self, local_path: str | Path, key: str):
+        ...
+
+    @abstractmethod
+    def get(self, key: str, local_path: str | Path) -> bool:
+        """Download `key` to `local_path`; False if it doesn't exist."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove `key` (already missing = no-op)."""
+
+    @abstractmethod
+    def list(self, prefix: str) -> dict[str, float]:
+        """{key: modified time (epoch seconds)} for every object under `prefix`."""
+
+    @abstractmethod
+    def pull(self, prefix: str, local_dir: str | Path):
+        """Copy every object under `prefix` into `local_dir` (missing prefix = no-op)."""
+
+
+def _gsutil(*args: str, stdout: bool = False) -> tuple:
+    """Run gsutil -> (exit code, stderr), or (exit code, stdout, stderr)."""
+    p = subprocess.run(["gsutil", "-q", *args], capture_output=True, text=True)
+    return (p.returncode, p.stdout, p.stderr) if stdout else (p.returncode, p.stderr)
+
+
+class GCSObjectStore(ObjectStore):
+    def __init__(self, bucket: str, prefix: str = ""):
+        self.base = f"gs://{bucket.removeprefix('gs://').rstrip('/')}"
+        if prefix:
+            self.base += "/" + prefix.strip("/")
+
+    def url(self, key: str) -> str:
+        return f"{self.base}/{key.lstrip('/')}"
+
+    def put(self, local_path, key):
+        code, err = _gsutil("cp", str(local_path), self.url(key))
+        if code != 0:
+            raise OSError(f"gsutil cp failed: {local_path} -> {self.url(key)}: {err.strip()}")
+
+    def get(self, key, local_path) -> bool:
+        Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+        code, err = _gsutil("cp", self.url(key), str(local_path))
+        if code == 0:
+            return True
+        if "No URLs matched" in err or "matched no objects" in err:
+            return False
+        raise OSError(f"gsutil cp failed: {self.url(key)} -> {local_path}: {err.strip()}")
+
+    def delete(self, key):
+        code, err = _gsutil("rm", self.url(key))
+        if code != 0 and "No URLs matched" not in err:
+            raise OSError(f"gsutil rm failed: {self.url(key)}: {err.strip()}")
+
+    def list(self, prefix) -> dict[str, float]:
+        code, out, err = _gsutil("ls", "-l", self.url(prefix).rstrip("/") + "/**", stdout=True)
+        if code != 0:
+            if "matched no objects" in err:
+                return {}
+            raise OSError(f"gsutil ls failed: {self.url(prefix)}: {err.strip()}")
+        keys = {}
+        for line in out.splitlines():
+            parts = line.split()
+            if len(parts) == 3 and parts[2].startswith(self.base + "/"):
+                keys[parts[2][len(self.base) + 1:]] = pd.Timestamp(parts[1]).timestamp()
+        return keys
+
+    def pull(self, prefix, local_dir):
+        code, err = _gsutil("ls", self.url(prefix))
+        if code != 0:
+            if "matched no objects" in err:
+                return
+            raise OSError(f"gsutil ls failed: {self.url(prefix)}: {err.strip()}")
+        Path(local_dir).mkdir(parents=True, exist_ok=True)
+        code, err = _gsutil("-m", "rsync", "-r", self.url(prefix), str(local_dir))
+        if code != 0:
+            raise OSError(f"gsutil rsync failed: {self.url(prefix)} -> {local_dir}: {err.strip()}")
+
+
+class LocalObjectStore(ObjectStore):
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key.lstrip("/")
+
+    @staticmethod
+    def _copy(src: Path, dst: Path):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    def put(self, local_path, key):
+        self._copy(Path(local_path), self._path(key))
+
+    def get(self, key, local_path) -> bool:
+        src = self._path(key)
+        if not src.exists():
+            return False
+        self._copy(src, Path(local_path))
+        return True
+
+    def delete(self, key):
+        self._path(key).unlink(missing_ok=True)
+
+    def list(self, prefix) -> dict[str, float]:
+        src = self._path(prefix)
+        if not src.is_dir():
+            return {}
+        return {p.relative_to(self.root).as_posix(): p.stat().st_mtime
+                for p in src.rglob("*") if p.is_file() and not p.name.endswith(".tmp")}
+
+    def pull(self, prefix, local_dir):
+        src = self._path(prefix)
+        if not src.is_dir():
+            return
+        for p in src.rglob("*"):
+            if p.is_file() and not p.name.endswith(".tmp"):
+                self._copy(p, Path(local_dir) / p.relative_to(src))
+
+
+def object_store_from_env(prefix: str = "") -> Optional[ObjectStore]:
+    """GCS_BUCKET -> GCSObjectStore; else RESULTS_STORE_DIR -> LocalObjectStore; else None."""
+    bucket = os.getenv("GCS_BUCKET")
+    if bucket:
+        return GCSObjectStore(bucket, prefix)
+    root = os.getenv("RESULTS_STORE_DIR")
+    if root:
+        return LocalObjectStore(Path(root) / prefix if prefix else root)
+    return None
+
+
+class BackgroundUploader:
+    def __init__(self, store: ObjectStore, workers: int = 4):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self._lock = threading.Lock()
+        self._queued: set[str] = set()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._futures: list[Future] = []
+        self.errors: list[tuple[str, str]] = []
+        self.uploaded = 0
+
+    def submit(self, local_path: str | Path, key: str):
+        """Queue `local_path` for upload as `key`. The file is read when the upload
+        runs; if it no longer exists then, the key is deleted instead."""
+        with self._lock:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+            lock = self._key_locks.setdefault(key, threading.Lock())
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(self._pool.submit(self._put, Path(local_path), key, lock))
+
+    def _put(self, path: Path, key: str, lock: threading.Lock):
+        with lock:
+            with self._lock:
+                self._queued.discard(key)
+            try:
+                with span("upload_file"):
+                    if path.exists():
+                        self.store.put(path, key)
+                    else:
+                        self.store.delete(key)
+                with self._lock:
+                    self.uploaded += 1
+                incr("uploads", outcome="ok")
+            except Exception as e:
+                with self._lock:
+                    self.errors.append((key, repr(e)))
+                incr("uploads", outcome="error")
+
+    def flush(self) -> list[tuple[str, str]]:
+        """Wait for everything queued so far; returns (key, error) for failed uploads."""
+        with self._lock:
+            pending = list(self._futures)
+        wait(pending)
+        return list(self.errors)
+
+    def close(self):
+        self.flush()
+        self._pool.shutdown(wait=True)
@@ -1,2 +1,186 @@
+"""
+Trend / volatility regime labels (the `trend` and `vol_regime` ContextKey fields).
+
+trend: close vs its `trend_ma_window` SMA; more than `trend_threshold_bps`
+above -> "up", below -> "down", else "flat".
+
+vol_regime: ATR(`atr_window`) as a fraction of close, ranked against its own
+trailing `atr_quantile_window` bars: at or below the `atr_low_quantile` ->
+"low", at or above `atr_high_quantile` -> "high", else "mid". Warm-up bars are
+"flat" / "mid".
+
+`regime_panel` labels a whole time x symbol panel at once (pandas rolling
+windows run per column in C; the rolling quantile is an O(log w) skiplist).
+`RegimeState` produces the same labels one bar at a time for live use, with
+`RollingQuantile` as its order-statistic window.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import os
+from collections import deque
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from patterns.recursive import EPS, NAN, ATRState
+
+TREND_LABELS = np.array(["flat", "up", "down"], dtype=object)
+VOL_LABELS = np.array(["low", "mid", "high"], dtype=object)
+FLAT, UP, DOWN = 0, 1, 2
+LOW, MID, HIGH = 0, 1, 2
+
+DEFAULT_CFG = {"trend_ma_window": 50, "trend_threshold_bps": 5.0, "atr_window": 14,
+               "atr_low_quantile": 0.3, "atr_high_quantile": 0.7, "atr_quantile_window": 500}
+
+_file_cfg: Optional[dict] = None
+
+
+def _read_yaml(path: Path) -> dict:
+    try:
+        import yaml
+        return yaml.safe_load(path.read_text()) or {}
+    except ImportError:  # flat `key: scalar` file; enough for configs/regimes.yaml
+        out = {}
+        for line in path.read_text().splitlines():
+            key, sep, val = line.split("#", 1)[0].partition(":")
+            if sep and val.strip():
+                out[key.strip()] = float(val)
+        return out
+
+
+def load_regime_cfg(cfg: Optional[dict] = None) -> dict:
+    """`cfg` over configs/regimes.yaml (REGIMES_CONFIG) over `DEFAULT_CFG`."""
+    global _file_cfg
+    if _file_cfg is None:
+        path = Path(os.getenv("REGIMES_CONFIG", "configs/regimes.yaml"))
+        _file_cfg = _read_yaml(path) if path.exists() else {}
+    out = {**DEFAULT_CFG, **{k: v for k, v in _file_cfg.items() if k in DEFAULT_CFG}, **(cfg or {})}
+    for k in ("trend_ma_window", "atr_window", "atr_quantile_window"):
+        out[k] = int(out[k])
+    return out
+
+
+def _trend_codes(close, sma, threshold_bps: float) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bps = (close / sma - 1.0) * 1e4
+    return np.where(bps > threshold_bps, UP, np.where(bps < -threshold_bps, DOWN, FLAT)).astype(np.int8)
+
+
+def _vol_codes(natr, q_lo, q_hi) -> np.ndarray:
+    return np.where(natr <= q_lo, LOW, np.where(natr >= q_hi, HIGH, MID)).astype(np.int8)
+
+
+def regime_panel(close, high, low, cfg: Optional[dict] = None) -> tuple[np.ndarray, np.ndarray]:
+    """(trend, vol) int8 codes (into TREND_LABELS / VOL_LABELS) for 1-D series or
+    (time x symbol) panels; NaN rows (missing bars) count as bars in the windows."""
+    c = load_regime_cfg(cfg)
+    shape = np.shape(close)
+    close = pd.DataFrame(np.asarray(close, dtype=np.float64).reshape(len(close), -1))
+    high = np.asarray(high, dtype=np.float64).reshape(close.shape)
+    low = np.asarray(low, dtype=np.float64).reshape(close.shape)
+
+    w = c["trend_ma_window"]
+    sma = close.rolling(w, min_periods=w).mean().to_numpy()
+    trend = _trend_codes(close.to_numpy(), sma, c["trend_threshold_bps"])
+
+    n = c["atr_window"]
+    pc = close.shift(1).to_numpy()
+    hl = high - low
+    hl[hl == 0] = EPS  # ATRState / pandas_ta non_zero_range
+    with np.errstate(invalid="ignore"):
+        tr = np.fmax(hl, np.fmax(np.abs(high - pc), np.abs(pc - low)))
+    tr[:1] = np.nan  # ATRState: no range on the first bar
+    atr = pd.DataFrame(tr).ewm(alpha=1.0 / n, adjust=True, min_periods=n).mean()
+    natr = atr / close
+    roll = natr.rolling(c["atr_quantile_window"], min_periods=n)
+    q_lo = roll.quantile(c["atr_low_quantile"]).to_numpy()
+    q_hi = roll.quantile(c["atr_high_quantile"]).to_numpy()
+    vol = _vol_codes(natr.to_numpy(), q_lo, q_hi)
+    return trend.reshape(shape), vol.reshape(shape)
+
+
 def classify_regime(bars_df, cfg):
-    return ("flat","mid")
+    """Per-bar (trend, vol_regime) label arrays for one symbol's bars."""
+    if bars_df is None or len(bars_df) == 0:
+        return np.array([], dtype=object), np.array([], dtype=object)
+    trend, vol = regime_panel(bars_df["close"], bars_df["high"], bars_df["low"], cfg)
+    return TREND_LABELS[trend.ravel()], VOL_LABELS[vol.ravel()]
+
+
+def classify_panel(panel, cfg=None) -> tuple[np.ndarray, np.ndarray]:
+    """Labels for a `patterns.scanner.OHLCPanel`, shaped (time, symbol)."""
+    b = panel.candles
+    trend, vol = regime_panel(b.close, b.high, b.low, cfg)
+    return TREND_LABELS[trend], VOL_LABELS[vol]
+
+
+class RollingQuantile:
+    """Quantiles of the last `window` values, updated in O(log w) search plus one
+    memmove: a sorted list of the window's non-NaN values. Matches
+    `Series.rolling(window, min_periods).quantile(q)` (linear interpolation)."""
+
+    def __init__(self, window: int, quantiles: Sequence[float], min_periods: Optional[int] = None):
+        self.window = window
+        self.quantiles = list(quantiles)
+        self.min_periods = window if min_periods is None else min_periods
+        self.values = deque()
+        self.sorted: list = []
+
+    def update(self, x: float) -> list:
+        self.values.append(x)
+        if x == x:
+            bisect.insort(self.sorted, x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                del self.sorted[bisect.bisect_left(self.sorted, old)]
+        return self.current()
+
+    def current(self) -> list:
+        s, k = self.sorted, len(self.sorted)
+        if k == 0 or k < self.min_periods:
+            return [NAN] * len(self.quantiles)
+        out = []
+        for q in self.quantiles:
+            idx = q * (k - 1)
+            lo = int(math.floor(idx))
+            hi = min(lo + 1, k - 1)
+            out.append(s[lo] + (s[hi] - s[lo]) * (idx - lo) if hi != lo else s[lo])
+        return out
+
+
+class RegimeState:
+    """Streaming counterpart of `classify_regime`: one bar in, (trend, vol_regime) out."""
+
+    def __init__(self, cfg: Optional[dict] = None):
+        c = self.cfg = load_regime_cfg(cfg)
+        self.closes = deque(maxlen=c["trend_ma_window"])
+        self.atr = ATRState(c["atr_window"])
+        self.natr = RollingQuantile(c["atr_quantile_window"],
+                                    [c["atr_low_quantile"], c["atr_high_quantile"]],
+                                    min_periods=c["atr_window"])
+
+    def update(self, high: float, low: float, close: float) -> tuple[str, str]:
+        self.closes.append(close)
+        w = self.cfg["trend_ma_window"]
+        sma = math.fsum(self.closes) / w if len(self.closes) == w and not any(
+            v != v for v in self.closes) else NAN
+        trend = _trend_codes(close, sma, self.cfg["trend_threshold_bps"])
+        atr = self.atr.update(high, low, close)
+        natr = atr / close if close else NAN
+        q_lo, q_hi = self.natr.update(natr)
+        vol = _vol_codes(natr, q_lo, q_hi)
+        return TREND_LABELS[int(trend)], VOL_LABELS[int(vol)]
+
+    def run(self, high, low, close) -> tuple[np.ndarray, np.ndarray]:
+        out = [self.update(h, l, c) for h, l, c in zip(np.asarray(high, float).tolist(),
+                                                        np.asarray(low, float).tolist(),
+                                                        np.asarray(close, float).tolist())]
+        if not out:
+            return np.array([], dtype=object), np.array([], dtype=object)
+        trend, vol = zip(*out)
+        return np.array(trend, dtype=object), np.array(vol, dtype=object)
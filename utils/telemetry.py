@@ -0,0 +1,218 @@
+"""
+Low-overhead stage timing and counters.
+
+`span(stage, **labels)` is a context manager (and `timed` the decorator form)
+that records wall time into a per-(stage, labels) latency histogram; `incr`
+bumps a counter. Everything lands in one process-wide registry that
+`render_prometheus` turns into Prometheus text for `/metrics`.
+
+`collect()` additionally sums span durations by stage for the current thread,
+which is how backtest workers report per-symbol timings.
+
+TELEMETRY=false (or `set_enabled(False)`) turns `span` into a shared no-op
+object and `incr` into an early return, so instrumented code pays one
+function call and a flag check.
+"""
+from __future__ import annotations
+
+import bisect
+import functools
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, Optional, Tuple
+
+# seconds; +Inf is implicit
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0, 30.0, 60.0, 300.0)
+PREFIX = "btopt"
+
+_enabled = os.getenv("TELEMETRY", "true").lower() == "true"
+_local = threading.local()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(on: bool):
+    global _enabled
+    _enabled = bool(on)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.counts[bisect.bisect_left(BUCKETS, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def cumulative(self):
+        out, acc = [], 0
+        for c in self.counts:
+            acc += c
+            out.append(acc)
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+
+    def observe(self, stage: str, labels: LabelKey, seconds: float):
+        with self.lock:
+            h = self.histograms.get((stage, labels))
+            if h is None:
+                h = self.histograms[(stage, labels)] = Histogram()
+            h.observe(seconds)
+
+    def incr(self, name: str, labels: LabelKey, value: float):
+        with self.lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0.0) + value
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> dict:
+        """JSON-friendly totals: {"stages": [...], "counters": [...]}."""
+        with self.lock:
+            stages = [{"stage": s, **dict(l), "count": h.count, "sum_s": h.sum}
+                      for (s, l), h in self.histograms.items()]
+            counters = [{"name": n, **dict(l), "value": v} for (n, l), v in self.counters.items()]
+        return {"stages": stages, "counters": counters}
+
+
+REGISTRY = Registry()
+
+
+def _key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "t0")
+
+    def __init__(self, stage: str, labels: LabelKey):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = perf_counter() - self.t0
+        REGISTRY.observe(self.stage, self.labels, dt)
+        sink = getattr(_local, "sink", None)
+        if sink is not None:
+            sink[self.stage] = sink.get(self.stage, 0.0) + dt
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(stage: str, **labels):
+    """`with span("simulate", symbol=sym): ...` -> one histogram observation."""
+    if not _enabled:
+        return _NOOP
+    return _Span(stage, _key(labels) if labels else ())
+
+
+def timed(stage: Optional[str] = None, **labels):
+    """Decorator form of `span`; the stage defaults to the function's qualified name."""
+    def wrap(fn):
+        name = stage or fn.__qualname__
+        key = _key(labels)
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, key):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def observe(stage: str, seconds: float, **labels):
+    """Record a duration measured elsewhere (e.g. across an await or a clock)."""
+    if _enabled:
+        REGISTRY.observe(stage, _key(labels) if labels else (), seconds)
+
+
+def incr(name: str, value: float = 1.0, **labels):
+    if _enabled:
+        REGISTRY.incr(name, _key(labels) if labels else (), value)
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, float]]:
+    """Sum this thread's span durations by stage while the block runs (nested
+    spans are counted in their own stage and in the enclosing one)."""
+    prev = getattr(_local, "sink", None)
+    sink: Dict[str, float] = {}
+    _local.sink = sink
+    try:
+        yield sink
+    finally:
+        _local.sink = prev
+        if prev is not None:
+            for k, v in sink.items():
+                prev[k] = prev.get(k, 0.0) + v
+
+
+def _fmt_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus(registry: Registry = REGISTRY) -> str:
+    """Prometheus text exposition (0.0.4) of all stage histograms and counters."""
+    with registry.lock:
+        hists = sorted((k, list(h.cumulative()), h.sum, h.count) for k, h in registry.histograms.items())
+        counters = sorted(registry.counters.items())
+    lines = []
+    if hists:
+        name = f"{PREFIX}_stage_seconds"
+        lines += [f"# HELP {name} Wall time per instrumented stage.", f"# TYPE {name} histogram"]
+        for (stage, labels), cum, total, count in hists:
+            base = (("stage", stage),) + labels
+            for le, c in zip([*map(repr, BUCKETS), "+Inf"], cum):
+                lines.append(f"{name}_bucket{_fmt_labels(base, (('le', le),))} {c}")
+            lines.append(f"{name}_sum{_fmt_labels(base)} {total!r}")
+            lines.append(f"{name}_count{_fmt_labels(base)} {count}")
+    seen = set()
+    for (cname, labels), v in counters:
+        metric = f"{PREFIX}_{cname}_total"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_fmt_labels(labels)} {v!r}")
+    return "\n".join(lines) + "\n"
@@ -1,3 +1,20 @@
 from datetime import datetime
+
+import pandas as pd
+
+from utils.trading_calendar import get_calendar
+
+_UNITS = {"m": "min", "h": "h", "d": "D"}
+
+
 def is_trading_session(ts: datetime) -> bool:
-    return True
+    """True inside a regular session of `utils.trading_calendar` (naive = UTC)."""
+    return get_calendar().is_open(ts)
+
+
+def interval_delta(interval: str) -> pd.Timedelta:
+    """Bar length of a yfinance-style interval ("1m", "5m", "1h", "1d")."""
+    n, unit = interval[:-1], interval[-1:].lower()
+    if unit not in _UNITS or not n.isdigit():
+        raise ValueError(f"unsupported interval: {interval!r}")
+    return pd.Timedelta(int(n), _UNITS[unit])
@@ -0,0 +1,133 @@
+"""
+Trading calendar index.
+
+Regular sessions (weekdays, 09:30-16:00 exchange time) are expanded once into
+sorted int64 UTC open/close arrays, with holidays removed and early closes
+applied from a local table (configs/market_calendar.csv: date, kind =
+holiday | early_close, close time). A session mask over any number of bar
+timestamps is then one `searchsorted` plus a compare; DST is handled by the
+exchange time zone when the arrays are built. The shipped table lists NYSE
+holidays and early closes for 2000-2035 (rule-based, plus the unscheduled
+closures up to its last update); dates outside the table's years only exclude
+weekends (and none exist past `end`), and querying them warns once.
+"""
+from __future__ import annotations
+
+import os
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TABLE = "configs/market_calendar.csv"
+
+
+def _ns(ts) -> np.ndarray:
+    """Timestamps (scalar, array, Series, DatetimeIndex; naive = UTC) -> int64 ns."""
+    if isinstance(ts, np.ndarray) and ts.dtype == np.int64:
+        return ts
+    if not isinstance(ts, (pd.Series, pd.DatetimeIndex)):
+        ts = pd.DatetimeIndex(np.atleast_1d(ts) if not isinstance(ts, (str, pd.Timestamp)) else [ts])
+    t = pd.DatetimeIndex(pd.to_datetime(ts, utc=True))
+    return t.tz_localize(None).as_unit("ns").asi8
+
+
+class TradingCalendar:
+    def __init__(self, table: Optional[str | Path] = DEFAULT_TABLE, tz: str = "America/New_York",
+                 open_time: str = "09:30", close_time: str = "16:00",
+                 start: str = "2000-01-01", end: str = "2035-12-31"):
+        self.tz = tz
+        days = pd.bdate_range(start, end)
+        covered = (days[0].year, days[-1].year)
+        closes = pd.Series(close_time, index=days)
+        if table is not None and Path(table).exists():
+            t = pd.read_csv(table, dtype=str).fillna("")
+            dates = pd.to_datetime(t["date"])
+            covered = (max(covered[0], dates.min().year), min(covered[1], dates.max().year))
+            days = days.difference(dates[t["kind"] == "holiday"])
+            closes = closes.reindex(days)
+            early = t[t["kind"] == "early_close"]
+            closes.loc[closes.index.intersection(pd.to_datetime(early["date"]))] = \
+                early.set_index(pd.to_datetime(early["date"]))["close"]
+        self.dates = days
+        self.open_ns = self._utc_ns(days, pd.Series(open_time, index=days))
+        self.close_ns = self._utc_ns(days, closes)
+        self.covered = covered
+        self._covered_ns = (_ns(pd.Timestamp(f"{covered[0]}-01-01"))[0],
+                            _ns(pd.Timestamp(f"{covered[1] + 1}-01-01"))[0])
+        self._warned = False
+
+    def _check(self, t: np.ndarray):
+        if self._warned or not len(t):
+            return
+        lo, hi = self._covered_ns
+        if t.min() < lo or t.max() >= hi:
+            self._warned = True
+            warnings.warn(f"timestamps outside {self.covered[0]}-{self.covered[1]}, the years the "
+                          "market calendar covers; sessions there may be wrong", stacklevel=3)
+
+    def _utc_ns(self, days: pd.DatetimeIndex, times: pd.Series) -> np.ndarray:
+        local = days + pd.to_timedelta(times.to_numpy() + ":00")
+        return _ns(local.tz_localize(self.tz).tz_convert("UTC"))
+
+    def session_index(self, ts) -> np.ndarray:
+        """Position of each timestamp's session in `dates`, -1 outside sessions."""
+        t = _ns(ts)
+        self._check(t)
+        i = np.searchsorted(self.open_ns, t, side="right") - 1
+        ok = (i >= 0) & (t < self.close_ns[np.maximum(i, 0)])
+        return np.where(ok, i, -1)
+
+    def session_mask(self, ts) -> np.ndarray:
+        """True where a bar opening at `ts` is inside a session."""
+        return self.session_index(ts) >= 0
+
+    def is_open(self, ts) -> bool:
+        return bool(self.session_mask(ts)[0])
+
+    def bar_bounds(self, ts, step) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(session, bar open, bar close) ns of the `step` bar containing each
+        timestamp. Bars are counted from the session open and the last one is cut
+        at the session close; the session is -1 (and the bounds meaningless)
+        outside sessions."""
+        t = _ns(ts)
+        sid = self.session_index(t)
+        s = np.maximum(sid, 0)
+        step = pd.Timedelta(step).value
+        lo = self.open_ns[s] + (t - self.open_ns[s]) // step * step
+        return sid, lo, np.minimum(lo + step, self.close_ns[s])
+
+    def next_bar(self, ts, step) -> tuple[pd.Timestamp, pd.Timestamp]:
+        """(open, close) of the session bar containing `ts`, or of the first bar of
+        the next session when `ts` is outside one."""
+        t = _ns(ts)
+        self._check(t)
+        t = int(t[0])
+        i = int(np.searchsorted(self.open_ns, t, side="right")) - 1
+        if i < 0 or t >= self.close_ns[i]:
+            t = int(self.open_ns[i + 1])
+        _, lo, hi = self.bar_bounds(np.array([t], dtype=np.int64), step)
+        return pd.Timestamp(int(lo[0]), tz="UTC"), pd.Timestamp(int(hi[0]), tz="UTC")
+
+    def sessions(self, start=None, end=None) -> pd.DataFrame:
+        """date / open / close (UTC) of the sessions whose date is in [start, end]."""
+        df = pd.DataFrame({"date": self.dates,
+                           "open": pd.to_datetime(self.open_ns, utc=True),
+                           "close": pd.to_datetime(self.close_ns, utc=True)})
+        if start is not None:
+            df = df[df["date"] >= pd.Timestamp(start).tz_localize(None)]
+        if end is not None:
+            df = df[df["date"] <= pd.Timestamp(end).tz_localize(None)]
+        return df.reset_index(drop=True)
+
+
+_calendar: Optional[TradingCalendar] = None
+
+
+def get_calendar() -> TradingCalendar:
+    global _calendar
+    if _calendar is None:
+        _calendar = TradingCalendar(os.getenv("MARKET_CALENDAR", DEFAULT_TABLE))
+    return _calendar